@@ -1,16 +1,20 @@
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bilibili_monitor.settings')
+
+# 先初始化Django再导入路由：consumers 及其依赖的服务模块在导入时读取settings
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import live_data.routing
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bilibili_monitor.settings')
-
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             live_data.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
@@ -74,6 +74,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'bilibili_monitor.wsgi.application'
+ASGI_APPLICATION = 'bilibili_monitor.asgi.application'
+
+# WebSocket房间组：每个工作进程一个事件转发器把实时事件发送到本进程的 room_{id} 组，
+# 因此使用进程内的InMemoryChannelLayer（换成跨进程的channel layer会让每个事件被每个进程各转发一次）
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 # Database
 DATABASES = {
@@ -135,6 +144,50 @@ REDIS_CONNECTION_POOL = {
     }
 }
 
+# DanmakuService进程级共享实例的健康检查配置（秒）
+DANMAKU_SERVICE_HEALTH_CHECK_INTERVAL = 10  # 两次PING之间的最小间隔
+DANMAKU_SERVICE_RECONNECT_INTERVAL = 5      # Redis不可用时两次重连之间的最小间隔
+DANMAKU_KEYSPACE_STATUS_TTL = 5             # 连接状态（含键数量）缓存时长
+DANMAKU_KEYSPACE_SAMPLE_INTERVAL = 30       # 后台SCAN采样room:*键的周期
+DANMAKU_KEYSPACE_SAMPLE_MAX_KEYS = 100000   # 单次采样最多扫描的键数，超出后按比例估算
+
+# 房间API响应缓存（按房间版本号失效）的兜底过期时间（秒）
+ROOM_PAYLOAD_CACHE_TIMEOUT = 60
+
+# 批量房间统计API：单次请求最多的房间数，以及每个Redis pipeline包含的房间数
+BATCH_ROOM_STATS_MAX_ROOMS = 5000
+DANMAKU_BULK_ROOMS_CHUNK_SIZE = 1000
+
+# 弹幕浏览器多房间数据的共享缓存时长（秒）
+DANMAKU_BROWSER_CACHE_TIMEOUT = 2
+
+# 历史数据导出每批从数据库读取的行数
+EXPORT_CHUNK_SIZE = 2000
+
+# 时间序列统计接口单次最多返回的时间段数
+ROLLUP_MAX_POINTS = 5000
+
+# 仪表板快照（后台线程预计算系统统计和活跃房间）
+DASHBOARD_SNAPSHOT_INTERVAL = 1.0    # 刷新周期（秒）
+DASHBOARD_TOP_ROOMS = 20             # 首页展示的活跃房间数
+DASHBOARD_SNAPSHOT_MAX_AGE = 10      # 快照超过该时长未刷新时由请求同步重建
+DASHBOARD_SNAPSHOT_MAX_STALE = 5     # 版本号未变化时快照最多沿用的时长（秒）
+
+# 实时事件流（SSE）配置
+SSE_HEARTBEAT_INTERVAL = 15     # 心跳间隔（秒）
+LIVE_EVENTS_BLOCK_MS = 2000     # 工作进程XREAD单次阻塞时长（毫秒）
+LIVE_EVENTS_QUEUE_SIZE = 1000   # 每个连接最多积压的事件数，超出后断开由客户端续传
+
+# WebSocket实时推送配置
+WS_RESUME_MAX_EVENTS = 500      # 带resume_from重连时最多补发的事件数，超出后发送全量初始数据
+WS_MAX_SUBSCRIBED_ROOMS = 200   # 多房间连接（ws/rooms/）最多单独订阅的房间数
+WS_FRAME_INTERVAL_MS = 200      # 实时事件合并推送的帧间隔（毫秒），建议100~250
+WS_DEFAULT_MAX_EVENTS_PER_SECOND = 0    # 客户端未声明max_rate时每秒最多推送的弹幕/礼物数（0为不限制，事件按seq连续推送）
+WS_MAX_EVENTS_PER_SECOND = 500  # 客户端可以声明的max_rate上限
+WS_FRAME_MAX_ITEMS = 1000       # 单帧最多保留的弹幕/礼物数（不限速或发送忙时的内存上限）
+WS_SEND_QUEUE_SIZE = 64         # 每个连接最多积压的待发送消息数，超出后断开慢客户端
+WS_SEND_TIMEOUT = 10            # 单条消息发送超时（秒），超时断开慢客户端
+
 # 日志配置 - 添加Redis相关日志
 LOGGING = {
     'version': 1,
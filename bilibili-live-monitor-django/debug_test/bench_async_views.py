@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+同步/异步API视图并发压测
+
+默认在本进程内通过Django的ASGI处理流程调用（AsyncClient）；指定 --base-url 时用aiohttp
+请求独立运行的ASGI服务器（如 uvicorn bilibili_monitor.asgi:application），包含HTTP解析和网络开销。
+两种方式下同步视图都由Django放进线程池执行，异步视图直接在事件循环中执行。
+需要本地Redis中已有收集器写入的数据。
+
+用法:
+    python debug_test/bench_async_views.py --requests 2000 --concurrency 50 --room 12345
+    python debug_test/bench_async_views.py --room 12345 --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bilibili_monitor.settings')
+
+import django
+django.setup()
+
+from django.core.cache import cache
+from django.test import AsyncClient
+
+ENDPOINTS = [
+    'rooms/?limit=50',
+    'room/{room_id}/stats/',
+    'room/{room_id}/danmaku/?limit=50',
+    'room/{room_id}/gifts/?limit=30',
+    'system/stats/',
+]
+
+
+async def run_load(path, total, concurrency, base_url=None):
+    """并发请求同一个接口，返回 (每秒请求数, 延迟列表, 非200数)"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    if base_url:
+        import aiohttp
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency))
+
+        async def get_status():
+            async with session.get(base_url + path) as response:
+                await response.read()
+                return response.status
+    else:
+        session = None
+        client = AsyncClient()
+
+        async def get_status():
+            return (await client.get(path)).status_code
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            status = await get_status()
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if session is not None:
+            await session.close()
+    elapsed = time.perf_counter() - started
+    return total / elapsed, latencies, errors
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='同步/异步API视图并发压测')
+    parser.add_argument('--requests', type=int, default=1000, help='每个接口的请求总数')
+    parser.add_argument('--concurrency', type=int, default=50, help='并发数')
+    parser.add_argument('--room', type=int, required=True, help='用于房间接口的房间ID')
+    parser.add_argument('--base-url', default=None, help='独立运行的ASGI服务器地址，不指定时在本进程内调用')
+    args = parser.parse_args()
+
+    print(f"🚀 每个接口 {args.requests} 次请求，并发 {args.concurrency}")
+    print(f"{'接口':<36}{'版本':<8}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'错误':>6}")
+
+    for endpoint in ENDPOINTS:
+        endpoint = endpoint.format(room_id=args.room)
+        for label, prefix in (('sync', '/live/api/'), ('async', '/live/api/async/')):
+            cache.clear()
+            # 预热：建立连接池、填充缓存
+            await run_load(prefix + endpoint, args.concurrency, args.concurrency, args.base_url)
+            rps, latencies, errors = await run_load(prefix + endpoint, args.requests, args.concurrency, args.base_url)
+            print(f"{endpoint:<36}{label:<8}{rps:>10.1f}"
+                  f"{statistics.median(latencies) * 1000:>10.2f}{percentile(latencies, 0.95) * 1000:>10.2f}{errors:>6}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+WebSocket推送帧合并效果：逐条推送 vs FrameCoalescer 按帧推送
+
+模拟一个热门房间以指定速率产生弹幕（每50条夹一个礼物），统计每个连接的发送次数、
+推送给客户端的条数、序列化字节数和服务端耗时。不需要Redis和WebSocket服务。
+
+用法:
+    python debug_test/bench_push_frames.py --rate 500 --seconds 3 --max-rate 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bilibili_monitor.settings')
+
+import django
+django.setup()
+
+from live_data.consumers import live_update_data
+from live_data.push_frames import FrameCoalescer
+from utils.live_events import EVENT_DANMAKU, EVENT_GIFT
+from utils.serialization import dumps
+
+
+def make_event(seq):
+    if seq % 50 == 0:
+        return EVENT_GIFT, {'username': f'观众{seq}', 'gift_name': '小心心', 'price': 1, 'num': 5, 'seq': seq}
+    return EVENT_DANMAKU, {'username': f'观众{seq}', 'message': f'第{seq}条弹幕，主播加油！', 'user_level': seq % 60, 'seq': seq}
+
+
+class Stats:
+    def __init__(self):
+        self.messages = 0
+        self.items = 0
+        self.bytes = 0
+
+
+async def produce(rate, seconds, handle):
+    """按速率产生事件，每10ms一批"""
+    batch = max(1, rate // 100)
+    seq = 0
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        for _ in range(batch):
+            seq += 1
+            await handle(*make_event(seq))
+        await asyncio.sleep(0.01)
+    return seq
+
+
+async def run_inline(args):
+    stats = Stats()
+
+    async def handle(event_type, data):
+        payload = dumps({'type': 'live_update', 'seq': data['seq'],
+                         'data': live_update_data([{'type': event_type, 'data': data}])})
+        stats.messages += 1
+        stats.items += 1
+        stats.bytes += len(payload.encode('utf-8'))
+
+    cpu = time.process_time()
+    total = await produce(args.rate, args.seconds, handle)
+    return total, stats, time.process_time() - cpu
+
+
+async def run_coalesced(args):
+    stats = Stats()
+
+    async def send_frame(rooms):
+        frame = rooms[6]
+        payload = dumps({'type': 'live_update', 'seq': frame['seq'], 'data': frame['data'],
+                         'counts': frame['counts'], 'dropped': frame['dropped']})
+        stats.messages += 1
+        stats.items += len(frame['data'].get('new_danmaku', [])) + len(frame['data'].get('new_gifts', []))
+        stats.bytes += len(payload.encode('utf-8'))
+
+    frames = FrameCoalescer(send_frame, interval_ms=args.interval, max_rate=args.max_rate)
+
+    async def handle(event_type, data):
+        frames.add(6, event_type, data)
+
+    cpu = time.process_time()
+    total = await produce(args.rate, args.seconds, handle)
+    await asyncio.sleep(args.interval / 1000.0)
+    await frames.flush()
+    return total, stats, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送帧合并效果对比')
+    parser.add_argument('--rate', type=int, default=500, help='房间每秒产生的事件数')
+    parser.add_argument('--seconds', type=float, default=3, help='持续时间（秒）')
+    parser.add_argument('--interval', type=int, default=200, help='帧间隔（毫秒）')
+    parser.add_argument('--max-rate', type=int, default=50, help='客户端每秒最多接收的弹幕/礼物数，0为不限制')
+    args = parser.parse_args()
+
+    print(f"房间速率 {args.rate}/s，持续 {args.seconds}s，帧间隔 {args.interval}ms，客户端上限 {args.max_rate or '不限'}/s")
+    print(f"{'模式':<10}{'事件数':>8}{'发送次数':>10}{'推送条数':>10}{'字节数':>12}{'CPU(ms)':>10}")
+    for name, runner in (('逐条推送', run_inline), ('按帧推送', run_coalesced)):
+        total, stats, cpu = asyncio.run(runner(args))
+        print(f"{name:<10}{total:>8}{stats.messages:>10}{stats.items:>10}{stats.bytes:>12}{cpu * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
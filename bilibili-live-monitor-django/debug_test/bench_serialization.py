@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+JSON序列化性能对比：标准库json vs utils.serialization（orjson可用时使用orjson）
+
+覆盖API和推送中最常见的几类负载：房间列表分页、弹幕列表、单房间完整快照、
+收集器写入的弹幕解析，以及 JsonResponse 与 FastJsonResponse 的单次构建耗时。
+不需要Redis，数据在本地生成。
+
+用法:
+    python debug_test/bench_serialization.py --rounds 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bilibili_monitor.settings')
+
+import django
+django.setup()
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+
+from live_data.responses import FastJsonResponse
+from utils.serialization import JSON_BACKEND, dumps, loads
+
+
+def make_danmaku(room_id, index):
+    return {
+        'id': index,
+        'room_id': room_id,
+        'user_id': 100000 + index,
+        'username': f'观众{index}',
+        'message': f'第{index}条弹幕，主播加油！',
+        'user_level': index % 60,
+        'medal_name': '粉丝团',
+        'medal_level': index % 30,
+        'timestamp': datetime.now().isoformat(),
+        'unix_timestamp': int(time.time()),
+    }
+
+
+def make_room(room_id):
+    return {
+        'room_id': room_id,
+        'title': f'直播间{room_id}的标题',
+        'uploader_name': f'主播{room_id}',
+        'area_name': '单机游戏',
+        'live_status': room_id % 2,
+        'is_live': bool(room_id % 2),
+        'online': room_id * 37,
+        'danmaku_count': room_id * 11,
+        'gift_count': room_id * 3,
+        'total_gift_value': room_id * 1.5,
+        'last_update': datetime.now().isoformat(),
+    }
+
+
+def build_payloads():
+    rooms_page = {
+        'success': True,
+        'data': {'rooms': [make_room(room_id) for room_id in range(1, 51)], 'total_count': 500},
+    }
+    danmaku_page = {
+        'success': True,
+        'data': {'room_id': 1, 'danmaku': [make_danmaku(1, i) for i in range(200)]},
+    }
+    room_snapshot = {
+        'success': True,
+        'data': {
+            'room': make_room(1),
+            'recent_danmaku': [make_danmaku(1, i) for i in range(50)],
+            'recent_gifts': [dict(make_danmaku(1, i), gift_name='小心心', price=0) for i in range(30)],
+        },
+    }
+    return {'房间列表(50)': rooms_page, '弹幕列表(200)': danmaku_page, '房间快照': room_snapshot}
+
+
+def timeit(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON序列化性能对比')
+    parser.add_argument('--rounds', type=int, default=2000, help='每项测试的重复次数')
+    args = parser.parse_args()
+
+    print(f"🚀 当前序列化后端: {JSON_BACKEND}，每项 {args.rounds} 次")
+    print(f"{'测试项':<24}{'json(us)':>12}{JSON_BACKEND + '(us)':>14}{'加速':>8}")
+
+    def report(label, baseline, fast):
+        print(f"{label:<24}{baseline:>12.1f}{fast:>14.1f}{baseline / fast:>7.1f}x")
+
+    for label, payload in build_payloads().items():
+        report(
+            f'编码 {label}',
+            timeit(lambda: json.dumps(payload, cls=DjangoJSONEncoder), args.rounds),
+            timeit(lambda: dumps(payload), args.rounds),
+        )
+
+    stored = [json.dumps(make_danmaku(1, i), ensure_ascii=False) for i in range(500)]
+    report(
+        '解码 弹幕(500)',
+        timeit(lambda: [json.loads(raw) for raw in stored], max(1, args.rounds // 10)),
+        timeit(lambda: [loads(raw) for raw in stored], max(1, args.rounds // 10)),
+    )
+
+    rooms_page = build_payloads()['房间列表(50)']
+    report(
+        '响应 房间列表(50)',
+        timeit(lambda: JsonResponse(rooms_page), args.rounds),
+        timeit(lambda: FastJsonResponse(rooms_page), args.rounds),
+    )
+
+
+if __name__ == '__main__':
+    main()
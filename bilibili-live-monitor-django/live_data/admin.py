@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import LiveRoom, DanmakuData, GiftData, MonitoringTask, DataMigrationLog
+from .models import LiveRoom, DanmakuData, GiftData, RoomStatsRollup, MonitoringTask, DataMigrationLog
 import json
 
 @admin.register(LiveRoom)
@@ -51,6 +51,17 @@ class GiftDataAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('room')
 
+@admin.register(RoomStatsRollup)
+class RoomStatsRollupAdmin(admin.ModelAdmin):
+    list_display = ['room', 'granularity', 'bucket_start', 'danmaku_count', 'gift_count', 'gift_value']
+    list_filter = ['granularity', 'room']
+    date_hierarchy = 'bucket_start'
+    readonly_fields = ['updated_at']
+    list_per_page = 50
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('room')
+
 @admin.register(MonitoringTask)
 class MonitoringTaskAdmin(admin.ModelAdmin):
     list_display = [
@@ -170,53 +181,49 @@ admin.site.index_title = '数据管理'
 
 # 添加自定义操作
 def export_danmaku_csv(modeladmin, request, queryset):
-    """导出弹幕数据为CSV"""
-    import csv
-    from django.http import HttpResponse
+    """导出弹幕数据为CSV（分批读取，流式输出）"""
+    from django.http import StreamingHttpResponse
+    from .export_services import iter_export_batches, csv_stream, DANMAKU_EXPORT_FIELDS
+    
+    rows = csv_stream(
+        iter_export_batches(queryset, DANMAKU_EXPORT_FIELDS),
+        ['房间ID', '用户名', '弹幕内容', '发送时间', '用户等级', '粉丝牌'],
+        lambda row: [
+            row['room_id'],
+            row['username'],
+            row['message'],
+            row['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+            row['user_level'],
+            f"{row['medal_name']} Lv.{row['medal_level']}" if row['medal_name'] else ""
+        ]
+    )
     
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(rows, content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="danmaku_data.csv"'
-    response.write('\ufeff')  # BOM for Excel
-    
-    writer = csv.writer(response)
-    writer.writerow(['房间ID', '用户名', '弹幕内容', '发送时间', '用户等级', '粉丝牌'])
-    
-    for obj in queryset:
-        writer.writerow([
-            obj.room.room_id,
-            obj.username,
-            obj.message,
-            obj.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            obj.user_level,
-            f"{obj.medal_name} Lv.{obj.medal_level}" if obj.medal_name else ""
-        ])
-    
     return response
 export_danmaku_csv.short_description = "导出选中的弹幕数据为CSV"
 
 def export_gift_csv(modeladmin, request, queryset):
-    """导出礼物数据为CSV"""
-    import csv
-    from django.http import HttpResponse
+    """导出礼物数据为CSV（分批读取，流式输出）"""
+    from django.http import StreamingHttpResponse
+    from .export_services import iter_export_batches, csv_stream, GIFT_EXPORT_FIELDS
+    
+    rows = csv_stream(
+        iter_export_batches(queryset, GIFT_EXPORT_FIELDS),
+        ['房间ID', '用户名', '礼物名称', '数量', '单价', '总价', '发送时间'],
+        lambda row: [
+            row['room_id'],
+            row['username'],
+            row['gift_name'],
+            row['num'],
+            row['price'],
+            row['total_price'],
+            row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        ]
+    )
     
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(rows, content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="gift_data.csv"'
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
-    writer.writerow(['房间ID', '用户名', '礼物名称', '数量', '单价', '总价', '发送时间'])
-    
-    for obj in queryset:
-        writer.writerow([
-            obj.room.room_id,
-            obj.username,
-            obj.gift_name,
-            obj.num,
-            obj.price,
-            obj.total_price,
-            obj.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
     return response
 export_gift_csv.short_description = "导出选中的礼物数据为CSV"
 
@@ -0,0 +1,728 @@
+"""
+异步弹幕数据服务 - 基于 redis.asyncio
+
+方法与 DanmakuService 一一对应（均为协程），供异步视图和WebSocket消费者使用，
+避免同步Redis调用阻塞ASGI事件循环。Redis键、pipeline组装与结果解析都来自 danmaku_common，
+本模块只负责发出请求。
+
+redis.asyncio 的连接绑定在创建它的事件循环上，因此每个事件循环各持有一个共享实例，
+通过 get_async_danmaku_service() 获取。
+"""
+import asyncio
+import heapq
+import logging
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.utils import timezone
+
+from utils.serialization import loads
+from utils.room_summary import (
+    ROOM_SUMMARY_KEY, ALL_ROOMS_SUMMARY_KEY, ROOM_VERSION_KEY,
+    build_room_detail, build_room_stats, build_room_summary,
+)
+from utils.danmaku_index import DANMAKU_SEQ_KEY, DANMAKU_BYID_KEY, keyword_query_tokens, username_query_token
+from .danmaku_services import (
+    REDIS_CANDIDATE_HOSTS, HEALTH_CHECK_INTERVAL, RECONNECT_INTERVAL, KEYSPACE_STATUS_TTL, get_danmaku_service,
+)
+from .danmaku_common import (
+    ROOM_INFO_KEY, ROOM_DANMAKU_KEY, ROOM_GIFTS_KEY, ACTIVE_ROOMS_KEY, ROOM_INFO_PATTERN, FALLBACK_MAX_ROOMS,
+    RoomStatsSummary, _to_int,
+    format_danmaku, format_gift, decode_recent_items, SinceReader,
+    basic_room_info, error_system_stats, build_system_stats, build_available_rooms,
+    parse_room_ids, room_id_from_info_key, queue_room_stats,
+    queue_bulk_stats, parse_bulk_stats, queue_rooms_feed, parse_rooms_feed, queue_rooms_page, room_summary_keys,
+    build_rooms_page, parse_rooms_snapshot, build_rooms_from_details, data_version_keys, parse_data_versions,
+    search_matcher, scan_matches, room_token_key, rarest_token_key, cross_room_tokens, score_bounds,
+    index_positions, split_index_chunk, parse_matches, queue_positions, parse_positions,
+    queue_window_starts, parse_window_starts,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _merge_desc(streams, key):
+    """按key降序归并多个已按降序排列的异步迭代器"""
+    heap = []
+    for index, stream in enumerate(streams):
+        item = await anext(stream, None)
+        if item is not None:
+            heap.append((tuple(-k for k in key(item)), index, item))
+    heapq.heapify(heap)
+
+    while heap:
+        _neg_key, index, item = heapq.heappop(heap)
+        yield item
+        next_item = await anext(streams[index], None)
+        if next_item is not None:
+            heapq.heappush(heap, (tuple(-k for k in key(next_item)), index, next_item))
+
+
+class AsyncDanmakuService:
+    """弹幕数据服务层（异步版本）"""
+
+    def __init__(self):
+        self.redis_client = None
+        self.connection_pool = None
+        self.connection_status = {'status': 'unknown', 'message': '未初始化'}
+        self._last_health_check = 0.0
+        self._last_connect_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self._status_cache = None
+
+    async def _init_redis_connection(self):
+        """初始化Redis连接池，依次尝试候选地址"""
+        self._last_connect_attempt = time.time()
+        pool_max_connections = getattr(settings, 'REDIS_CONFIG', {}).get('max_connections', 20)
+
+        for config in REDIS_CANDIDATE_HOSTS:
+            pool = None
+            try:
+                logger.info(f"尝试连接Redis(异步): {config}")
+
+                # 协程并发没有上限：连接用尽时排队等待空闲连接，而不是立即抛出 Too many connections
+                pool = aioredis.BlockingConnectionPool(
+                    **config,
+                    decode_responses=True,
+                    socket_timeout=5,
+                    socket_connect_timeout=5,
+                    retry_on_timeout=True,
+                    max_connections=pool_max_connections,
+                    timeout=5,
+                    health_check_interval=30
+                )
+                client = aioredis.Redis(connection_pool=pool)
+
+                if await client.ping():
+                    old_pool = self.connection_pool
+                    self.connection_pool = pool
+                    self.redis_client = client
+                    self.connection_status = {
+                        'status': 'connected',
+                        'message': f"Redis连接成功 ({config['host']}:{config['port']})",
+                        'config': config,
+                    }
+                    self._last_health_check = time.time()
+
+                    if old_pool is not None:
+                        await old_pool.disconnect()
+
+                    logger.info(f"✅ Redis异步连接池已建立: {config}")
+                    return
+
+            except redis.ConnectionError as e:
+                logger.warning(f"❌ Redis连接失败 {config}: ConnectionError - {e}")
+            except redis.TimeoutError as e:
+                logger.warning(f"❌ Redis连接超时 {config}: TimeoutError - {e}")
+            except Exception as e:
+                logger.error(f"❌ Redis连接异常 {config}: {type(e).__name__} - {e}")
+
+            if pool is not None:
+                await pool.disconnect()
+
+        # 所有连接都失败
+        self.redis_client = None
+        self.connection_pool = None
+        self.connection_status = {
+            'status': 'error',
+            'message': 'Redis连接失败，请检查Redis服务是否启动'
+        }
+        logger.error("❌ 所有Redis异步连接尝试都失败")
+
+    async def ensure_connection(self, force: bool = False) -> bool:
+        """惰性健康检查：PING和重连都按间隔限频，返回当前是否可用"""
+        now = time.time()
+
+        if self.redis_client is None:
+            # 其他协程正在建立连接时等待其完成，而不是直接判定为不可用
+            if force or self._lock.locked() or self._last_connect_attempt == 0.0 or now - self._last_connect_attempt >= RECONNECT_INTERVAL:
+                async with self._lock:
+                    if self.redis_client is None:
+                        await self._init_redis_connection()
+            return self.redis_client is not None
+
+        if not force and now - self._last_health_check < HEALTH_CHECK_INTERVAL:
+            return self.connection_status.get('status') == 'connected'
+
+        async with self._lock:
+            self._last_health_check = time.time()
+            try:
+                await self.redis_client.ping()
+                if self.connection_status.get('status') != 'connected':
+                    config = self.connection_status.get('config', {})
+                    self.connection_status = {
+                        'status': 'connected',
+                        'message': f"Redis连接已恢复 ({config.get('host')}:{config.get('port')})",
+                        'config': config,
+                    }
+                return True
+            except redis.RedisError as e:
+                logger.error(f"Redis健康检查失败，尝试重连: {e}")
+                await self._init_redis_connection()
+                return self.redis_client is not None
+
+    async def check_health(self, force: bool = False) -> Dict:
+        """获取限频后的连接状态，供请求路径上的快速判断使用"""
+        await self.ensure_connection(force=force)
+        return self.connection_status
+
+    async def is_connected(self) -> bool:
+        """检查Redis是否连接（限频健康检查）"""
+        try:
+            return await self.ensure_connection()
+        except Exception:
+            return False
+
+    async def close(self):
+        """关闭连接池"""
+        if self.connection_pool is not None:
+            await self.connection_pool.disconnect()
+        self.redis_client = None
+        self.connection_pool = None
+
+    async def get_connection_status(self) -> Dict:
+        """获取Redis连接状态（短TTL缓存，键数量来自INFO keyspace和后台采样器）"""
+        cached = self._status_cache
+        if cached and time.time() - cached['cached_at'] < KEYSPACE_STATUS_TTL:
+            return cached['status']
+
+        try:
+            if not await self.ensure_connection():
+                return self.connection_status
+
+            start_time = time.time()
+            response = await self.redis_client.ping()
+            ping_time = round((time.time() - start_time) * 1000, 2)
+
+            if not response:
+                return {
+                    'status': 'error',
+                    'message': 'Redis ping失败'
+                }
+
+            info = await self.redis_client.info()
+            db_index = self.connection_status.get('config', {}).get('db', 0)
+            keyspace = info.get(f'db{db_index}', {})
+            total_keys = keyspace.get('keys', 0) if isinstance(keyspace, dict) else 0
+
+            # room:*键数量复用同步服务的后台采样结果（采样在线程中进行，不占用事件循环）
+            room_key_stats = await asyncio.to_thread(
+                lambda: get_danmaku_service()._get_keyspace_sampler().get_stats()
+            )
+
+            status = {
+                'status': 'connected',
+                'message': f"Redis服务正常运行 (ping: {ping_time}ms)",
+                'redis_version': info.get('redis_version'),
+                'used_memory_human': info.get('used_memory_human'),
+                'connected_clients': info.get('connected_clients', 0),
+                'total_keys': total_keys,
+                'room_keys': room_key_stats.get('room_keys'),
+                'room_keys_estimated': room_key_stats.get('estimated', True),
+                'room_keys_sampled_at': room_key_stats.get('sampled_at'),
+                'room_keys_status': room_key_stats.get('status', 'pending'),
+                'ping_time': ping_time,
+                'last_check': datetime.now().strftime('%H:%M:%S')
+            }
+            self._status_cache = {'status': status, 'cached_at': time.time()}
+            return status
+
+        except redis.ConnectionError:
+            logger.error("Redis连接断开，尝试重连...")
+            await self.ensure_connection(force=True)
+            return self.connection_status
+        except Exception as e:
+            logger.error(f"检查Redis状态失败: {e}")
+            return {
+                'status': 'error',
+                'message': f'连接检查失败: {str(e)}'
+            }
+
+    async def get_recent_danmaku(self, room_id: int, limit: int = 20, since_seq: Optional[int] = None) -> List[Dict]:
+        """获取最近弹幕（按时间倒序）；指定since_seq时按事件ID升序返回其后最早的limit条"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            list_key = ROOM_DANMAKU_KEY.format(room_id=room_id)
+            if since_seq is not None:
+                return await self._read_since(list_key, room_id, format_danmaku, since_seq, limit)
+
+            danmaku_list = await self.redis_client.lrange(list_key, 0, limit - 1)
+            return decode_recent_items(room_id, danmaku_list, format_danmaku)
+
+        except Exception as e:
+            logger.error(f"获取弹幕失败: {e}")
+            return []
+
+    async def get_rooms_feed(self, room_ids: List[int], danmaku_limit: int = 5, gift_limit: int = 3) -> Dict[int, Dict[str, List[Dict]]]:
+        """一次pipeline取回多个房间的最新弹幕和礼物"""
+        try:
+            if not await self.ensure_connection() or not room_ids:
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_rooms_feed(pipe, room_ids, danmaku_limit, gift_limit)
+            return parse_rooms_feed(room_ids, await pipe.execute(raise_on_error=False))
+
+        except Exception as e:
+            logger.error(f"批量获取房间最新弹幕失败: {e}")
+            return {}
+
+    async def get_recent_gifts(self, room_id: int, limit: int = 20, since_seq: Optional[int] = None) -> List[Dict]:
+        """获取最近礼物（按时间倒序）；指定since_seq时按事件ID升序返回其后最早的limit条"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            list_key = ROOM_GIFTS_KEY.format(room_id=room_id)
+            if since_seq is not None:
+                return await self._read_since(list_key, room_id, format_gift, since_seq, limit)
+
+            gifts_list = await self.redis_client.lrange(list_key, 0, limit - 1)
+            return decode_recent_items(room_id, gifts_list, format_gift)
+
+        except Exception as e:
+            logger.error(f"获取礼物失败: {e}")
+            return []
+
+    async def _read_since(self, list_key: str, room_id: int, formatter, since_seq: int, limit: int) -> List[Dict]:
+        """按页向旧的方向读取列表，直到遇到不比since_seq新的事件"""
+        reader = SinceReader(room_id, formatter, since_seq, limit)
+        while not reader.feed(await self.redis_client.lrange(list_key, reader.start, reader.stop)):
+            pass
+        return reader.result()
+
+    async def search_danmaku(self, room_id: int, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
+        """搜索弹幕（走写入时建立的倒排索引，耗时与命中数成正比）"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            if not keyword and not username:
+                return []
+
+            keyword_tokens = keyword_query_tokens(keyword) if keyword else []
+            user_token = username_query_token(username) if username else None
+
+            # 单字关键词或索引尚未建立（旧数据）时退回线性扫描
+            byid_key = DANMAKU_BYID_KEY.format(room_id=room_id)
+            if (keyword and not keyword_tokens) or not await self.redis_client.exists(byid_key):
+                return await self._scan_danmaku(room_id, keyword, username, limit)
+
+            token_keys = []
+            if keyword_tokens:
+                # 只遍历命中最少的片段，其余条件在取回弹幕后校验
+                pipe = self.redis_client.pipeline(transaction=False)
+                for token in keyword_tokens:
+                    pipe.zcard(room_token_key(room_id, token))
+                rarest_key = rarest_token_key(room_id, keyword_tokens, await pipe.execute())
+                if rarest_key:
+                    token_keys.append(rarest_key)
+            if user_token:
+                token_keys.append(room_token_key(room_id, user_token))
+
+            if not token_keys:
+                return []
+
+            is_match = search_matcher(keyword, username, match_all=False)
+
+            # 多个索引按时间倒序归并，分批取回弹幕本体，凑满limit即停止
+            candidates = _merge_desc(
+                [self._iter_index(key, limit) for key in token_keys],
+                key=lambda item: (item[1], item[0])
+            )
+
+            results = []
+            seen = set()
+            batch = []
+            async for seq, _score in candidates:
+                if seq in seen:
+                    continue
+                seen.add(seq)
+                batch.append(seq)
+                if len(batch) < limit:
+                    continue
+
+                results.extend(await self._load_matches(room_id, batch, is_match, limit - len(results)))
+                batch = []
+                if len(results) >= limit:
+                    return results
+
+            if batch:
+                results.extend(await self._load_matches(room_id, batch, is_match, limit - len(results)))
+
+            return results
+
+        except Exception as e:
+            logger.error(f"搜索弹幕失败: {e}")
+            return []
+
+    async def _iter_index(self, token_key: str, chunk_size: int):
+        """按时间倒序分页遍历一个索引有序集合，产出(seq, score)"""
+        start = 0
+        chunk_size = max(chunk_size, 1)
+        while True:
+            items = await self.redis_client.zrevrange(token_key, start, start + chunk_size - 1, withscores=True)
+            for member, score in items:
+                yield int(member), score
+            if len(items) < chunk_size:
+                return
+            start += chunk_size
+
+    async def _load_matches(self, room_id: int, seqs: List, is_match, limit: int) -> List[Dict]:
+        """按seq批量取回弹幕本体并校验搜索条件"""
+        raw_items = await self.redis_client.hmget(DANMAKU_BYID_KEY.format(room_id=room_id), seqs)
+        return parse_matches(room_id, raw_items, is_match, limit)
+
+    async def _scan_danmaku(self, room_id: int, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
+        """线性扫描弹幕列表搜索（索引无法覆盖的查询使用）"""
+        try:
+            all_danmaku = await self.redis_client.lrange(ROOM_DANMAKU_KEY.format(room_id=room_id), 0, -1)
+            return scan_matches(room_id, all_danmaku, keyword, username, limit)
+
+        except Exception as e:
+            logger.error(f"搜索弹幕失败: {e}")
+            return []
+
+    async def search_danmaku_across_rooms(self, keyword: str = None, username: str = None, uid: int = None,
+                                          room_ids: List[int] = None, start_ms: int = None, end_ms: int = None,
+                                          limit: int = 50, after: tuple = None) -> List[Dict]:
+        """跨房间搜索缓存窗口内的弹幕，按时间倒序返回（条件取交集，见同步版本）"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            target_rooms = sorted(set(int(r) for r in room_ids)) if room_ids else await self.get_monitored_room_ids()
+            if not target_rooms:
+                return []
+
+            tokens = cross_room_tokens(keyword, username, uid)
+            max_score, min_score = score_bounds(start_ms, end_ms, after)
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for room_id in target_rooms:
+                for token in tokens:
+                    pipe.zcount(room_token_key(room_id, token), min_score, max_score)
+            counts = await pipe.execute()
+
+            streams = []
+            for index, room_id in enumerate(target_rooms):
+                rarest_key = rarest_token_key(room_id, tokens, counts[index * len(tokens):(index + 1) * len(tokens)])
+                if rarest_key:
+                    streams.append(self._iter_index_range(room_id, rarest_key, max_score, min_score, limit, after))
+
+            if not streams:
+                return []
+
+            is_match = search_matcher(keyword, username, uid, match_all=True)
+            candidates = _merge_desc(streams, key=lambda position: position)
+
+            results = []
+            batch = []
+            async for position in candidates:
+                batch.append(position)
+                if len(batch) < limit:
+                    continue
+
+                results.extend(await self._load_positions(batch, is_match, limit - len(results)))
+                batch = []
+                if len(results) >= limit:
+                    return results
+
+            if batch:
+                results.extend(await self._load_positions(batch, is_match, limit - len(results)))
+
+            return results
+
+        except Exception as e:
+            logger.error(f"跨房间搜索弹幕失败: {e}")
+            return []
+
+    async def _iter_index_range(self, room_id: int, token_key: str, max_score, min_score, chunk_size: int, after: tuple = None):
+        """按分值区间倒序分页遍历索引，产出严格位于after之后的(score, room_id, seq)"""
+        chunk_size = max(chunk_size, 1)
+        while True:
+            items = await self.redis_client.zrevrangebyscore(
+                token_key, max_score, min_score, start=0, num=chunk_size, withscores=True
+            )
+            items, boundary = split_index_chunk(items, chunk_size)
+            if boundary is not None:
+                # 边界毫秒整段读取，保证产出顺序与游标比较一致
+                items += await self.redis_client.zrevrangebyscore(token_key, boundary, boundary, withscores=True)
+            for position in index_positions(room_id, items, after):
+                yield position
+            if boundary is None:
+                return
+            max_score = f'({boundary}'
+
+    async def _load_positions(self, positions: List[tuple], is_match, limit: int) -> List[Dict]:
+        """用一次管道取回多个房间的弹幕本体并校验条件"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        queue_positions(pipe, positions)
+        return parse_positions(positions, await pipe.execute(), is_match, limit)
+
+    async def get_index_window_starts(self, room_ids: List[int] = None) -> Dict[int, int]:
+        """各房间缓存窗口中最早一条弹幕的时间（毫秒），没有索引的房间不返回"""
+        try:
+            if not await self.ensure_connection():
+                return {}
+
+            target_rooms = room_ids or await self.get_monitored_room_ids()
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_window_starts(pipe, target_rooms)
+            return parse_window_starts(target_rooms, await pipe.execute())
+
+        except Exception as e:
+            logger.error(f"获取缓存窗口起始时间失败: {e}")
+            return {}
+
+    async def get_room_detailed_info(self, room_id: int) -> dict:
+        """获取房间详细信息，包括UP主信息"""
+        try:
+            if not await self.ensure_connection():
+                return {}
+
+            room_info = await self.redis_client.hgetall(ROOM_INFO_KEY.format(room_id=room_id))
+            if not room_info:
+                return {}
+
+            stats = await self.get_room_danmaku_stats(room_id)
+            return build_room_detail(room_info, stats)
+
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 详细信息失败: {e}")
+            return {}
+
+    async def get_room_version(self, room_id: int) -> int:
+        """获取房间数据版本号（收集器每次写入递增），不存在时返回0"""
+        try:
+            if not await self.ensure_connection():
+                return 0
+            return _to_int(await self.redis_client.get(ROOM_VERSION_KEY.format(room_id=room_id)))
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 版本号失败: {e}")
+            return 0
+
+    async def get_room_event_seq(self, room_id: int) -> int:
+        """获取房间当前的事件ID（弹幕和礼物共用的递增序号），不存在时返回0"""
+        try:
+            if not await self.ensure_connection():
+                return 0
+            return _to_int(await self.redis_client.get(DANMAKU_SEQ_KEY.format(room_id=room_id)))
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 事件ID失败: {e}")
+            return 0
+
+    async def get_room_event_seqs(self, room_ids: List[int]) -> Dict[int, int]:
+        """一次往返获取多个房间当前的事件ID"""
+        try:
+            if not await self.ensure_connection() or not room_ids:
+                return {}
+            values = await self.redis_client.mget([DANMAKU_SEQ_KEY.format(room_id=room_id) for room_id in room_ids])
+            return {room_id: _to_int(value) for room_id, value in zip(room_ids, values)}
+        except Exception as e:
+            logger.error(f"批量获取房间事件ID失败: {e}")
+            return {}
+
+    async def get_room_events_since(self, room_id: int, since_seq: int, limit: int = 500) -> Optional[List[Dict]]:
+        """按事件ID升序返回since_seq之后的弹幕和礼物 [{'seq', 'type', 'data'}]
+
+        错过的事件超过limit条，或部分事件已被列表裁剪（事件ID不连续）时返回None，调用方需要全量刷新。
+        """
+        danmaku_list, gifts_list = await asyncio.gather(
+            self.get_recent_danmaku(room_id, limit, since_seq=since_seq),
+            self.get_recent_gifts(room_id, limit, since_seq=since_seq),
+        )
+        events = sorted(
+            [{'seq': item['seq'], 'type': 'danmaku', 'data': item} for item in danmaku_list if item.get('seq')] +
+            [{'seq': item['seq'], 'type': 'gift', 'data': item} for item in gifts_list if item.get('seq')],
+            key=lambda event: event['seq'],
+        )
+        if [event['seq'] for event in events] != list(range(since_seq + 1, since_seq + 1 + len(events))):
+            return None
+        if len(events) >= limit:
+            return None
+        return events
+
+    async def get_data_versions(self, room_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """一次往返读取全局/摘要（及指定房间）的版本号；Redis不可用时返回None"""
+        try:
+            if not await self.ensure_connection():
+                return None
+
+            values = await self.redis_client.mget(data_version_keys(room_id))
+            return parse_data_versions(values, room_id)
+
+        except Exception as e:
+            logger.error(f"获取数据版本号失败: {e}")
+            return None
+
+    async def get_room_summary(self, room_id: int) -> dict:
+        """获取收集器预渲染的房间摘要，缺失时现场构建"""
+        try:
+            if not await self.ensure_connection():
+                return {}
+
+            cached = await self.redis_client.get(ROOM_SUMMARY_KEY.format(room_id=room_id))
+            if cached:
+                return loads(cached)
+
+            room_data = await self.get_room_detailed_info(room_id)
+            if not room_data:
+                return {}
+            return build_room_summary(room_id, room_data, timezone.now().isoformat())
+
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 摘要失败: {e}")
+            return {}
+
+    async def get_all_rooms_with_uploader_info(self) -> list:
+        """获取所有房间及UP主信息（优先读取收集器维护的全量快照，一次GET）"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            rooms = parse_rooms_snapshot(await self.redis_client.get(ALL_ROOMS_SUMMARY_KEY))
+            if rooms is not None:
+                return rooms
+
+            room_ids = (await self.get_monitored_room_ids())[:FALLBACK_MAX_ROOMS]
+            details = await asyncio.gather(*[self.get_room_detailed_info(room_id) for room_id in room_ids])
+            return build_rooms_from_details(room_ids, details)
+
+        except Exception as e:
+            logger.error(f"获取所有房间UP主信息失败: {e}")
+            return []
+
+    async def get_rooms_page(self, sort_by: str = 'popularity', status: str = 'all',
+                             offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        """按收集器维护的排序/筛选索引分页获取房间；索引尚未建立时返回None"""
+        try:
+            if not await self.ensure_connection():
+                return None
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_rooms_page(pipe, sort_by, status, offset, limit)
+            index_exists, total_count, room_ids, overview = await pipe.execute()
+
+            if not index_exists:
+                return None
+
+            summaries = await self.redis_client.mget(room_summary_keys(room_ids)) if room_ids else []
+            return build_rooms_page(summaries, total_count, overview)
+
+        except Exception as e:
+            logger.error(f"按索引分页获取房间失败: {e}")
+            return None
+
+    async def get_room_danmaku_stats(self, room_id: int) -> dict:
+        """获取房间弹幕统计"""
+        try:
+            if not await self.ensure_connection():
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_room_stats(pipe, room_id)
+            return build_room_stats(*await pipe.execute())
+
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 弹幕统计失败: {e}")
+            return {}
+
+    async def get_monitored_room_ids(self) -> List[int]:
+        """获取所有被监控房间ID（优先rooms:active集合，缺失时用SCAN代替KEYS）"""
+        try:
+            if not await self.ensure_connection():
+                return []
+
+            room_ids = await self.redis_client.smembers(ACTIVE_ROOMS_KEY)
+            if not room_ids:
+                room_ids = set()
+                async for key in self.redis_client.scan_iter(match=ROOM_INFO_PATTERN, count=1000):
+                    room_ids.add(room_id_from_info_key(key))
+
+            return parse_room_ids(room_ids)
+
+        except Exception as e:
+            logger.error(f"获取监控房间ID失败: {e}")
+            return []
+
+    async def get_rooms_bulk_stats(self, room_ids: Optional[List[int]] = None) -> Dict[int, RoomStatsSummary]:
+        """批量获取房间统计：所有房间的数据在一个pipeline中一次往返取回"""
+        try:
+            if not await self.ensure_connection():
+                return {}
+
+            if room_ids is None:
+                room_ids = await self.get_monitored_room_ids()
+            if not room_ids:
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_bulk_stats(pipe, room_ids)
+            return parse_bulk_stats(room_ids, await pipe.execute(raise_on_error=False))
+
+        except Exception as e:
+            logger.error(f"批量获取房间统计失败: {e}")
+            return {}
+
+    async def get_room_stats(self, room_id: int) -> dict:
+        """获取单个房间的统计摘要（与批量统计接口格式一致）"""
+        summary = (await self.get_rooms_bulk_stats([room_id])).get(int(room_id))
+        return summary.to_dict() if summary else {}
+
+    async def get_system_stats(self) -> dict:
+        """获取系统统计信息"""
+        try:
+            connection_status = await self.get_connection_status()
+
+            if connection_status.get('status') != 'connected':
+                return error_system_stats(connection_status.get('message', 'Redis连接失败'))
+
+            rooms = list((await self.get_rooms_bulk_stats()).values())
+            return build_system_stats(rooms)
+
+        except Exception as e:
+            logger.error(f"获取系统统计失败: {e}")
+            return error_system_stats(f'获取统计失败: {str(e)}')
+
+    async def get_available_rooms(self) -> list:
+        """获取可用房间列表"""
+        try:
+            summaries = list((await self.get_rooms_bulk_stats()).values())
+            return build_available_rooms(summaries)
+        except Exception as e:
+            logger.error(f"获取可用房间列表失败: {e}")
+            return []
+
+    async def get_room_info(self, room_id: int) -> dict:
+        """获取房间基本信息"""
+        try:
+            detailed_info = await self.get_room_detailed_info(room_id)
+            if not detailed_info:
+                return {}
+            return basic_room_info(room_id, detailed_info)
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 信息失败: {e}")
+            return {}
+
+
+
+# 每个事件循环一个共享实例（redis.asyncio连接不能跨事件循环使用）
+_async_services = weakref.WeakKeyDictionary()
+
+
+def get_async_danmaku_service() -> AsyncDanmakuService:
+    """获取当前事件循环共享的AsyncDanmakuService实例，必须在协程中调用"""
+    loop = asyncio.get_running_loop()
+    service = _async_services.get(loop)
+    if service is None:
+        service = AsyncDanmakuService()
+        _async_services[loop] = service
+    return service
@@ -0,0 +1,271 @@
+"""
+异步API视图 - 在ASGI事件循环中直接处理读多写少的接口
+
+与 views.py 中的同名接口返回完全相同的数据（响应构建逻辑共用），
+区别是Redis访问走 AsyncDanmakuService（redis.asyncio），Django缓存走 aget/aset，
+请求不再经过线程池，也不会因同步Redis调用阻塞事件循环。
+ETag/304 在视图内异步计算，版本号规则与同步接口一致。
+
+cache_control/csrf_exempt/require_http_methods 从 Django 5.0 起才能直接装饰协程视图
+（装饰后仍是协程函数），因此 requirements.txt 要求 Django>=5.0。
+
+客户端（前端页面、外部调用方）请使用同步的 /live/api/... 接口；/live/api/async/...
+只作为可选的对照实现保留，不要在新代码中依赖。实测（uvicorn单进程、本机Redis 6.2、
+1 vCPU、DEBUG=True，debug_test/bench_async_views.py --base-url，并发50、每接口1000次）
+两套接口吞吐和p95基本相同：
+    rooms/?limit=50          同步 158 req/s p95 382ms    异步 167 req/s p95 395ms
+    room/<id>/stats/         同步 258 req/s p95 266ms    异步 258 req/s p95 259ms
+    room/<id>/danmaku/       同步 278 req/s p95 240ms    异步 270 req/s p95 256ms
+    room/<id>/gifts/         同步 283 req/s p95 232ms    异步 273 req/s p95 242ms
+    system/stats/            同步  80 req/s p95 702ms    异步  46 req/s p95 1290ms
+本机Redis往返不到1ms，瓶颈在CPU，异步版本没有收益。Redis延迟更高时的对比尚未测过；
+如果在接近生产的环境下异步版本仍无明显优势，就删除本模块及 urls.py 中的 api/async 路由。
+"""
+import logging
+import traceback
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .async_danmaku_services import get_async_danmaku_service
+from .responses import FastJsonResponse
+from .views import (
+    ROOM_PAYLOAD_CACHE_TIMEOUT, revalidate_each_time, _versions_etag, _room_payload_cache_key,
+    _paginate_rooms_in_memory, _rooms_list_response, _room_stats_response,
+    _parse_since, _room_events_response, _system_stats_response, _system_stats_fallback,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _redis_unavailable(connection_status, **extra):
+    """Redis不可用时的503响应"""
+    return FastJsonResponse({
+        'success': False,
+        'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}',
+        **extra
+    }, status=503)
+
+
+async def _conditional_response(request, etag, build_response):
+    """ETag与If-None-Match匹配时直接返回304，不构建响应内容"""
+    if etag:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    response = await build_response()
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    return response
+
+
+async def _cached_room_response(service, view_name, room_id, params, build_response):
+    """房间数据未变化时返回缓存的响应内容（与同步接口共用缓存键）"""
+    version = await service.get_room_version(room_id)
+    if not version:
+        # 版本号为0时无法判断数据是否变化，与同步接口一致不缓存
+        return await build_response()
+    cache_key = _room_payload_cache_key(view_name, room_id, version, params)
+
+    payload = await cache.aget(cache_key)
+    if payload is not None:
+        return HttpResponse(payload, content_type='application/json')
+
+    response = await build_response()
+    if response.status_code == 200:
+        await cache.aset(cache_key, response.content, ROOM_PAYLOAD_CACHE_TIMEOUT)
+    return response
+
+@revalidate_each_time
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_rooms_list(request):
+    """获取房间列表API（异步）"""
+    try:
+        service = get_async_danmaku_service()
+
+        # 检查Redis连接状态（限频健康检查）
+        connection_status = await service.check_health()
+        if connection_status.get('status') != 'connected':
+            return _redis_unavailable(connection_status, redis_status=connection_status)
+
+        # 获取请求参数
+        limit = int(request.GET.get('limit', 50))
+        offset = int(request.GET.get('offset', 0))
+        status_filter = request.GET.get('status', 'all')  # all, live, offline
+        sort_by = request.GET.get('sort', 'popularity')  # popularity, danmaku, gifts, updated
+
+        versions = await service.get_data_versions()
+        etag = _versions_etag('rooms', versions['summary']) if versions else None
+
+        async def build_response():
+            # 优先使用收集器维护的排序/筛选索引，只读取当前页的房间
+            page = await service.get_rooms_page(sort_by, status_filter, offset, limit)
+
+            if page is not None and page['overview'] is not None:
+                paginated_rooms = page['rooms']
+                total_count = page['total_count']
+                system_stats = dict(page['overview'], last_update=timezone.now().isoformat())
+            else:
+                # 索引尚未建立时回退到全量过滤排序
+                paginated_rooms, total_count, system_stats = _paginate_rooms_in_memory(
+                    await service.get_all_rooms_with_uploader_info(), status_filter, sort_by, offset, limit
+                )
+
+            return _rooms_list_response(
+                paginated_rooms, total_count, system_stats, offset, limit, status_filter, sort_by, connection_status
+            )
+
+        return await _conditional_response(request, etag, build_response)
+
+    except Exception as e:
+        logger.error(f"房间列表API(异步)异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'获取房间列表失败: {str(e)}'
+        }, status=500)
+
+@revalidate_each_time
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_room_stats(request, room_id):
+    """房间统计API（异步）"""
+    try:
+        service = get_async_danmaku_service()
+
+        # 检查Redis连接
+        connection_status = await service.check_health()
+        if connection_status.get('status') != 'connected':
+            return _redis_unavailable(connection_status)
+
+        versions = await service.get_data_versions(room_id)
+        etag = _versions_etag(f'room{room_id}', versions['room']) if versions else None
+
+        async def build_response():
+            room_info = await service.get_room_detailed_info(room_id)
+            room_stats = await service.get_room_danmaku_stats(room_id) if room_info else {}
+            return _room_stats_response(room_id, room_info, room_stats)
+
+        async def cached_response():
+            return await _cached_room_response(service, 'stats', room_id, {}, build_response)
+
+        return await _conditional_response(request, etag, cached_response)
+
+    except Exception as e:
+        logger.error(f"房间 {room_id} 统计API(异步)异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'获取房间统计失败: {str(e)}'
+        }, status=500)
+
+@never_cache
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_room_danmaku(request, room_id):
+    """房间弹幕API（异步）"""
+    try:
+        service = get_async_danmaku_service()
+
+        # 检查Redis连接
+        connection_status = await service.check_health()
+        if connection_status.get('status') != 'connected':
+            return _redis_unavailable(connection_status)
+
+        # 获取请求参数
+        limit = min(int(request.GET.get('limit', 50)), 200)  # 最多200条
+        since_timestamp, since_seq = _parse_since(request)
+
+        async def build_response():
+            danmaku_list = await service.get_recent_danmaku(room_id, limit, since_seq=since_seq)
+            return _room_events_response('danmaku', danmaku_list, room_id, limit, since_timestamp, since_seq)
+
+        return await _cached_room_response(
+            service, 'danmaku', room_id, {'limit': limit, 'since': since_timestamp}, build_response
+        )
+
+    except Exception as e:
+        logger.error(f"房间 {room_id} 弹幕API(异步)异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'获取弹幕数据失败: {str(e)}'
+        }, status=500)
+
+@never_cache
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_room_gifts(request, room_id):
+    """房间礼物API（异步）"""
+    try:
+        service = get_async_danmaku_service()
+
+        # 检查Redis连接
+        connection_status = await service.check_health()
+        if connection_status.get('status') != 'connected':
+            return _redis_unavailable(connection_status)
+
+        # 获取请求参数
+        limit = min(int(request.GET.get('limit', 30)), 100)  # 最多100条
+        since_timestamp, since_seq = _parse_since(request)
+
+        async def build_response():
+            gifts_list = await service.get_recent_gifts(room_id, limit, since_seq=since_seq)
+            return _room_events_response('gifts', gifts_list, room_id, limit, since_timestamp, since_seq)
+
+        return await _cached_room_response(
+            service, 'gifts', room_id, {'limit': limit, 'since': since_timestamp}, build_response
+        )
+
+    except Exception as e:
+        logger.error(f"房间 {room_id} 礼物API(异步)异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'获取礼物数据失败: {str(e)}'
+        }, status=500)
+
+@never_cache
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_system_stats(request):
+    """系统统计数据API（异步）"""
+    try:
+        service = get_async_danmaku_service()
+
+        # 检查Redis连接
+        connection_status = await service.check_health()
+        if connection_status.get('status') != 'connected':
+            return _redis_unavailable(connection_status, data={
+                'redis_status': 'error',
+                'redis_message': connection_status.get('message', 'Redis连接失败')
+            })
+
+        try:
+            stats = await service.get_system_stats()
+
+            # 缓存统计数据30秒
+            await cache.aset('system_stats', stats, 30)
+            return _system_stats_response(stats)
+
+        except Exception as e:
+            logger.error(f"获取系统统计(异步)失败: {e}")
+            logger.error(traceback.format_exc())
+
+            # 尝试从缓存获取
+            return _system_stats_fallback(await cache.aget('system_stats'), e)
+
+    except Exception as e:
+        logger.error(f"系统统计API(异步)异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'API异常: {str(e)}'
+        }, status=500)
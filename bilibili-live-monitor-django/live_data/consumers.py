@@ -1,28 +1,190 @@
-import json
 import asyncio
-import redis
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .danmaku_services import DanmakuService
+from utils.live_events import EVENT_DANMAKU, EVENT_GIFT, EVENT_ROOM
+from .async_danmaku_services import get_async_danmaku_service
+from .event_stream import ALL_ROOMS_GROUP_NAME, get_channel_layer_relay, room_group_name
+from .push_frames import WS_CLOSE_SLOW_CONSUMER, FrameCoalescer, OutboundQueue, clamp_max_rate, gift_value
+from .ws_encoding import MessageDecodeError, MessageEncoder, query_encoding
+from urllib.parse import parse_qs
+from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-class LiveDataConsumer(AsyncWebsocketConsumer):
+# 断线续传最多补发的事件数，超出后改为全量刷新
+WS_RESUME_MAX_EVENTS = getattr(settings, 'WS_RESUME_MAX_EVENTS', 500)
+# 多房间连接最多订阅的房间数（订阅全部房间不受限制）
+WS_MAX_SUBSCRIBED_ROOMS = getattr(settings, 'WS_MAX_SUBSCRIBED_ROOMS', 200)
+
+
+def live_update_data(events):
+    """按事件类型把事件列表分组为 live_update 的数据部分"""
+    data = {}
+    for event in events:
+        if event['type'] == EVENT_DANMAKU:
+            data.setdefault('new_danmaku', []).append(event['data'])
+        elif event['type'] == EVENT_GIFT:
+            data.setdefault('new_gifts', []).append(event['data'])
+        else:
+            data['room_update'] = event['data']
+    return data
+
+def query_max_rate(scope):
+    """解析查询参数 max_rate（客户端每秒最多接收的弹幕/礼物数），未提供或无效时返回None"""
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8', errors='ignore'))
+    try:
+        return clamp_max_rate(query['max_rate'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+class SubscriptionFilter:
+    """一个订阅的过滤条件：推送的事件类型和礼物价值下限"""
+    
+    EVENT_TYPES = (EVENT_DANMAKU, EVENT_GIFT, EVENT_ROOM)
+    
+    def __init__(self, types=None, min_gift_value=0):
+        self.types = set(types or self.EVENT_TYPES) & set(self.EVENT_TYPES)
+        self.min_gift_value = float(min_gift_value or 0)
+    
+    @classmethod
+    def from_message(cls, data):
+        """从订阅消息的 filters 字段解析：{"types": ["danmaku", "gift", "room"], "min_gift_value": 10}"""
+        filters = data.get('filters') or {}
+        return cls(filters.get('types'), filters.get('min_gift_value', 0))
+    
+    def allows(self, event_type, data):
+        if event_type not in self.types:
+            return False
+        if event_type == EVENT_GIFT and self.min_gift_value > 0:
+            return gift_value(data) >= self.min_gift_value
+        return True
+    
+    def to_dict(self):
+        return {'types': sorted(self.types), 'min_gift_value': self.min_gift_value}
+
+
+class LivePushConsumer(AsyncWebsocketConsumer):
+    """实时推送消费者基类：消息编码协商、有界发送队列和推送帧合并
+    
+    子类在connect中先调用 setup_push()，accept之后调用 send_encoding_handshake()，
+    断开时调用 close_push()，并实现 send_live_frame(rooms)；客户端消息统一在 receive 中解码，
+    按类型交给 handle_message 分发。
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frames = None
+        self.outbound = None
+        self.encoder = None
+    
+    async def setup_push(self):
+        """选择消息编码并建立发送队列和推送帧合并器；不支持的编码拒绝连接并返回False"""
+        if not await self.setup_encoding():
+            return False
+        self.outbound = OutboundQueue(self.send_payload, self.close_slow_consumer)
+        self.frames = FrameCoalescer(self.send_live_frame, max_rate=query_max_rate(self.scope), outbound=self.outbound)
+        return True
+    
+    def close_push(self):
+        """连接断开时取消待发送的帧和消息"""
+        if self.frames:
+            self.frames.close()
+        if self.outbound:
+            self.outbound.close()
+    
+    async def setup_encoding(self):
+        """按查询参数 format 选择消息编码，不支持的格式拒绝连接"""
+        try:
+            self.encoder = MessageEncoder(query_encoding(self.scope))
+        except ValueError as e:
+            logger.warning(f"拒绝WebSocket连接: {e}")
+            await self.close()
+            return False
+        return True
+    
+    def send_encoding_handshake(self):
+        """msgpack连接（或回退为JSON时）的第一条消息"""
+        handshake = self.encoder.handshake()
+        if handshake is not None:
+            self.outbound.put(handshake)
+    
+    async def send_json(self, data):
+        """编码一条消息放入发送队列（不等待网络）"""
+        self.outbound.put(self.encoder.encode(data))
+    
+    async def send_payload(self, payload):
+        """发送队列的发送任务调用：写到网络（msgpack为二进制帧）"""
+        if isinstance(payload, bytes):
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
+    
+    async def close_slow_consumer(self):
+        """发送积压或超时：断开连接，客户端带resume_from重连补齐"""
+        await self.close(code=WS_CLOSE_SLOW_CONSUMER)
+    
+    async def send_live_frame(self, rooms):
+        """按帧节拍推送合并后的实时事件，由子类实现"""
+        raise NotImplementedError
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """接收WebSocket消息（JSON文本帧；协商了msgpack时也接受msgpack二进制帧）"""
+        try:
+            data = self.encoder.decode(text_data, bytes_data)
+            await self.handle_message(data.get('type'), data)
+        except MessageDecodeError as e:
+            await self.send_json({
+                'type': 'error',
+                'message': str(e)
+            })
+        except (TypeError, ValueError) as e:
+            await self.send_json({
+                'type': 'error',
+                'message': f'参数错误: {e}'
+            })
+        except Exception as e:
+            logger.error(f"处理WebSocket消息失败: {e}")
+            await self.send_json({
+                'type': 'error',
+                'message': str(e)
+            })
+    
+    async def handle_message(self, message_type, data):
+        """处理两种连接共有的客户端消息，子类先处理自己的消息类型再交给这里"""
+        if message_type == 'set_rate':
+            await self.set_rate(data)
+        elif message_type == 'ping':
+            await self.send_json({
+                'type': 'pong',
+                'timestamp': data.get('timestamp')
+            })
+    
+    async def set_rate(self, data):
+        """客户端声明每秒最多接收的弹幕/礼物数，超出部分抽样推送；0或null恢复不限速"""
+        self.frames.set_max_rate(clamp_max_rate(data.get('max_rate')))
+        await self.send_json({
+            'type': 'rate_set',
+            'max_rate': self.frames.max_rate
+        })
+
+
+class LiveDataConsumer(LivePushConsumer):
     """实时直播数据WebSocket消费者"""
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.room_id = None
         self.room_group_name = None
-        self.redis_client = None
         self.is_monitoring = False
-        self.monitor_task = None
+        self.last_seq = 0  # 已推送给客户端的最大事件ID
     
     async def connect(self):
         """WebSocket连接"""
         self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'room_{self.room_id}'
+        self.room_group_name = room_group_name(self.room_id)
+        if not await self.setup_push():
+            return
         
         # 加入房间组
         await self.channel_layer.group_add(
@@ -31,27 +193,29 @@ class LiveDataConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        self.send_encoding_handshake()
         
-        # 初始化Redis连接
+        # 复用当前事件循环共享的异步Redis连接池
         try:
-            self.redis_client = redis.Redis(
-                host='localhost', port=6379, db=0, decode_responses=True
-            )
-            self.redis_client.ping()
+            danmaku_service = get_async_danmaku_service()
+            if not await danmaku_service.ensure_connection():
+                raise ConnectionError(danmaku_service.connection_status.get('message', 'Redis连接失败'))
             logger.info(f"WebSocket连接成功，房间: {self.room_id}")
             
-            # 发送初始数据
-            await self.send_initial_data()
-            
-            # 开始监控
+            # 先开始接收实时事件，再读取初始数据，两者之间的事件按事件ID去重
             await self.start_monitoring()
             
+            # 带resume_from重连时只补发错过的事件，补不齐时再发送全量初始数据
+            resume_from = self.get_resume_from()
+            if resume_from is None or not await self.send_resumed_events(resume_from):
+                await self.send_initial_data()
+            
         except Exception as e:
             logger.error(f"WebSocket初始化失败: {e}")
-            await self.send(text_data=json.dumps({
+            await self.send_json({
                 'type': 'error',
                 'message': f'连接失败: {e}'
-            }))
+            })
     
     async def disconnect(self, close_code):
         """WebSocket断开连接"""
@@ -59,6 +223,7 @@ class LiveDataConsumer(AsyncWebsocketConsumer):
         
         # 停止监控
         await self.stop_monitoring()
+        self.close_push()
         
         # 离开房间组
         if self.room_group_name:
@@ -67,57 +232,69 @@ class LiveDataConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
     
-    async def receive(self, text_data):
-        """接收WebSocket消息"""
+    async def handle_message(self, message_type, data):
+        """处理单房间连接的客户端消息"""
+        if message_type == 'get_recent_data':
+            await self.send_recent_data()
+        elif message_type == 'search_danmaku':
+            keyword = data.get('keyword', '')
+            await self.search_and_send_danmaku(keyword)
+        else:
+            await super().handle_message(message_type, data)
+    
+    def get_resume_from(self):
+        """解析查询参数 resume_from（客户端收到的最大事件ID）"""
+        query = parse_qs(self.scope.get('query_string', b'').decode('utf-8', errors='ignore'))
         try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            if message_type == 'get_recent_data':
-                await self.send_recent_data()
-            elif message_type == 'search_danmaku':
-                keyword = data.get('keyword', '')
-                await self.search_and_send_danmaku(keyword)
-            elif message_type == 'ping':
-                await self.send(text_data=json.dumps({
-                    'type': 'pong',
-                    'timestamp': data.get('timestamp')
-                }))
-                
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': '消息格式错误'
-            }))
-        except Exception as e:
-            logger.error(f"处理WebSocket消息失败: {e}")
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': str(e)
-            }))
+            return int(query['resume_from'][0])
+        except (KeyError, IndexError, ValueError):
+            return None
+    
+    async def send_resumed_events(self, resume_from):
+        """补发resume_from之后的事件；错过太多或已被裁剪时返回False"""
+        danmaku_service = get_async_danmaku_service()
+        events = await danmaku_service.get_room_events_since(self.room_id, resume_from, WS_RESUME_MAX_EVENTS)
+        if events is None:
+            return False
+        
+        self.last_seq = events[-1]['seq'] if events else resume_from
+        await self.send_json({
+            'type': 'resumed',
+            'seq': self.last_seq,
+            'data': live_update_data(events)
+        })
+        return True
     
     async def send_initial_data(self):
-        """发送初始数据"""
+        """发送初始数据（seq为其中包含的最大事件ID，之后只推送更新的事件）"""
         try:
-            danmaku_service = DanmakuService()
+            danmaku_service = get_async_danmaku_service()
+            
+            # 先读取当前事件ID：更新的事件一定会经实时推送到达，初始数据中只保留不超过它的部分
+            current_seq = await danmaku_service.get_room_event_seq(self.room_id)
             
             # 获取房间统计
-            room_stats = danmaku_service.get_room_stats(self.room_id)
+            room_stats = await danmaku_service.get_room_stats(self.room_id)
             
             # 获取最近弹幕
-            recent_danmaku = danmaku_service.get_recent_danmaku(self.room_id, 20)
+            recent_danmaku = await danmaku_service.get_recent_danmaku(self.room_id, 20)
             
             # 获取最近礼物
-            recent_gifts = danmaku_service.get_recent_gifts(self.room_id, 10)
+            recent_gifts = await danmaku_service.get_recent_gifts(self.room_id, 10)
+            
+            def known(item):
+                return not item.get('seq') or item['seq'] <= current_seq
             
-            await self.send(text_data=json.dumps({
+            self.last_seq = current_seq
+            await self.send_json({
                 'type': 'initial_data',
+                'seq': current_seq,
                 'data': {
                     'room_stats': room_stats,
-                    'recent_danmaku': recent_danmaku,
-                    'recent_gifts': recent_gifts
+                    'recent_danmaku': [item for item in recent_danmaku if known(item)],
+                    'recent_gifts': [item for item in recent_gifts if known(item)]
                 }
-            }))
+            })
             
         except Exception as e:
             logger.error(f"发送初始数据失败: {e}")
@@ -125,22 +302,22 @@ class LiveDataConsumer(AsyncWebsocketConsumer):
     async def send_recent_data(self):
         """发送最近数据"""
         try:
-            danmaku_service = DanmakuService()
+            danmaku_service = get_async_danmaku_service()
             
             # 获取最新弹幕
-            recent_danmaku = danmaku_service.get_recent_danmaku(self.room_id, 20)
+            recent_danmaku = await danmaku_service.get_recent_danmaku(self.room_id, 20)
             
             # 获取最新礼物
-            recent_gifts = danmaku_service.get_recent_gifts(self.room_id, 10)
+            recent_gifts = await danmaku_service.get_recent_gifts(self.room_id, 10)
             
-            await self.send(text_data=json.dumps({
+            await self.send_json({
                 'type': 'recent_data',
                 'data': {
                     'recent_danmaku': recent_danmaku,
                     'recent_gifts': recent_gifts,
                     'timestamp': asyncio.get_event_loop().time()
                 }
-            }))
+            })
             
         except Exception as e:
             logger.error(f"发送最近数据失败: {e}")
@@ -148,107 +325,280 @@ class LiveDataConsumer(AsyncWebsocketConsumer):
     async def search_and_send_danmaku(self, keyword):
         """搜索并发送弹幕"""
         try:
-            danmaku_service = DanmakuService()
+            danmaku_service = get_async_danmaku_service()
             
-            search_results = danmaku_service.search_danmaku(
+            search_results = await danmaku_service.search_danmaku(
                 self.room_id, keyword=keyword, limit=50
             )
             
-            await self.send(text_data=json.dumps({
+            await self.send_json({
                 'type': 'search_results',
                 'data': {
                     'keyword': keyword,
                     'results': search_results,
                     'count': len(search_results)
                 }
-            }))
+            })
             
         except Exception as e:
             logger.error(f"搜索弹幕失败: {e}")
     
     async def start_monitoring(self):
-        """开始实时监控"""
+        """开始实时推送：登记到本进程的事件转发器，新事件经房间组推送过来"""
         if not self.is_monitoring:
             self.is_monitoring = True
-            self.monitor_task = asyncio.create_task(self.monitor_redis_data())
+            get_channel_layer_relay().acquire()
     
     async def stop_monitoring(self):
-        """停止实时监控"""
-        self.is_monitoring = False
-        if self.monitor_task:
-            self.monitor_task.cancel()
-            try:
-                await self.monitor_task
-            except asyncio.CancelledError:
-                pass
-    
-    async def monitor_redis_data(self):
-        """监控Redis数据变化"""
-        last_danmaku_count = 0
-        last_gift_count = 0
-        
-        while self.is_monitoring:
-            try:
-                # 检查弹幕数量变化
-                danmaku_key = f"room:{self.room_id}:danmaku"
-                current_danmaku_count = self.redis_client.llen(danmaku_key)
-                
-                # 检查礼物数量变化
-                gift_key = f"room:{self.room_id}:gifts"
-                current_gift_count = self.redis_client.llen(gift_key)
-                
-                # 如果有新数据，发送更新
-                if (current_danmaku_count > last_danmaku_count or 
-                    current_gift_count > last_gift_count):
-                    
-                    await self.send_live_update(
-                        new_danmaku=current_danmaku_count > last_danmaku_count,
-                        new_gifts=current_gift_count > last_gift_count
-                    )
-                    
-                    last_danmaku_count = current_danmaku_count
-                    last_gift_count = current_gift_count
-                
-                # 每2秒检查一次
-                await asyncio.sleep(2)
-                
-            except Exception as e:
-                logger.error(f"监控Redis数据失败: {e}")
-                await asyncio.sleep(5)
-    
-    async def send_live_update(self, new_danmaku=False, new_gifts=False):
-        """发送实时更新"""
-        try:
-            danmaku_service = DanmakuService()
-            update_data = {}
-            
-            if new_danmaku:
-                # 获取最新弹幕
-                latest_danmaku = danmaku_service.get_recent_danmaku(self.room_id, 5)
-                update_data['new_danmaku'] = latest_danmaku
-            
-            if new_gifts:
-                # 获取最新礼物
-                latest_gifts = danmaku_service.get_recent_gifts(self.room_id, 3)
-                update_data['new_gifts'] = latest_gifts
-            
-            # 总是更新统计数据
-            room_stats = danmaku_service.get_room_stats(self.room_id)
-            update_data['room_stats'] = room_stats
-            
-            await self.send(text_data=json.dumps({
-                'type': 'live_update',
-                'data': update_data,
-                'timestamp': asyncio.get_event_loop().time()
-            }))
-            
-        except Exception as e:
-            logger.error(f"发送实时更新失败: {e}")
+        """停止实时推送"""
+        if self.is_monitoring:
+            self.is_monitoring = False
+            get_channel_layer_relay().release()
+    
+    async def live_event(self, event):
+        """处理转发器发到房间组的实时事件：只推送比已发送内容更新的事件，发现缺口时从Redis补齐"""
+        live_event = event['event']
+        seq = live_event['data'].get('seq') if live_event['type'] in (EVENT_DANMAKU, EVENT_GIFT) else None
+        
+        if seq is None:
+            events = [live_event]
+        elif seq <= self.last_seq:
+            return
+        elif seq == self.last_seq + 1:
+            events = [live_event]
+        else:
+            # 转发过程中丢失了事件（或初始数据之后、推送开始之前有新事件），按事件ID补齐
+            danmaku_service = get_async_danmaku_service()
+            events = await danmaku_service.get_room_events_since(self.room_id, self.last_seq, WS_RESUME_MAX_EVENTS)
+            if events is None:
+                self.frames.discard()
+                await self.send_initial_data()
+                return
+            if not events:
+                return
+        
+        for item in events:
+            if item['type'] in (EVENT_DANMAKU, EVENT_GIFT):
+                self.last_seq = max(self.last_seq, item['data'].get('seq') or 0)
+            self.frames.add(self.room_id, item['type'], item['data'])
+    
+    async def send_live_frame(self, rooms):
+        """按帧节拍推送合并后的实时事件：counts为本帧内的精确计数，dropped为抽样丢弃的弹幕/礼物数"""
+        frame = rooms[self.room_id]
+        await self.send_json({
+            'type': 'live_update',
+            'seq': self.last_seq,
+            'data': frame['data'],
+            'counts': frame['counts'],
+            'dropped': frame['dropped']
+        })
     
     # 群组消息处理
     async def room_message(self, event):
         """处理房间群组消息"""
-        await self.send(text_data=json.dumps({
+        await self.send_json({
             'type': 'room_message',
             'data': event['data']
-        }))
\ No newline at end of file
+        })
+
+
+class MultiRoomConsumer(LivePushConsumer):
+    """多房间WebSocket消费者：一个连接订阅多个房间（或全部房间），每个订阅单独设置过滤条件
+    
+    客户端消息：
+        {"type": "subscribe", "rooms": [1, 2] | "all", "filters": {...}, "resume_from": {"1": seq}}
+        {"type": "unsubscribe", "rooms": [1] | "all"}
+        {"type": "set_rate", "max_rate": 100}   # 0或null恢复不限速
+    
+    实时事件按帧推送：{"type": "live_update", "rooms": {room_id: {"seq", "data", "counts", "dropped"}}}
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subscriptions = {}  # 房间ID或'all' -> SubscriptionFilter
+        self.last_seqs = {}      # 房间ID -> 已推送给客户端的最大事件ID
+        self.is_monitoring = False
+    
+    async def connect(self):
+        """WebSocket连接"""
+        if not await self.setup_push():
+            return
+        await self.accept()
+        self.send_encoding_handshake()
+        self.is_monitoring = True
+        get_channel_layer_relay().acquire()
+    
+    async def disconnect(self, close_code):
+        """WebSocket断开连接"""
+        for group in self.subscribed_groups():
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if self.is_monitoring:
+            self.is_monitoring = False
+            get_channel_layer_relay().release()
+        self.close_push()
+    
+    async def send_live_frame(self, rooms):
+        """按帧节拍推送所有房间合并后的实时事件"""
+        await self.send_json({
+            'type': 'live_update',
+            'rooms': rooms
+        })
+    
+    def subscribed_groups(self):
+        """当前订阅需要加入的组：订阅了全部房间时只加入全部房间组"""
+        if 'all' in self.subscriptions:
+            return {ALL_ROOMS_GROUP_NAME}
+        return {room_group_name(room_id) for room_id in self.subscriptions}
+    
+    async def update_groups(self, before):
+        """按订阅变化加入/离开组"""
+        after = self.subscribed_groups()
+        for group in before - after:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in after - before:
+            await self.channel_layer.group_add(group, self.channel_name)
+    
+    async def handle_message(self, message_type, data):
+        """处理多房间连接的客户端消息"""
+        if message_type == 'subscribe':
+            await self.subscribe(data)
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(data)
+        else:
+            await super().handle_message(message_type, data)
+    
+    async def subscribe(self, data):
+        """订阅房间：加入对应的组后一次性返回这些房间的初始数据（或续传的事件）"""
+        rooms = data.get('rooms')
+        subscription_filter = SubscriptionFilter.from_message(data)
+        before = self.subscribed_groups()
+        
+        if rooms == 'all':
+            self.subscriptions['all'] = subscription_filter
+            await self.update_groups(before)
+            await self.send_json({
+                'type': 'subscribed',
+                'all': True,
+                'filters': subscription_filter.to_dict(),
+                'rooms': {}
+            })
+            return
+        
+        room_ids = list(dict.fromkeys(int(room_id) for room_id in rooms or []))
+        subscribed_rooms = {key for key in self.subscriptions if key != 'all'} | set(room_ids)
+        if len(subscribed_rooms) > WS_MAX_SUBSCRIBED_ROOMS:
+            raise ValueError(f'最多订阅 {WS_MAX_SUBSCRIBED_ROOMS} 个房间')
+        
+        for room_id in room_ids:
+            self.subscriptions[room_id] = subscription_filter
+        await self.update_groups(before)
+        
+        await self.send_json({
+            'type': 'subscribed',
+            'all': 'all' in self.subscriptions,
+            'filters': subscription_filter.to_dict(),
+            'rooms': await self.room_snapshots(room_ids, subscription_filter, data.get('resume_from') or {})
+        })
+    
+    async def unsubscribe(self, data):
+        """取消订阅"""
+        rooms = data.get('rooms')
+        before = self.subscribed_groups()
+        
+        if rooms == 'all':
+            removed = ['all']
+        else:
+            removed = [int(room_id) for room_id in rooms or []]
+        for key in removed:
+            self.subscriptions.pop(key, None)
+            self.last_seqs.pop(key, None)
+        if 'all' not in self.subscriptions:
+            # 仍被'all'覆盖的房间继续推送，只丢弃不再被任何订阅覆盖的房间的缓冲事件
+            self.last_seqs = {key: seq for key, seq in self.last_seqs.items() if key in self.subscriptions}
+            self.frames.retain(self.subscriptions)
+        await self.update_groups(before)
+        
+        await self.send_json({
+            'type': 'unsubscribed',
+            'rooms': removed
+        })
+    
+    async def room_snapshots(self, room_ids, subscription_filter, resume_from):
+        """批量读取房间初始数据；resume_from中给出事件ID的房间只补发错过的事件"""
+        danmaku_service = get_async_danmaku_service()
+        snapshots = {}
+        
+        resume_rooms = [room_id for room_id in room_ids if str(room_id) in resume_from]
+        resumed = await asyncio.gather(*(
+            danmaku_service.get_room_events_since(room_id, int(resume_from[str(room_id)]), WS_RESUME_MAX_EVENTS)
+            for room_id in resume_rooms
+        ))
+        for room_id, events in zip(resume_rooms, resumed):
+            if events is None:
+                continue
+            self.last_seqs[room_id] = events[-1]['seq'] if events else int(resume_from[str(room_id)])
+            snapshots[room_id] = {
+                'resumed': True,
+                'seq': self.last_seqs[room_id],
+                **live_update_data([event for event in events if subscription_filter.allows(event['type'], event['data'])])
+            }
+        
+        fresh_rooms = [room_id for room_id in room_ids if room_id not in snapshots]
+        if not fresh_rooms:
+            return snapshots
+        
+        # 先读取事件ID，再用一个pipeline取回所有房间的最新弹幕和礼物
+        seqs = await danmaku_service.get_room_event_seqs(fresh_rooms)
+        feed = await danmaku_service.get_rooms_feed(fresh_rooms, 20, 10)
+        stats = await danmaku_service.get_rooms_bulk_stats(fresh_rooms)
+        
+        for room_id in fresh_rooms:
+            current_seq = seqs.get(room_id, 0)
+            room_feed = feed.get(room_id, {'danmaku': [], 'gifts': []})
+            
+            def visible(event_type, item):
+                known = not item.get('seq') or item['seq'] <= current_seq
+                return known and subscription_filter.allows(event_type, item)
+            
+            self.last_seqs[room_id] = current_seq
+            snapshots[room_id] = {
+                'resumed': False,
+                'seq': current_seq,
+                'room_stats': stats[room_id].to_dict() if room_id in stats else {},
+                'recent_danmaku': [item for item in room_feed['danmaku'] if visible(EVENT_DANMAKU, item)],
+                'recent_gifts': [item for item in room_feed['gifts'] if visible(EVENT_GIFT, item)],
+            }
+        return snapshots
+    
+    async def live_event(self, event):
+        """处理转发器发到组内的实时事件：按订阅过滤，按房间事件ID去重，单独订阅的房间发现缺口时补齐"""
+        live_event = event['event']
+        room_id = live_event['room_id']
+        subscription_filter = self.subscriptions.get(room_id) or self.subscriptions.get('all')
+        if subscription_filter is None:
+            return
+        
+        seq = live_event['data'].get('seq') if live_event['type'] in (EVENT_DANMAKU, EVENT_GIFT) else None
+        events = [live_event]
+        if seq is not None:
+            last_seq = self.last_seqs.get(room_id)
+            if last_seq is not None and seq <= last_seq:
+                return
+            if last_seq is not None and seq > last_seq + 1 and room_id in self.subscriptions:
+                danmaku_service = get_async_danmaku_service()
+                events = await danmaku_service.get_room_events_since(room_id, last_seq, WS_RESUME_MAX_EVENTS)
+                if events is None:
+                    # 缺口无法补齐，丢弃缓冲中的事件并重新发送该房间的初始数据
+                    self.frames.discard(room_id)
+                    await self.send_json({
+                        'type': 'subscribed',
+                        'all': 'all' in self.subscriptions,
+                        'filters': subscription_filter.to_dict(),
+                        'rooms': await self.room_snapshots([room_id], subscription_filter, {})
+                    })
+                    return
+            self.last_seqs[room_id] = max([seq] + [item['seq'] for item in events if item.get('seq')])
+        
+        for item in events:
+            if subscription_filter.allows(item['type'], item['data']):
+                self.frames.add(room_id, item['type'], item['data'])
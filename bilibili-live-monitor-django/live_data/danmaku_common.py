@@ -0,0 +1,591 @@
+"""
+弹幕数据服务公共部分 - 同步/异步服务共用
+
+Redis键、pipeline命令的组装以及返回结果的解析和格式化都在这里实现，
+DanmakuService 和 AsyncDanmakuService 只负责发出请求（直接调用或await），两边的返回格式始终一致。
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional
+
+from django.utils import timezone
+
+from utils.serialization import loads
+from utils.room_summary import (
+    ROOM_SUMMARY_KEY, ROOM_VERSION_KEY, ROOMS_VERSION_KEY, ROOMS_SUMMARY_VERSION_KEY,
+    ROOM_SORT_KEY, ROOMS_OVERVIEW_KEY, ROOM_SORT_FIELDS, ROOM_STATUS_FILTERS,
+    build_room_detail, build_room_stats, build_room_summary, summary_sort_key,
+)
+from utils.danmaku_index import (
+    DANMAKU_BYID_KEY, DANMAKU_TOKEN_KEY, ALL_TOKEN,
+    keyword_query_tokens, username_query_token, uid_token,
+)
+
+logger = logging.getLogger(__name__)
+
+# Redis键
+ROOM_INFO_KEY = 'room:{room_id}:info'
+ROOM_CURRENT_KEY = 'room:{room_id}:current'
+ROOM_STATS_KEY = 'room:{room_id}:stats'
+ROOM_DANMAKU_KEY = 'room:{room_id}:danmaku'
+ROOM_GIFTS_KEY = 'room:{room_id}:gifts'
+ACTIVE_ROOMS_KEY = 'rooms:active'
+ROOM_INFO_PATTERN = 'room:*:info'
+
+# 快照缺失时现场构建的最大房间数，避免性能问题
+FALLBACK_MAX_ROOMS = 200
+# since_seq增量读取时每次LRANGE的条数
+SINCE_PAGE_SIZE = 200
+
+
+def _to_int(value, default: int = 0) -> int:
+    """宽松地把Redis字符串转换为整数"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass
+class RoomStatsSummary:
+    """房间统计摘要（批量统计接口的返回类型）"""
+    room_id: int
+    uname: str = ''
+    title: str = ''
+    area_name: str = ''
+    live_status: int = 0
+    online: int = 0
+    is_verified: bool = False
+    is_active: bool = False
+    danmaku_count: int = 0
+    gift_count: int = 0
+    last_update: str = ''
+    last_danmaku_time: Optional[str] = None
+    last_gift_time: Optional[str] = None
+
+    @classmethod
+    def from_redis(cls, room_id: int, room_info: Dict, current_data: Dict, room_stats: Dict,
+                   danmaku_count: int, gift_count: int) -> 'RoomStatsSummary':
+        """由pipeline返回的原始Redis数据构造摘要"""
+        return cls(
+            room_id=room_id,
+            uname=room_info.get('uname', f'主播{room_id}'),
+            title=room_info.get('title', f'直播间{room_id}'),
+            area_name=room_info.get('area_name', ''),
+            live_status=_to_int(room_info.get('live_status', 0)),
+            online=_to_int(current_data.get('online', room_info.get('online', 0))),
+            is_verified=str(room_info.get('is_verified', '')).lower() in ['true', '1', 'yes'],
+            is_active=bool(current_data),
+            danmaku_count=danmaku_count or 0,
+            gift_count=gift_count or 0,
+            last_update=current_data.get('last_update', room_info.get('updated_at', '')),
+            last_danmaku_time=room_stats.get('last_danmaku_time'),
+            last_gift_time=room_stats.get('last_gift_time'),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        return asdict(self)
+
+
+# ---------- 数据格式化 ----------
+
+def format_danmaku(room_id: int, danmaku_data: Dict) -> Dict:
+    """标准化弹幕数据格式"""
+    return {
+        'username': danmaku_data.get('username', danmaku_data.get('user', '未知用户')),
+        'message': danmaku_data.get('message', danmaku_data.get('content', '')),
+        'timestamp': danmaku_data.get('timestamp', danmaku_data.get('send_time', '')),
+        'user_level': danmaku_data.get('user_level', 0),
+        'send_time_formatted': danmaku_data.get('send_time_formatted', ''),
+        'room_id': room_id,
+        'seq': danmaku_data.get('seq'),  # 房间内递增的事件ID，旧数据为None
+    }
+
+
+def format_gift(room_id: int, gift_data: Dict) -> Dict:
+    """标准化礼物数据格式"""
+    return {
+        'username': gift_data.get('username', '未知用户'),
+        'gift_name': gift_data.get('gift_name', '未知礼物'),
+        'num': gift_data.get('num', 1),
+        'price': gift_data.get('price', 0),
+        'coin_type': gift_data.get('coin_type', 'silver'),
+        'timestamp': gift_data.get('timestamp', ''),
+        'gift_time_formatted': gift_data.get('gift_time_formatted', ''),
+        'room_id': room_id,
+        'seq': gift_data.get('seq'),  # 房间内递增的事件ID，旧数据为None
+    }
+
+
+def decode_feed_items(room_id: int, raw_items: List, formatter) -> List[Dict]:
+    """解析列表头部的JSON记录并标准化，跳过无法解析的条目"""
+    results = []
+    for raw in raw_items or []:
+        try:
+            results.append(formatter(room_id, loads(raw)))
+        except (ValueError, TypeError):
+            continue
+    return results
+
+
+def decode_recent_items(room_id: int, raw_items: List, formatter) -> List[Dict]:
+    """解析最近弹幕/礼物列表（按时间倒序），记录解析失败的条目"""
+    results = []
+    for raw in raw_items or []:
+        try:
+            results.append(formatter(room_id, loads(raw)))
+        except (ValueError, TypeError):
+            logger.warning(f"房间 {room_id} 列表记录JSON解析失败: {str(raw)[:100]}...")
+    return results
+
+
+class SinceReader:
+    """since_seq增量读取：按页喂入按时间倒序的列表记录，收集since_seq之后最早的limit条
+
+    结果按事件ID升序返回，客户端以最后一条的seq作为下一次的since，积压超过limit条时分多次取完而不会漏掉事件。
+    用法：while not reader.feed(LRANGE(key, reader.start, reader.stop)): pass
+    """
+
+    def __init__(self, room_id: int, formatter, since_seq: int, limit: int):
+        self.room_id = room_id
+        self.formatter = formatter
+        self.since_seq = since_seq
+        self.start = 0
+        self._oldest = deque(maxlen=max(limit, 1))  # 只保留读到的最旧的limit条
+        self._min_seq = None
+
+    @property
+    def stop(self) -> int:
+        return self.start + SINCE_PAGE_SIZE - 1
+
+    def feed(self, raw_items: List) -> bool:
+        """处理一页记录，返回是否已经读到since_seq或列表末尾"""
+        for raw in raw_items or []:
+            try:
+                data = loads(raw)
+            except (ValueError, TypeError):
+                logger.warning(f"房间 {self.room_id} 列表记录JSON解析失败: {str(raw)[:100]}...")
+                continue
+            seq = _to_int(data.get('seq'), -1)
+            if seq <= self.since_seq:
+                return True
+            # 翻页期间有新写入时整个列表后移，跳过重复读到的记录
+            if self._min_seq is not None and seq >= self._min_seq:
+                continue
+            self._min_seq = seq
+            self._oldest.append(self.formatter(self.room_id, data))
+        self.start += SINCE_PAGE_SIZE
+        return len(raw_items or []) < SINCE_PAGE_SIZE
+
+    def result(self) -> List[Dict]:
+        """since_seq之后最早的limit条，按事件ID升序"""
+        return list(reversed(self._oldest))
+
+
+def format_search_result(room_id: int, danmaku_data: Dict) -> Dict:
+    """标准化搜索结果格式"""
+    return {
+        'username': danmaku_data.get('username', danmaku_data.get('user', '未知用户')),
+        'message': danmaku_data.get('message', danmaku_data.get('content', '')),
+        'timestamp': danmaku_data.get('timestamp', danmaku_data.get('send_time', '')),
+        'send_time_formatted': danmaku_data.get('send_time_formatted', ''),
+        'room_id': room_id,
+    }
+
+
+def format_position_result(room_id: int, danmaku_data: Dict, position: tuple) -> Dict:
+    """跨房间搜索结果，附带UID、seq和归并位置"""
+    result = format_search_result(room_id, danmaku_data)
+    result.update({'uid': danmaku_data.get('uid', 0), 'seq': position[2], 'position': position})
+    return result
+
+
+def basic_room_info(room_id: int, detailed_info: Dict) -> Dict:
+    """从房间详细信息中取出基本信息字段"""
+    return {
+        'room_id': detailed_info.get('room_id', room_id),
+        'title': detailed_info.get('title', ''),
+        'uname': detailed_info.get('uname', ''),
+        'uid': detailed_info.get('uid', 0),
+        'live_status': detailed_info.get('live_status', 0),
+        'online': detailed_info.get('online', 0),
+        'area_name': detailed_info.get('area_name', ''),
+        'parent_area_name': detailed_info.get('parent_area_name', ''),
+        'face': detailed_info.get('face', ''),
+        'cover': detailed_info.get('cover', ''),
+        'attention': detailed_info.get('attention', 0),
+        'is_verified': detailed_info.get('is_verified', False),
+        'gender_text': detailed_info.get('gender_text', '未知')
+    }
+
+
+# ---------- 系统统计 ----------
+
+def error_system_stats(message: str) -> Dict:
+    """Redis不可用时的系统统计"""
+    return {
+        'redis_status': 'error',
+        'redis_message': message,
+        'total_rooms': 0,
+        'active_rooms': 0,
+        'total_danmaku': 0,
+        'total_gifts': 0,
+        'verified_users': 0,
+        'total_online': 0
+    }
+
+
+def build_system_stats(rooms: List[RoomStatsSummary]) -> Dict:
+    """由批量房间统计汇总系统统计"""
+    total_rooms = len(rooms)
+    active_rooms = len([r for r in rooms if r.live_status == 1])
+    verified_users = len([r for r in rooms if r.is_verified])
+    total_danmaku = sum(r.danmaku_count for r in rooms)
+    total_gifts = sum(r.gift_count for r in rooms)
+    total_online = sum(r.online for r in rooms)
+
+    return {
+        'redis_status': 'connected',
+        'redis_message': '连接正常',
+        'total_rooms': total_rooms,
+        'active_rooms': active_rooms,
+        'offline_rooms': total_rooms - active_rooms,
+        'verified_users': verified_users,
+        'total_danmaku': total_danmaku,
+        'total_gifts': total_gifts,
+        'total_online': total_online,
+        'avg_popularity': round(total_online / max(total_rooms, 1), 2),
+        'last_update': timezone.now().isoformat()
+    }
+
+
+def build_available_rooms(summaries: List[RoomStatsSummary]) -> List[Dict]:
+    """按在线人数和弹幕活跃度排序（与房间列表一致），转换为简化格式以保持兼容性"""
+    summaries = sorted(summaries, key=lambda r: r.online * 1000 + r.danmaku_count, reverse=True)
+    return [
+        {
+            'room_id': room.room_id,
+            'title': room.title,
+            'uname': room.uname,
+            'online': room.online,
+            'live_status': room.live_status,
+            'area_name': room.area_name,
+            'danmaku_count': room.danmaku_count,
+            'gift_count': room.gift_count
+        }
+        for room in summaries
+    ]
+
+
+# ---------- 房间数据：pipeline组装与结果解析 ----------
+
+def parse_room_ids(room_ids) -> List[int]:
+    """rooms:active成员或SCAN出的ID转换为升序整数列表"""
+    return sorted(int(room_id) for room_id in room_ids if str(room_id).isdigit())
+
+
+def room_id_from_info_key(key: str) -> Optional[str]:
+    """从 room:{id}:info 键名中取出房间ID"""
+    parts = key.split(':')
+    return parts[1] if len(parts) >= 3 else None
+
+
+def queue_room_stats(pipe, room_id: int):
+    """房间弹幕统计的5条命令：弹幕/礼物列表长度、统计Hash、列表头部"""
+    pipe.llen(ROOM_DANMAKU_KEY.format(room_id=room_id))
+    pipe.llen(ROOM_GIFTS_KEY.format(room_id=room_id))
+    pipe.hgetall(ROOM_STATS_KEY.format(room_id=room_id))
+    pipe.lindex(ROOM_DANMAKU_KEY.format(room_id=room_id), 0)
+    pipe.lindex(ROOM_GIFTS_KEY.format(room_id=room_id), 0)
+
+
+def queue_room_details(pipe, room_ids: List[int]):
+    """批量房间详情：每个房间6条命令（info + 弹幕统计）"""
+    for room_id in room_ids:
+        pipe.hgetall(ROOM_INFO_KEY.format(room_id=room_id))
+        queue_room_stats(pipe, room_id)
+
+
+def parse_room_details(room_ids: List[int], results: List):
+    """解析 queue_room_details 的结果，逐个产出 (room_id, detail)，出错或不存在的房间跳过"""
+    for index, room_id in enumerate(room_ids):
+        room_info, *stats_results = results[index * 6:index * 6 + 6]
+
+        # 单个键出错（如类型不匹配）时跳过该房间，不影响整体
+        if any(isinstance(r, Exception) for r in (room_info, *stats_results)):
+            logger.warning(f"房间 {room_id} 批量详情存在错误结果，已跳过")
+            continue
+        if not room_info:
+            continue
+
+        yield room_id, build_room_detail(room_info, build_room_stats(*stats_results))
+
+
+def queue_bulk_stats(pipe, room_ids: List[int]):
+    """批量房间统计：每个房间5条命令"""
+    for room_id in room_ids:
+        pipe.hgetall(ROOM_INFO_KEY.format(room_id=room_id))
+        pipe.hgetall(ROOM_CURRENT_KEY.format(room_id=room_id))
+        pipe.hgetall(ROOM_STATS_KEY.format(room_id=room_id))
+        pipe.llen(ROOM_DANMAKU_KEY.format(room_id=room_id))
+        pipe.llen(ROOM_GIFTS_KEY.format(room_id=room_id))
+
+
+def parse_bulk_stats(room_ids: List[int], results: List) -> Dict[int, RoomStatsSummary]:
+    """解析 queue_bulk_stats 的结果"""
+    summaries = {}
+    for index, room_id in enumerate(room_ids):
+        room_info, current_data, room_stats, danmaku_count, gift_count = results[index * 5:index * 5 + 5]
+
+        # 单个键出错（如类型不匹配）时跳过该房间，不影响整体
+        if any(isinstance(r, Exception) for r in (room_info, current_data, room_stats, danmaku_count, gift_count)):
+            logger.warning(f"房间 {room_id} 批量统计存在错误结果，已跳过")
+            continue
+        if not room_info:
+            continue
+
+        summaries[int(room_id)] = RoomStatsSummary.from_redis(
+            int(room_id), room_info, current_data, room_stats, danmaku_count, gift_count
+        )
+    return summaries
+
+
+def queue_rooms_feed(pipe, room_ids: List[int], danmaku_limit: int, gift_limit: int):
+    """多个房间的最新弹幕和礼物：每个房间2条命令"""
+    for room_id in room_ids:
+        pipe.lrange(ROOM_DANMAKU_KEY.format(room_id=room_id), 0, danmaku_limit - 1)
+        pipe.lrange(ROOM_GIFTS_KEY.format(room_id=room_id), 0, gift_limit - 1)
+
+
+def parse_rooms_feed(room_ids: List[int], results: List) -> Dict[int, Dict[str, List[Dict]]]:
+    """解析 queue_rooms_feed 的结果为 {room_id: {'danmaku', 'gifts'}}"""
+    feed = {}
+    for index, room_id in enumerate(room_ids):
+        danmaku_list, gift_list = results[index * 2:index * 2 + 2]
+        feed[room_id] = {
+            'danmaku': [] if isinstance(danmaku_list, Exception) else decode_feed_items(room_id, danmaku_list, format_danmaku),
+            'gifts': [] if isinstance(gift_list, Exception) else decode_feed_items(room_id, gift_list, format_gift),
+        }
+    return feed
+
+
+def normalize_rooms_query(sort_by: str, status: str) -> tuple:
+    """房间列表的排序键和状态筛选，未知值按默认处理"""
+    if sort_by not in ROOM_SORT_FIELDS:
+        sort_by = 'popularity'
+    if status not in ROOM_STATUS_FILTERS:
+        status = 'all'
+    return sort_by, status
+
+
+def queue_rooms_page(pipe, sort_by: str, status: str, offset: int, limit: int):
+    """分页索引的4条命令：索引是否存在、总数、当前页房间ID、整体统计"""
+    sort_by, status = normalize_rooms_query(sort_by, status)
+    index_key = ROOM_SORT_KEY.format(sort_by=sort_by, status=status)
+    pipe.exists(ROOM_SORT_KEY.format(sort_by='popularity', status='all'))
+    pipe.zcard(index_key)
+    pipe.zrevrange(index_key, offset, offset + limit - 1)
+    pipe.get(ROOMS_OVERVIEW_KEY)
+
+
+def room_summary_keys(room_ids: List) -> List[str]:
+    """房间摘要键列表（MGET使用）"""
+    return [ROOM_SUMMARY_KEY.format(room_id=room_id) for room_id in room_ids]
+
+
+def build_rooms_page(summaries: List, total_count: int, overview) -> Dict[str, Any]:
+    """由MGET取回的摘要组装一页房间"""
+    return {
+        'rooms': [loads(raw) for raw in summaries if raw],
+        'total_count': total_count,
+        'overview': loads(overview) if overview else None,
+    }
+
+
+def parse_rooms_snapshot(snapshot) -> Optional[List[Dict]]:
+    """解析收集器维护的全量房间快照，缺失或损坏时返回None"""
+    if not snapshot:
+        return None
+    try:
+        return loads(snapshot)['rooms']
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"房间快照解析失败，回退到逐个构建: {e}")
+        return None
+
+
+def build_rooms_from_details(room_ids: List[int], details: List[Dict]) -> List[Dict]:
+    """快照缺失时由逐个房间的详情构建摘要，按在线人数和弹幕活跃度排序"""
+    now = timezone.now().isoformat()
+    rooms = [
+        build_room_summary(room_id, detail, now)
+        for room_id, detail in zip(room_ids, details) if detail
+    ]
+    rooms.sort(key=summary_sort_key, reverse=True)
+    return rooms
+
+
+def data_version_keys(room_id: Optional[int] = None) -> List[str]:
+    """全局/摘要（及指定房间）的版本号键"""
+    keys = [ROOMS_VERSION_KEY, ROOMS_SUMMARY_VERSION_KEY]
+    if room_id is not None:
+        keys.append(ROOM_VERSION_KEY.format(room_id=room_id))
+    return keys
+
+
+def parse_data_versions(values: List, room_id: Optional[int] = None) -> Dict[str, int]:
+    """解析 data_version_keys 的MGET结果"""
+    values = [_to_int(value) for value in values]
+    versions = {'data': values[0], 'summary': values[1]}
+    if room_id is not None:
+        versions['room'] = values[2]
+    return versions
+
+
+# ---------- 搜索：索引选择与结果解析 ----------
+
+def search_matcher(keyword: str = None, username: str = None, uid: int = None, match_all: bool = False):
+    """构造搜索条件校验函数：单房间搜索任一条件命中即可，跨房间搜索要求全部命中"""
+    keyword_text = keyword.strip().lower() if keyword else ''
+    username_text = username.strip().lower() if username else ''
+    uid_text = str(uid) if uid else ''
+
+    def is_match(danmaku_data: Dict) -> bool:
+        checks = []
+        if keyword_text:
+            message = danmaku_data.get('message', danmaku_data.get('content', ''))
+            checks.append(keyword_text in message.lower())
+        if username_text:
+            user = danmaku_data.get('username', danmaku_data.get('user', ''))
+            checks.append(user.lower().startswith(username_text))
+        if uid_text:
+            checks.append(str(danmaku_data.get('uid', '')) == uid_text)
+        if not checks:
+            return match_all
+        return all(checks) if match_all else any(checks)
+
+    return is_match
+
+
+def scan_matches(room_id: int, raw_items: List, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
+    """线性扫描弹幕列表（索引无法覆盖的查询使用），任一条件包含匹配即命中"""
+    results = []
+    for raw in raw_items:
+        try:
+            danmaku_data = loads(raw)
+        except (ValueError, TypeError):
+            continue
+
+        message = danmaku_data.get('message', danmaku_data.get('content', ''))
+        user = danmaku_data.get('username', danmaku_data.get('user', ''))
+        if (keyword and keyword.lower() in message.lower()) or (username and username.lower() in user.lower()):
+            results.append(format_search_result(room_id, danmaku_data))
+
+        if len(results) >= limit:
+            break
+    return results
+
+
+def room_token_key(room_id: int, token: str) -> str:
+    """房间索引有序集合的键"""
+    return DANMAKU_TOKEN_KEY.format(room_id=room_id, token=token)
+
+
+def rarest_token_key(room_id: int, tokens: List[str], counts: List[int]) -> Optional[str]:
+    """命中数最少的索引键，命中数为0时返回None（交集必然为空）"""
+    rarest_count, rarest_token = min(zip(counts, tokens))
+    return room_token_key(room_id, rarest_token) if rarest_count else None
+
+
+def cross_room_tokens(keyword: str = None, username: str = None, uid: int = None) -> List[str]:
+    """跨房间搜索的索引片段；单字关键词或只有房间/时间条件时走时间索引"""
+    tokens = list(keyword_query_tokens(keyword)) if keyword else []
+    if username:
+        tokens.append(username_query_token(username))
+    if uid:
+        tokens.append(uid_token(uid))
+    return tokens or [ALL_TOKEN]
+
+
+def score_bounds(start_ms: int = None, end_ms: int = None, after: tuple = None) -> tuple:
+    """时间范围和翻页游标换算为有序集合的 (max_score, min_score)"""
+    max_score = end_ms if end_ms is not None else '+inf'
+    min_score = start_ms if start_ms is not None else '-inf'
+    if after:
+        max_score = after[0] if end_ms is None else min(after[0], end_ms)
+    return max_score, min_score
+
+
+def index_positions(room_id: int, items: List, after: tuple = None) -> List[tuple]:
+    """一页索引结果转换为倒序的 (score, room_id, seq)，只保留严格位于after之后的位置"""
+    # 同一毫秒内按seq数值排序，保证与归并顺序、游标比较一致
+    positions = sorted(((int(score), room_id, int(member)) for member, score in items), reverse=True)
+    if after:
+        after = tuple(after)
+        positions = [position for position in positions if position < after]
+    return positions
+
+
+def split_index_chunk(items: List, chunk_size: int) -> tuple:
+    """一页索引结果拆分为完整部分和边界分值
+
+    Redis在同一分值内按成员字典序排列（"9"排在"10"之前），按偏移分页会把同一毫秒的seq截断在两页之间。
+    页已满时去掉最后一个分值的成员，由调用方整段读取该分值后再按 (score, room_id, seq) 排序，
+    下一页从该分值之后（不含）开始；页未满时边界为None，遍历结束。
+    """
+    if len(items) < chunk_size:
+        return list(items), None
+    boundary = int(items[-1][1])
+    return [item for item in items if int(item[1]) > boundary], boundary
+
+
+def parse_matches(room_id: int, raw_items: List, is_match, limit: int) -> List[Dict]:
+    """解析按seq取回的弹幕本体并校验搜索条件"""
+    matches = []
+    for raw in raw_items:
+        if not raw:
+            continue
+        try:
+            danmaku_data = loads(raw)
+        except (ValueError, TypeError):
+            continue
+        if is_match(danmaku_data):
+            matches.append(format_search_result(room_id, danmaku_data))
+            if len(matches) >= limit:
+                break
+    return matches
+
+
+def queue_positions(pipe, positions: List[tuple]):
+    """按位置逐条取回弹幕本体"""
+    for _score, room_id, seq in positions:
+        pipe.hget(DANMAKU_BYID_KEY.format(room_id=room_id), seq)
+
+
+def parse_positions(positions: List[tuple], raw_items: List, is_match, limit: int) -> List[Dict]:
+    """解析 queue_positions 的结果并校验搜索条件"""
+    matches = []
+    for (score, room_id, seq), raw in zip(positions, raw_items):
+        if not raw:
+            continue
+        try:
+            danmaku_data = loads(raw)
+        except (ValueError, TypeError):
+            continue
+        if is_match(danmaku_data):
+            matches.append(format_position_result(room_id, danmaku_data, (score, room_id, seq)))
+            if len(matches) >= limit:
+                break
+    return matches
+
+
+def queue_window_starts(pipe, room_ids: List[int]):
+    """各房间时间索引中最早的一条"""
+    for room_id in room_ids:
+        pipe.zrange(room_token_key(room_id, ALL_TOKEN), 0, 0, withscores=True)
+
+
+def parse_window_starts(room_ids: List[int], results: List) -> Dict[int, int]:
+    """解析 queue_window_starts 的结果，没有索引的房间不返回"""
+    return {int(room_id): int(items[0][1]) for room_id, items in zip(room_ids, results) if items}
@@ -1,94 +1,259 @@
+import heapq
 import redis
-import json
 import logging
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from django.conf import settings
 from django.utils import timezone
 import time
 
+from utils.serialization import loads
+from utils.room_summary import (
+    ROOM_SUMMARY_KEY, ALL_ROOMS_SUMMARY_KEY, ROOM_VERSION_KEY,
+    build_room_detail, build_room_stats, build_room_summary,
+)
+from utils.danmaku_index import DANMAKU_BYID_KEY, keyword_query_tokens, username_query_token
+# 格式化与解析逻辑与异步服务共用，这里一并导出以兼容原有的导入路径
+from .danmaku_common import (
+    ROOM_INFO_KEY, ROOM_DANMAKU_KEY, ROOM_GIFTS_KEY, ACTIVE_ROOMS_KEY, ROOM_INFO_PATTERN, FALLBACK_MAX_ROOMS,
+    RoomStatsSummary, _to_int,
+    format_danmaku, format_gift, decode_feed_items, decode_recent_items, SinceReader, format_search_result, format_position_result,
+    basic_room_info, error_system_stats, build_system_stats, build_available_rooms, normalize_rooms_query,
+    parse_room_ids, room_id_from_info_key, queue_room_stats, queue_room_details, parse_room_details,
+    queue_bulk_stats, parse_bulk_stats, queue_rooms_feed, parse_rooms_feed, queue_rooms_page, room_summary_keys,
+    build_rooms_page, parse_rooms_snapshot, build_rooms_from_details, data_version_keys, parse_data_versions,
+    search_matcher, scan_matches, room_token_key, rarest_token_key, cross_room_tokens, score_bounds,
+    index_positions, split_index_chunk, parse_matches, queue_positions, parse_positions,
+    queue_window_starts, parse_window_starts,
+)
+
 logger = logging.getLogger(__name__)
 
+# 候选Redis地址，按顺序尝试
+REDIS_CANDIDATE_HOSTS = [
+    {'host': 'localhost', 'port': 6379, 'db': 0},
+    {'host': '127.0.0.1', 'port': 6379, 'db': 0},
+    {'host': 'redis', 'port': 6379, 'db': 0},  # Docker环境
+]
+
+# 健康检查与重连的最小间隔（秒）
+HEALTH_CHECK_INTERVAL = getattr(settings, 'DANMAKU_SERVICE_HEALTH_CHECK_INTERVAL', 10)
+RECONNECT_INTERVAL = getattr(settings, 'DANMAKU_SERVICE_RECONNECT_INTERVAL', 5)
+
+# 连接状态缓存与键空间采样配置
+KEYSPACE_STATUS_TTL = getattr(settings, 'DANMAKU_KEYSPACE_STATUS_TTL', 5)
+KEYSPACE_SAMPLE_INTERVAL = getattr(settings, 'DANMAKU_KEYSPACE_SAMPLE_INTERVAL', 30)
+KEYSPACE_SAMPLE_MAX_KEYS = getattr(settings, 'DANMAKU_KEYSPACE_SAMPLE_MAX_KEYS', 100000)
+
+# 批量房间详情每个pipeline包含的房间数
+BULK_ROOMS_CHUNK_SIZE = getattr(settings, 'DANMAKU_BULK_ROOMS_CHUNK_SIZE', 1000)
+
+
+class KeyspaceSampler:
+    """后台键空间采样器，用SCAN周期性统计room:*键数量，替代阻塞的KEYS
+
+    每次采样最多扫描 max_keys 个键，SCAN游标在两次采样之间保留，多次采样接力完成一整轮扫描；
+    一轮扫描完成时给出精确数量，未完成时按本轮已扫描部分的匹配比例外推。尚未采样时 room_keys 为None。
+    """
+    
+    def __init__(self, service: 'DanmakuService', prefix: str = 'room:'):
+        self.service = service
+        self.prefix = prefix
+        self.interval = KEYSPACE_SAMPLE_INTERVAL
+        self.max_keys = KEYSPACE_SAMPLE_MAX_KEYS
+        self.scan_count = 1000
+        self._stats = {'room_keys': None, 'estimated': True, 'sampled_at': None, 'status': 'pending'}
+        self._cursor = 0
+        self._pass_scanned = 0
+        self._pass_matched = 0
+        self._sample_lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+    
+    def start(self):
+        """启动后台采样线程（守护线程）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='KeyspaceSampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop_event.set()
+    
+    def get_stats(self) -> Dict:
+        """返回最近一次采样结果（status: pending/estimated/exact）"""
+        return dict(self._stats)
+    
+    def _run(self):
+        """采样循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"键空间采样失败: {e}")
+            self._stop_event.wait(self.interval)
+    
+    def sample(self) -> Dict:
+        """从上次的游标继续执行一次有上限的SCAN采样"""
+        if not self.service.ensure_connection():
+            return self.get_stats()
+        
+        with self._sample_lock:
+            client = self.service.redis_client
+            scanned = 0
+            cursor = self._cursor
+            
+            # 不带MATCH扫描，才能得到匹配比例用于外推
+            while True:
+                cursor, keys = client.scan(cursor=cursor, count=self.scan_count)
+                scanned += len(keys)
+                self._pass_scanned += len(keys)
+                self._pass_matched += sum(1 for key in keys if key.startswith(self.prefix))
+                if cursor == 0 or scanned >= self.max_keys:
+                    break
+            
+            self._cursor = cursor
+            if cursor == 0:
+                # 一轮扫描完成，下次采样从头开始新的一轮
+                room_keys = self._pass_matched
+                estimated = False
+                self._pass_scanned = self._pass_matched = 0
+            else:
+                total_keys = client.dbsize()
+                room_keys = int(self._pass_matched / max(self._pass_scanned, 1) * total_keys)
+                estimated = True
+            
+            self._stats = {
+                'room_keys': room_keys,
+                'estimated': estimated,
+                'sampled_at': datetime.now().strftime('%H:%M:%S'),
+                'status': 'estimated' if estimated else 'exact',
+            }
+        logger.debug(f"键空间采样完成: 扫描 {scanned} 个键, room键 {room_keys} (估算: {estimated})")
+        return self.get_stats()
+
+
 class DanmakuService:
     """弹幕数据服务层"""
     
     def __init__(self):
         self.redis_client = None
+        self.connection_pool = None
         self.connection_status = {'status': 'unknown', 'message': '未初始化'}
+        self._last_health_check = 0.0
+        self._last_connect_attempt = 0.0
+        self._lock = threading.Lock()
+        self._status_cache = None
+        self._keyspace_sampler = None
         self._init_redis_connection()
     
     def _init_redis_connection(self):
-        """初始化Redis连接，带重试机制"""
-        redis_configs = [
-            {'host': 'localhost', 'port': 6379, 'db': 0},
-            {'host': '127.0.0.1', 'port': 6379, 'db': 0},
-            {'host': 'redis', 'port': 6379, 'db': 0},  # Docker环境
-        ]
+        """初始化Redis连接池，依次尝试候选地址"""
+        self._last_connect_attempt = time.time()
+        pool_max_connections = getattr(settings, 'REDIS_CONFIG', {}).get('max_connections', 20)
         
-        for config in redis_configs:
+        for config in REDIS_CANDIDATE_HOSTS:
+            pool = None
             try:
                 logger.info(f"尝试连接Redis: {config}")
                 
-                self.redis_client = redis.Redis(
+                # ASGI下每个请求的同步代码在各自的线程中执行：连接用尽时排队等待，而不是立即抛出 Too many connections
+                pool = redis.BlockingConnectionPool(
                     **config,
                     decode_responses=True,
                     socket_timeout=5,
                     socket_connect_timeout=5,
                     retry_on_timeout=True,
-                    max_connections=20,
+                    max_connections=pool_max_connections,
+                    timeout=5,
                     health_check_interval=30
                 )
+                client = redis.Redis(connection_pool=pool)
                 
-                # 测试连接
-                result = self.redis_client.ping()
-                logger.info(f"Redis ping结果: {result}")
-                
-                if result:
-                    # 获取Redis信息
-                    info = self.redis_client.info()
+                # 只做一次PING，不再在建立连接时执行INFO和读写测试
+                if client.ping():
+                    old_pool = self.connection_pool
+                    self.connection_pool = pool
+                    self.redis_client = client
                     self.connection_status = {
                         'status': 'connected',
-                        'message': f"Redis连接成功 ({config['host']}:{config['port']}, 版本: {info.get('redis_version', 'unknown')})",
+                        'message': f"Redis连接成功 ({config['host']}:{config['port']})",
                         'config': config,
-                        'redis_version': info.get('redis_version'),
-                        'used_memory_human': info.get('used_memory_human')
                     }
+                    self._last_health_check = time.time()
+                    
+                    if old_pool is not None:
+                        old_pool.disconnect()
                     
-                    # 测试基本操作
-                    test_key = f"test:django:{int(time.time())}"
-                    self.redis_client.set(test_key, "test_value", ex=10)
-                    test_result = self.redis_client.get(test_key)
-                    self.redis_client.delete(test_key)
+                    logger.info(f"✅ Redis连接池已建立: {config}")
+                    return
                     
-                    if test_result == "test_value":
-                        logger.info(f"✅ Redis连接成功并通过读写测试: {config}")
-                        return
-                    else:
-                        logger.warning(f"Redis读写测试失败: {config}")
-                        continue
-                        
             except redis.ConnectionError as e:
                 logger.warning(f"❌ Redis连接失败 {config}: ConnectionError - {e}")
-                continue
             except redis.TimeoutError as e:
                 logger.warning(f"❌ Redis连接超时 {config}: TimeoutError - {e}")
-                continue
             except Exception as e:
                 logger.error(f"❌ Redis连接异常 {config}: {type(e).__name__} - {e}")
-                continue
+            
+            if pool is not None:
+                pool.disconnect()
         
         # 所有连接都失败
         self.redis_client = None
+        self.connection_pool = None
         self.connection_status = {
             'status': 'error',
             'message': 'Redis连接失败，请检查Redis服务是否启动'
         }
         logger.error("❌ 所有Redis连接尝试都失败")
     
+    def ensure_connection(self, force: bool = False) -> bool:
+        """惰性健康检查：PING和重连都按间隔限频，返回当前是否可用"""
+        now = time.time()
+        
+        if self.redis_client is None:
+            if force or now - self._last_connect_attempt >= RECONNECT_INTERVAL:
+                with self._lock:
+                    if self.redis_client is None:
+                        self._init_redis_connection()
+            return self.redis_client is not None
+        
+        if not force and now - self._last_health_check < HEALTH_CHECK_INTERVAL:
+            return self.connection_status.get('status') == 'connected'
+        
+        with self._lock:
+            self._last_health_check = time.time()
+            try:
+                self.redis_client.ping()
+                if self.connection_status.get('status') != 'connected':
+                    config = self.connection_status.get('config', {})
+                    self.connection_status = {
+                        'status': 'connected',
+                        'message': f"Redis连接已恢复 ({config.get('host')}:{config.get('port')})",
+                        'config': config,
+                    }
+                return True
+            except redis.RedisError as e:
+                logger.error(f"Redis健康检查失败，尝试重连: {e}")
+                self._init_redis_connection()
+                return self.redis_client is not None
+    
+    def check_health(self, force: bool = False) -> Dict:
+        """获取限频后的连接状态，供请求路径上的快速判断使用"""
+        self.ensure_connection(force=force)
+        return self.connection_status
+    
     def get_connection_status(self) -> Dict:
-        """获取Redis连接状态"""
+        """获取Redis连接状态（短TTL缓存，键数量来自INFO keyspace和后台采样器）"""
+        cached = self._status_cache
+        if cached and time.time() - cached['cached_at'] < KEYSPACE_STATUS_TTL:
+            return cached['status']
+        
         try:
-            if self.redis_client is None:
+            if not self.ensure_connection():
                 return self.connection_status
             
             # 实时测试连接
@@ -98,20 +263,29 @@ class DanmakuService:
             
             if response:
                 info = self.redis_client.info()
-                total_keys = len(self.redis_client.keys('*'))
-                room_keys = len(self.redis_client.keys('room:*'))
+                db_index = self.connection_status.get('config', {}).get('db', 0)
+                keyspace = info.get(f'db{db_index}', {})
+                total_keys = keyspace.get('keys', 0) if isinstance(keyspace, dict) else 0
                 
-                return {
+                sampler = self._get_keyspace_sampler()
+                room_key_stats = sampler.get_stats()
+                
+                status = {
                     'status': 'connected',
                     'message': f"Redis服务正常运行 (ping: {ping_time}ms)",
                     'redis_version': info.get('redis_version'),
                     'used_memory_human': info.get('used_memory_human'),
                     'connected_clients': info.get('connected_clients', 0),
                     'total_keys': total_keys,
-                    'room_keys': room_keys,
+                    'room_keys': room_key_stats.get('room_keys'),
+                    'room_keys_estimated': room_key_stats.get('estimated', True),
+                    'room_keys_sampled_at': room_key_stats.get('sampled_at'),
+                    'room_keys_status': room_key_stats.get('status', 'pending'),
                     'ping_time': ping_time,
                     'last_check': datetime.now().strftime('%H:%M:%S')
                 }
+                self._status_cache = {'status': status, 'cached_at': time.time()}
+                return status
             else:
                 return {
                     'status': 'error',
@@ -120,7 +294,7 @@ class DanmakuService:
                 
         except redis.ConnectionError:
             logger.error("Redis连接断开，尝试重连...")
-            self._init_redis_connection()
+            self.ensure_connection(force=True)
             return self.connection_status
         except Exception as e:
             logger.error(f"检查Redis状态失败: {e}")
@@ -129,658 +303,477 @@ class DanmakuService:
                 'message': f'连接检查失败: {str(e)}'
             }
     
-    def get_system_stats(self) -> Dict:
-        """获取系统统计"""
-        try:
-            if self.redis_client is None:
-                return {
-                    'total_rooms': 0,
-                    'active_rooms': 0,
-                    'total_danmaku': 0,
-                    'total_gifts': 0,
-                    'redis_status': 'error',
-                    'redis_message': 'Redis未连接'
-                }
-            
-            # 获取Redis状态
-            connection_status = self.get_connection_status()
-            
-            # 获取所有房间
-            room_keys = self.redis_client.keys("room:*:info")
-            total_rooms = len(room_keys)
-            
-            # 统计活跃房间和数据
-            active_rooms = 0
-            total_danmaku = 0
-            total_gifts = 0
-            
-            for room_key in room_keys:
-                try:
-                    room_id = room_key.split(':')[1]
-                    
-                    # 检查是否有当前数据（判断为活跃）
-                    current_key = f"room:{room_id}:current"
-                    if self.redis_client.exists(current_key):
-                        active_rooms += 1
-                    
-                    # 统计弹幕数量
-                    danmaku_key = f"room:{room_id}:danmaku"
-                    if self.redis_client.exists(danmaku_key):
-                        count = self.redis_client.llen(danmaku_key)
-                        total_danmaku += count
-                    
-                    # 统计礼物数量
-                    gifts_key = f"room:{room_id}:gifts"
-                    if self.redis_client.exists(gifts_key):
-                        count = self.redis_client.llen(gifts_key)
-                        total_gifts += count
-                        
-                except Exception as e:
-                    logger.warning(f"处理房间 {room_key} 统计失败: {e}")
-                    continue
-            
-            return {
-                'total_rooms': total_rooms,
-                'active_rooms': active_rooms,
-                'total_danmaku': total_danmaku,
-                'total_gifts': total_gifts,
-                'redis_status': connection_status.get('status'),
-                'redis_message': connection_status.get('message'),
-                'last_check': datetime.now().strftime('%H:%M:%S'),
-                'ping_time': connection_status.get('ping_time', 0)
-            }
-            
-        except Exception as e:
-            logger.error(f"获取系统统计失败: {e}")
-            return {
-                'total_rooms': 0,
-                'active_rooms': 0,
-                'total_danmaku': 0,
-                'total_gifts': 0,
-                'redis_status': 'error',
-                'redis_message': f'统计失败: {str(e)}'
-            }
+    def _get_keyspace_sampler(self) -> 'KeyspaceSampler':
+        """获取（必要时启动）后台键空间采样器"""
+        if self._keyspace_sampler is None:
+            with self._lock:
+                if self._keyspace_sampler is None:
+                    sampler = KeyspaceSampler(self)
+                    sampler.start()
+                    self._keyspace_sampler = sampler
+        return self._keyspace_sampler
     
-    def get_available_rooms(self) -> List[Dict]:
-        """获取所有有数据的房间"""
+    def get_recent_danmaku(self, room_id: int, limit: int = 20, since_seq: Optional[int] = None) -> List[Dict]:
+        """获取最近弹幕（按时间倒序）；指定since_seq时按事件ID升序返回其后最早的limit条"""
         try:
-            if self.redis_client is None:
-                logger.warning("Redis客户端未连接，返回空房间列表")
+            if not self.ensure_connection():
                 return []
-            
-            room_keys = self.redis_client.keys("room:*:info")
-            logger.info(f"找到 {len(room_keys)} 个房间键")
-            
-            rooms = []
-            
-            for room_key in room_keys:
-                try:
-                    room_id = int(room_key.split(':')[1])
-                    room_info = self.redis_client.hgetall(room_key)
-                    
-                    if not room_info:
-                        logger.warning(f"房间 {room_id} 信息为空")
-                        continue
-                    
-                    # 获取弹幕数量
-                    danmaku_key = f"room:{room_id}:danmaku"
-                    danmaku_count = self.redis_client.llen(danmaku_key) if self.redis_client.exists(danmaku_key) else 0
-                    
-                    # 获取礼物数量
-                    gifts_key = f"room:{room_id}:gifts"
-                    gift_count = self.redis_client.llen(gifts_key) if self.redis_client.exists(gifts_key) else 0
-                    
-                    # 获取当前数据
-                    current_key = f"room:{room_id}:current"
-                    current_data = self.redis_client.hgetall(current_key) if self.redis_client.exists(current_key) else {}
-                    
-                    room_data = {
-                        'room_id': room_id,
-                        'uname': room_info.get('uname', f'主播{room_id}'),
-                        'title': room_info.get('title', f'直播间{room_id}'),
-                        'live_status': int(room_info.get('live_status', 0)),
-                        'popularity': int(current_data.get('popularity', room_info.get('popularity', 0))),
-                        'danmaku_count': danmaku_count,
-                        'total_gifts': gift_count,
-                        'last_update': current_data.get('last_update', ''),
-                        'area_name': room_info.get('area_name', '未知分区'),
-                        'online': int(current_data.get('online', room_info.get('online', 0))),
-                    }
-                    
-                    # 只添加有数据的房间
-                    if danmaku_count > 0 or gift_count > 0:
-                        rooms.append(room_data)
-                        logger.debug(f"添加房间 {room_id}: 弹幕{danmaku_count}, 礼物{gift_count}")
-                    
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"处理房间数据失败: {room_key}, 错误: {e}")
-                    continue
-            
-            # 按弹幕数量排序
-            rooms.sort(key=lambda x: x['danmaku_count'], reverse=True)
-            logger.info(f"返回 {len(rooms)} 个有数据的房间")
-            return rooms
-            
+
+            list_key = ROOM_DANMAKU_KEY.format(room_id=room_id)
+            if since_seq is not None:
+                return self._read_since(list_key, room_id, format_danmaku, since_seq, limit)
+
+            danmaku_list = self.redis_client.lrange(list_key, 0, limit - 1)
+            return decode_recent_items(room_id, danmaku_list, format_danmaku)
+
         except Exception as e:
-            logger.error(f"获取房间列表失败: {e}")
+            logger.error(f"获取弹幕失败: {e}")
             return []
-    
-    def get_room_info(self, room_id: int) -> Optional[Dict]:
-        """获取房间基本信息"""
+
+    def get_rooms_feed(self, room_ids: List[int], danmaku_limit: int = 5, gift_limit: int = 3) -> Dict[int, Dict[str, List[Dict]]]:
+        """一次pipeline取回多个房间的最新弹幕和礼物，返回 {room_id: {'danmaku', 'gifts'}}"""
         try:
-            if self.redis_client is None:
-                return None
-            
-            room_key = f"room:{room_id}:info"
-            room_info = self.redis_client.hgetall(room_key)
-            
-            if room_info:
-                # 获取当前数据
-                current_key = f"room:{room_id}:current"
-                current_data = self.redis_client.hgetall(current_key)
-                
-                return {
-                    'room_id': room_id,
-                    'uname': room_info.get('uname', '未知主播'),
-                    'title': room_info.get('title', f'直播间{room_id}'),
-                    'popularity': int(current_data.get('popularity', room_info.get('popularity', 0))),
-                    'live_status': int(room_info.get('live_status', 0)),
-                    'area_name': room_info.get('area_name', '未知分区'),
-                    'cover': room_info.get('cover', ''),
-                    'online': int(current_data.get('online', room_info.get('online', 0))),
-                    'last_update': current_data.get('last_update', ''),
-                }
-            else:
-                return None
-                
+            if not self.ensure_connection() or not room_ids:
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_rooms_feed(pipe, room_ids, danmaku_limit, gift_limit)
+            return parse_rooms_feed(room_ids, pipe.execute(raise_on_error=False))
+
         except Exception as e:
-            logger.error(f"获取房间信息失败: {e}")
-            return None
-    
-    def get_room_danmaku_stats(self, room_id: int) -> Dict:
-        """获取房间弹幕统计"""
+            logger.error(f"批量获取房间最新弹幕失败: {e}")
+            return {}
+
+    def get_recent_gifts(self, room_id: int, limit: int = 20, since_seq: Optional[int] = None) -> List[Dict]:
+        """获取最近礼物（按时间倒序）；指定since_seq时按事件ID升序返回其后最早的limit条"""
         try:
-            if self.redis_client is None:
-                return {'danmaku_count': 0, 'gift_count': 0}
-            
-            danmaku_key = f"room:{room_id}:danmaku"
-            gift_key = f"room:{room_id}:gifts"
-            
-            danmaku_count = self.redis_client.llen(danmaku_key) if self.redis_client.exists(danmaku_key) else 0
-            gift_count = self.redis_client.llen(gift_key) if self.redis_client.exists(gift_key) else 0
-            
-            # 获取当前数据
-            current_key = f"room:{room_id}:current"
-            current_data = self.redis_client.hgetall(current_key)
-            
-            return {
-                'danmaku_count': danmaku_count,
-                'gift_count': gift_count,
-                'popularity': int(current_data.get('popularity', 0)),
-                'online': int(current_data.get('online', 0)),
-                'last_update': current_data.get('last_update', '')
-            }
-            
+            if not self.ensure_connection():
+                return []
+
+            list_key = ROOM_GIFTS_KEY.format(room_id=room_id)
+            if since_seq is not None:
+                return self._read_since(list_key, room_id, format_gift, since_seq, limit)
+
+            gifts_list = self.redis_client.lrange(list_key, 0, limit - 1)
+            return decode_recent_items(room_id, gifts_list, format_gift)
+
         except Exception as e:
-            logger.error(f"获取房间统计失败: {e}")
-            return {'danmaku_count': 0, 'gift_count': 0}
-    
-    def get_recent_danmaku(self, room_id: int, limit: int = 20) -> List[Dict]:
-        """获取最近弹幕"""
+            logger.error(f"获取礼物失败: {e}")
+            return []
+
+    def _read_since(self, list_key: str, room_id: int, formatter, since_seq: int, limit: int) -> List[Dict]:
+        """按页向旧的方向读取列表，直到遇到不比since_seq新的事件"""
+        reader = SinceReader(room_id, formatter, since_seq, limit)
+        while not reader.feed(self.redis_client.lrange(list_key, reader.start, reader.stop)):
+            pass
+        return reader.result()
+
+    def search_danmaku(self, room_id: int, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
+        """搜索弹幕（走写入时建立的倒排索引，耗时与命中数成正比）"""
         try:
-            if self.redis_client is None:
+            if not self.ensure_connection():
                 return []
-            
-            danmaku_key = f"room:{room_id}:danmaku"
-            
-            if not self.redis_client.exists(danmaku_key):
-                logger.warning(f"弹幕键不存在: {danmaku_key}")
+
+            if not keyword and not username:
                 return []
-            
-            # 获取最新的弹幕
-            danmaku_list = self.redis_client.lrange(danmaku_key, 0, limit - 1)
-            logger.debug(f"获取到 {len(danmaku_list)} 条弹幕数据")
-            
+
+            keyword_tokens = keyword_query_tokens(keyword) if keyword else []
+            user_token = username_query_token(username) if username else None
+
+            # 单字关键词或索引尚未建立（旧数据）时退回线性扫描
+            byid_key = DANMAKU_BYID_KEY.format(room_id=room_id)
+            if (keyword and not keyword_tokens) or not self.redis_client.exists(byid_key):
+                return self._scan_danmaku(room_id, keyword, username, limit)
+
+            token_keys = []
+            if keyword_tokens:
+                # 只遍历命中最少的片段，其余条件在取回弹幕后校验
+                pipe = self.redis_client.pipeline(transaction=False)
+                for token in keyword_tokens:
+                    pipe.zcard(room_token_key(room_id, token))
+                rarest_key = rarest_token_key(room_id, keyword_tokens, pipe.execute())
+                if rarest_key:
+                    token_keys.append(rarest_key)
+            if user_token:
+                token_keys.append(room_token_key(room_id, user_token))
+
+            if not token_keys:
+                return []
+
+            is_match = search_matcher(keyword, username, match_all=False)
+
+            # 多个索引按时间倒序归并，分批取回弹幕本体，凑满limit即停止
+            candidates = heapq.merge(
+                *[self._iter_index(key, limit) for key in token_keys],
+                key=lambda item: (item[1], item[0]), reverse=True
+            )
+
             results = []
-            for danmaku_json in danmaku_list:
-                try:
-                    danmaku_data = json.loads(danmaku_json)
-                    
-                    # 标准化数据格式
-                    formatted_danmaku = {
-                        'username': danmaku_data.get('username', danmaku_data.get('user', '未知用户')),
-                        'message': danmaku_data.get('message', danmaku_data.get('content', '')),
-                        'timestamp': danmaku_data.get('timestamp', danmaku_data.get('send_time', '')),
-                        'user_level': danmaku_data.get('user_level', 0),
-                        'send_time_formatted': danmaku_data.get('send_time_formatted', ''),
-                        'room_id': room_id,
-                    }
-                    
-                    results.append(formatted_danmaku)
-                    
-                except json.JSONDecodeError as e:
-                    logger.warning(f"弹幕JSON解析失败: {danmaku_json[:100]}...")
+            seen = set()
+            batch = []
+            for seq, _score in candidates:
+                if seq in seen:
                     continue
-            
-            logger.debug(f"成功解析 {len(results)} 条弹幕")
+                seen.add(seq)
+                batch.append(seq)
+                if len(batch) < limit:
+                    continue
+
+                results.extend(self._load_matches(room_id, batch, is_match, limit - len(results)))
+                batch = []
+                if len(results) >= limit:
+                    return results
+
+            if batch:
+                results.extend(self._load_matches(room_id, batch, is_match, limit - len(results)))
+
             return results
-            
+
         except Exception as e:
-            logger.error(f"获取弹幕失败: {e}")
+            logger.error(f"搜索弹幕失败: {e}")
             return []
-    
-    def get_recent_gifts(self, room_id: int, limit: int = 20) -> List[Dict]:
-        """获取最近礼物"""
+
+    def _iter_index(self, token_key: str, chunk_size: int):
+        """按时间倒序分页遍历一个索引有序集合，产出(seq, score)"""
+        start = 0
+        chunk_size = max(chunk_size, 1)
+        while True:
+            items = self.redis_client.zrevrange(token_key, start, start + chunk_size - 1, withscores=True)
+            for member, score in items:
+                yield int(member), score
+            if len(items) < chunk_size:
+                return
+            start += chunk_size
+
+    def _load_matches(self, room_id: int, seqs: List, is_match, limit: int) -> List[Dict]:
+        """按seq批量取回弹幕本体并校验搜索条件"""
+        raw_items = self.redis_client.hmget(DANMAKU_BYID_KEY.format(room_id=room_id), seqs)
+        return parse_matches(room_id, raw_items, is_match, limit)
+
+    def search_danmaku_across_rooms(self, keyword: str = None, username: str = None, uid: int = None,
+                                    room_ids: List[int] = None, start_ms: int = None, end_ms: int = None,
+                                    limit: int = 50, after: tuple = None) -> List[Dict]:
+        """跨房间搜索缓存窗口内的弹幕，按时间倒序返回
+
+        所有条件取交集：每个房间只遍历命中最少的索引，时间范围直接作为有序集合的分值区间，
+        after=(score, room_id, seq) 为上一页最后一条的位置，凑满limit即停止读取。
+        """
         try:
-            if self.redis_client is None:
+            if not self.ensure_connection():
                 return []
-            
-            gifts_key = f"room:{room_id}:gifts"
-            
-            if not self.redis_client.exists(gifts_key):
+
+            target_rooms = sorted(set(int(r) for r in room_ids)) if room_ids else self.get_monitored_room_ids()
+            if not target_rooms:
                 return []
-            
-            # 获取最新的礼物
-            gifts_list = self.redis_client.lrange(gifts_key, 0, limit - 1)
-            
+
+            tokens = cross_room_tokens(keyword, username, uid)
+            max_score, min_score = score_bounds(start_ms, end_ms, after)
+
+            # 一次管道统计所有房间各索引在时间范围内的命中数
+            pipe = self.redis_client.pipeline(transaction=False)
+            for room_id in target_rooms:
+                for token in tokens:
+                    pipe.zcount(room_token_key(room_id, token), min_score, max_score)
+            counts = pipe.execute()
+
+            streams = []
+            for index, room_id in enumerate(target_rooms):
+                rarest_key = rarest_token_key(room_id, tokens, counts[index * len(tokens):(index + 1) * len(tokens)])
+                if rarest_key:
+                    streams.append(self._iter_index_range(room_id, rarest_key, max_score, min_score, limit, after))
+
+            if not streams:
+                return []
+
+            is_match = search_matcher(keyword, username, uid, match_all=True)
+
+            # 各房间按(时间, 房间, seq)倒序归并，分批取回弹幕本体
+            candidates = heapq.merge(*streams, reverse=True)
+
             results = []
-            for gift_json in gifts_list:
-                try:
-                    gift_data = json.loads(gift_json)
-                    
-                    # 标准化数据格式
-                    formatted_gift = {
-                        'username': gift_data.get('username', '未知用户'),
-                        'gift_name': gift_data.get('gift_name', '未知礼物'),
-                        'num': gift_data.get('num', 1),
-                        'price': gift_data.get('price', 0),
-                        'coin_type': gift_data.get('coin_type', 'silver'),
-                        'timestamp': gift_data.get('timestamp', ''),
-                        'gift_time_formatted': gift_data.get('gift_time_formatted', ''),
-                        'room_id': room_id,
-                    }
-                    
-                    results.append(formatted_gift)
-                    
-                except json.JSONDecodeError as e:
-                    logger.warning(f"礼物JSON解析失败: {gift_json[:100]}...")
+            batch = []
+            for position in candidates:
+                batch.append(position)
+                if len(batch) < limit:
                     continue
-            
+
+                results.extend(self._load_positions(batch, is_match, limit - len(results)))
+                batch = []
+                if len(results) >= limit:
+                    return results
+
+            if batch:
+                results.extend(self._load_positions(batch, is_match, limit - len(results)))
+
             return results
-            
+
         except Exception as e:
-            logger.error(f"获取礼物失败: {e}")
+            logger.error(f"跨房间搜索弹幕失败: {e}")
             return []
-    
-    def search_danmaku(self, room_id: int, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
-        """搜索弹幕"""
+
+    def _iter_index_range(self, room_id: int, token_key: str, max_score, min_score, chunk_size: int, after: tuple = None):
+        """按分值区间倒序分页遍历索引，产出严格位于after之后的(score, room_id, seq)"""
+        chunk_size = max(chunk_size, 1)
+        while True:
+            items = self.redis_client.zrevrangebyscore(
+                token_key, max_score, min_score, start=0, num=chunk_size, withscores=True
+            )
+            items, boundary = split_index_chunk(items, chunk_size)
+            if boundary is not None:
+                # 边界毫秒整段读取，保证产出顺序与游标比较一致
+                items += self.redis_client.zrevrangebyscore(token_key, boundary, boundary, withscores=True)
+            yield from index_positions(room_id, items, after)
+            if boundary is None:
+                return
+            max_score = f'({boundary}'
+
+    def _load_positions(self, positions: List[tuple], is_match, limit: int) -> List[Dict]:
+        """用一次管道取回多个房间的弹幕本体并校验条件"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        queue_positions(pipe, positions)
+        return parse_positions(positions, pipe.execute(), is_match, limit)
+
+    def get_index_window_starts(self, room_ids: List[int] = None) -> Dict[int, int]:
+        """各房间缓存窗口中最早一条弹幕的时间（毫秒），没有索引的房间不返回"""
         try:
-            if self.redis_client is None:
-                return []
-            
-            danmaku_key = f"room:{room_id}:danmaku"
-            
-            if not self.redis_client.exists(danmaku_key):
-                return []
-            
-            # 获取所有弹幕进行搜索
-            all_danmaku = self.redis_client.lrange(danmaku_key, 0, -1)
-            
-            results = []
-            for danmaku_json in all_danmaku:
-                try:
-                    danmaku_data = json.loads(danmaku_json)
-                    
-                    # 检查是否匹配搜索条件
-                    match = False
-                    
-                    if keyword:
-                        message = danmaku_data.get('message', danmaku_data.get('content', ''))
-                        if keyword.lower() in message.lower():
-                            match = True
-                    
-                    if username:
-                        user = danmaku_data.get('username', danmaku_data.get('user', ''))
-                        if username.lower() in user.lower():
-                            match = True
-                    
-                    if match:
-                        # 标准化数据格式
-                        formatted_danmaku = {
-                            'username': danmaku_data.get('username', danmaku_data.get('user', '未知用户')),
-                            'message': danmaku_data.get('message', danmaku_data.get('content', '')),
-                            'timestamp': danmaku_data.get('timestamp', danmaku_data.get('send_time', '')),
-                            'send_time_formatted': danmaku_data.get('send_time_formatted', ''),
-                            'room_id': room_id,
-                        }
-                        
-                        results.append(formatted_danmaku)
-                    
-                    # 限制结果数量
-                    if len(results) >= limit:
-                        break
-                        
-                except json.JSONDecodeError:
-                    continue
-            
-            return results
-            
+            if not self.ensure_connection():
+                return {}
+
+            target_rooms = room_ids or self.get_monitored_room_ids()
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_window_starts(pipe, target_rooms)
+            return parse_window_starts(target_rooms, pipe.execute())
+
+        except Exception as e:
+            logger.error(f"获取缓存窗口起始时间失败: {e}")
+            return {}
+
+    def _scan_danmaku(self, room_id: int, keyword: str = None, username: str = None, limit: int = 50) -> List[Dict]:
+        """线性扫描弹幕列表搜索（索引无法覆盖的查询使用）"""
+        try:
+            all_danmaku = self.redis_client.lrange(ROOM_DANMAKU_KEY.format(room_id=room_id), 0, -1)
+            return scan_matches(room_id, all_danmaku, keyword, username, limit)
+
         except Exception as e:
             logger.error(f"搜索弹幕失败: {e}")
             return []
-    
+
     def is_connected(self) -> bool:
-        """检查Redis是否连接"""
+        """检查Redis是否连接（限频健康检查）"""
         try:
-            if self.redis_client is None:
-                return False
-            return self.redis_client.ping()
+            return self.ensure_connection()
         except:
             return False
-    
+
     def get_room_detailed_info(self, room_id: int) -> dict:
         """获取房间详细信息，包括UP主信息 - 增强版"""
         try:
-            if not self.redis_client:
-                self._init_redis_connection()
-            
-            room_info_key = f'room:{room_id}:info'
-            room_info = self.redis_client.hgetall(room_info_key)
-            
+            if not self.ensure_connection():
+                return {}
+
+            room_info = self.redis_client.hgetall(ROOM_INFO_KEY.format(room_id=room_id))
+
             if not room_info:
                 return {}
-            
-            # 解码数据
-            decoded_info = {}
-            for k, v in room_info.items():
-                key_name = k.decode('utf-8') if isinstance(k, bytes) else str(k)
-                value = v.decode('utf-8') if isinstance(v, bytes) else str(v)
-                decoded_info[key_name] = value
-            
-            # 转换数字字段
-            numeric_fields = ['room_id', 'uid', 'live_status', 'online', 'attention', 'gender']
-            for field in numeric_fields:
-                if field in decoded_info and decoded_info[field].isdigit():
-                    decoded_info[field] = int(decoded_info[field])
-            
-            # 转换布尔字段
-            boolean_fields = ['is_verified']
-            for field in boolean_fields:
-                if field in decoded_info:
-                    decoded_info[field] = decoded_info[field].lower() in ['true', '1', 'yes']
-            
-            # 添加实时统计
+
+            # 解码、类型转换并合并实时统计和计算字段
             stats = self.get_room_danmaku_stats(room_id)
-            decoded_info.update(stats)
-            
-            # 添加额外的计算字段
-            decoded_info['is_live'] = decoded_info.get('live_status', 0) == 1
-            decoded_info['is_offline'] = decoded_info.get('live_status', 0) == 0
-            decoded_info['is_round'] = decoded_info.get('live_status', 0) == 2
-            
-            # 人气等级
-            popularity = decoded_info.get('online', 0)
-            if popularity >= 10000:
-                decoded_info['popularity_level'] = 'high'
-            elif popularity >= 1000:
-                decoded_info['popularity_level'] = 'medium'
-            elif popularity >= 100:
-                decoded_info['popularity_level'] = 'low'
-            else:
-                decoded_info['popularity_level'] = 'very_low'
-            
-            # 性别文本转换
-            gender_map = {0: '未知', 1: '男', 2: '女', 3: '保密'}
-            decoded_info['gender_text'] = gender_map.get(decoded_info.get('gender', 0), '未知')
-            
-            return decoded_info
-            
+            return build_room_detail(room_info, stats)
+
         except Exception as e:
             logger.error(f"获取房间 {room_id} 详细信息失败: {e}")
             return {}
 
+    def iter_rooms_detailed_info(self, room_ids: List[int], chunk_size: int = BULK_ROOMS_CHUNK_SIZE):
+        """批量获取房间详细信息，逐个产出 (room_id, detail)
+
+        每批房间的 info/stats/列表长度/列表头部 在一个pipeline中一次往返取回，
+        不存在的房间直接跳过。连接异常向上抛出，由调用方决定如何结束响应。
+        """
+        if not self.ensure_connection():
+            raise redis.ConnectionError('Redis连接不可用')
+
+        for start in range(0, len(room_ids), chunk_size):
+            chunk = room_ids[start:start + chunk_size]
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_room_details(pipe, chunk)
+            yield from parse_room_details(chunk, pipe.execute(raise_on_error=False))
+
+    def get_room_version(self, room_id: int) -> int:
+        """获取房间数据版本号（收集器每次写入递增），不存在时返回0"""
+        try:
+            if not self.ensure_connection():
+                return 0
+            return _to_int(self.redis_client.get(ROOM_VERSION_KEY.format(room_id=room_id)))
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 版本号失败: {e}")
+            return 0
+
+    def get_data_versions(self, room_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """一次往返读取全局/摘要（及指定房间）的版本号，用于生成ETag；Redis不可用时返回None"""
+        try:
+            if not self.ensure_connection():
+                return None
+
+            values = self.redis_client.mget(data_version_keys(room_id))
+            return parse_data_versions(values, room_id)
+
+        except Exception as e:
+            logger.error(f"获取数据版本号失败: {e}")
+            return None
+
+    def get_room_summary(self, room_id: int) -> dict:
+        """获取收集器预渲染的房间摘要，缺失时现场构建"""
+        try:
+            if not self.ensure_connection():
+                return {}
+
+            cached = self.redis_client.get(ROOM_SUMMARY_KEY.format(room_id=room_id))
+            if cached:
+                return loads(cached)
+
+            room_data = self.get_room_detailed_info(room_id)
+            if not room_data:
+                return {}
+            return build_room_summary(room_id, room_data, timezone.now().isoformat())
+
+        except Exception as e:
+            logger.error(f"获取房间 {room_id} 摘要失败: {e}")
+            return {}
+
     def get_all_rooms_with_uploader_info(self) -> list:
-        """获取所有房间及UP主信息"""
+        """获取所有房间及UP主信息（优先读取收集器维护的全量快照，一次GET）"""
         try:
-            if not self.redis_client:
-                self._init_redis_connection()
-            
-            # 获取所有活跃房间
-            active_rooms = self.redis_client.smembers('rooms:active')
-            
-            if not active_rooms:
-                # 备用方案：从房间信息键中提取
-                room_keys = self.redis_client.keys('room:*:info')
-                room_ids = []
-                for key in room_keys:
-                    key_str = key.decode('utf-8') if isinstance(key, bytes) else str(key)
-                    try:
-                        room_id = key_str.split(':')[1]
-                        if room_id.isdigit():
-                            room_ids.append(room_id)
-                    except IndexError:
-                        continue
-                active_rooms = room_ids
-            
-            rooms = []
-            processed_count = 0
-            max_rooms = 200  # 限制最大房间数量，避免性能问题
-            
-            for room_id in active_rooms:
-                if processed_count >= max_rooms:
-                    break
-                    
-                try:
-                    room_id = room_id.decode('utf-8') if isinstance(room_id, bytes) else str(room_id)
-                    if not room_id.isdigit():
-                        continue
-                    
-                    room_id = int(room_id)
-                    room_data = self.get_room_detailed_info(room_id)
-                    
-                    if room_data:
-                        # 确保包含所需字段
-                        enhanced_room = {
-                            'room_id': room_id,
-                            'uname': room_data.get('uname', f'主播{room_id}'),
-                            'title': room_data.get('title', ''),
-                            'face': room_data.get('face', ''),  # UP主头像
-                            'uid': room_data.get('uid', 0),
-                            'gender': room_data.get('gender', 0),
-                            'gender_text': room_data.get('gender_text', '未知'),
-                            'is_verified': room_data.get('is_verified', False),
-                            'verify_desc': room_data.get('verify_desc', ''),
-                            'area_name': room_data.get('area_name', ''),
-                            'parent_area_name': room_data.get('parent_area_name', ''),
-                            'live_status': room_data.get('live_status', 0),
-                            'live_status_text': self._get_live_status_text(room_data.get('live_status', 0)),
-                            'online': room_data.get('online', 0),
-                            'attention': room_data.get('attention', 0),
-                            'cover': room_data.get('cover', ''),
-                            'keyframe': room_data.get('keyframe', ''),
-                            'danmaku_count': room_data.get('danmaku_count', 0),
-                            'gift_count': room_data.get('gift_count', 0),
-                            'last_danmaku_time': room_data.get('last_danmaku_time'),
-                            'last_gift_time': room_data.get('last_gift_time'),
-                            'updated_at': room_data.get('updated_at', timezone.now().isoformat()),
-                            'popularity_level': room_data.get('popularity_level', 'very_low'),
-                            'is_live': room_data.get('is_live', False),
-                            'is_offline': room_data.get('is_offline', True),
-                            'is_round': room_data.get('is_round', False),
-                            'live_time': self._calculate_live_time(room_data.get('live_time')),
-                        }
-                        
-                        rooms.append(enhanced_room)
-                        processed_count += 1
-                        
-                except Exception as e:
-                    logger.warning(f"处理房间 {room_id} 信息时出错: {e}")
-                    continue
-            
-            # 按在线人数和弹幕活跃度排序
-            rooms.sort(key=lambda x: (
-                x.get('online', 0) * 1000 + x.get('danmaku_count', 0)
-            ), reverse=True)
-            
-            logger.info(f"成功处理 {len(rooms)} 个房间信息")
-            return rooms
-            
+            if not self.ensure_connection():
+                return []
+
+            rooms = parse_rooms_snapshot(self.redis_client.get(ALL_ROOMS_SUMMARY_KEY))
+            if rooms is not None:
+                return rooms
+
+            return self._build_all_rooms_with_uploader_info()
+
         except Exception as e:
             logger.error(f"获取所有房间UP主信息失败: {e}")
             return []
 
-    def _get_live_status_text(self, status: int) -> str:
-        """获取直播状态文本"""
-        status_map = {
-            0: '未开播',
-            1: '直播中',
-            2: '轮播中'
-        }
-        return status_map.get(status, '未知')
+    def get_rooms_page(self, sort_by: str = 'popularity', status: str = 'all',
+                       offset: int = 0, limit: int = 50) -> Optional[Dict[str, Any]]:
+        """按收集器维护的排序/筛选索引分页获取房间，只读取当前页的房间摘要
 
-    def _calculate_live_time(self, live_time_data) -> str:
-        """计算直播时长"""
+        返回 {'rooms', 'total_count', 'overview'}；索引尚未建立时返回None，由调用方回退到全量排序。
+        """
         try:
-            if not live_time_data:
-                return '--:--'
-            
-            # 如果已经是格式化的时间字符串，直接返回
-            if isinstance(live_time_data, str) and ':' in live_time_data:
-                return live_time_data
-            
-            # 如果是时间戳，计算时长
-            if isinstance(live_time_data, (int, float)):
-                hours = int(live_time_data // 3600)
-                minutes = int((live_time_data % 3600) // 60)
-                return f"{hours:02d}:{minutes:02d}"
-            
-            return '--:--'
-        except:
-            return '--:--'
+            if not self.ensure_connection():
+                return None
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_rooms_page(pipe, sort_by, status, offset, limit)
+            index_exists, total_count, room_ids, overview = pipe.execute()
+
+            if not index_exists:
+                return None
+
+            summaries = self.redis_client.mget(room_summary_keys(room_ids)) if room_ids else []
+            return build_rooms_page(summaries, total_count, overview)
+
+        except Exception as e:
+            logger.error(f"按索引分页获取房间失败: {e}")
+            return None
+
+    def _build_all_rooms_with_uploader_info(self) -> list:
+        """逐个房间现场构建摘要（快照缺失时的备用方案）"""
+        try:
+            room_ids = self.get_monitored_room_ids()[:FALLBACK_MAX_ROOMS]
+            rooms = build_rooms_from_details(room_ids, [self.get_room_detailed_info(room_id) for room_id in room_ids])
+
+            logger.info(f"成功处理 {len(rooms)} 个房间信息")
+            return rooms
+
+        except Exception as e:
+            logger.error(f"构建房间UP主信息失败: {e}")
+            return []
 
     def get_room_danmaku_stats(self, room_id: int) -> dict:
         """获取房间弹幕统计"""
         try:
-            if not self.redis_client:
-                self._init_redis_connection()
-            
-            stats = {}
-            
-            # 获取弹幕数量
-            danmaku_count = self.redis_client.llen(f'room:{room_id}:danmaku')
-            stats['danmaku_count'] = danmaku_count
-            
-            # 获取礼物数量
-            gift_count = self.redis_client.llen(f'room:{room_id}:gifts')
-            stats['gift_count'] = gift_count
-            
-            # 获取房间统计信息
-            room_stats_data = self.redis_client.hgetall(f'room:{room_id}:stats')
-            for k, v in room_stats_data.items():
-                key_name = k.decode('utf-8') if isinstance(k, bytes) else str(k)
-                value = v.decode('utf-8') if isinstance(v, bytes) else str(v)
-                stats[key_name] = value
-            
-            # 获取最后活动时间
-            last_danmaku = self.redis_client.lrange(f'room:{room_id}:danmaku', 0, 0)
-            if last_danmaku:
-                try:
-                    danmaku_data = json.loads(last_danmaku[0].decode('utf-8'))
-                    stats['last_danmaku_time'] = danmaku_data.get('timestamp')
-                except:
-                    pass
-            
-            last_gift = self.redis_client.lrange(f'room:{room_id}:gifts', 0, 0)
-            if last_gift:
-                try:
-                    gift_data = json.loads(last_gift[0].decode('utf-8'))
-                    stats['last_gift_time'] = gift_data.get('timestamp')
-                except:
-                    pass
-            
-            return stats
-            
+            if not self.ensure_connection():
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_room_stats(pipe, room_id)
+            return build_room_stats(*pipe.execute())
+
         except Exception as e:
             logger.error(f"获取房间 {room_id} 弹幕统计失败: {e}")
             return {}
 
+    def get_monitored_room_ids(self) -> List[int]:
+        """获取所有被监控房间ID（优先rooms:active集合，缺失时用SCAN代替KEYS）"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            room_ids = self.redis_client.smembers(ACTIVE_ROOMS_KEY)
+            if not room_ids:
+                room_ids = {
+                    room_id_from_info_key(key)
+                    for key in self.redis_client.scan_iter(match=ROOM_INFO_PATTERN, count=1000)
+                }
+
+            return parse_room_ids(room_ids)
+
+        except Exception as e:
+            logger.error(f"获取监控房间ID失败: {e}")
+            return []
+
+    def get_rooms_bulk_stats(self, room_ids: Optional[List[int]] = None) -> Dict[int, RoomStatsSummary]:
+        """批量获取房间统计：所有房间的数据在一个pipeline中一次往返取回"""
+        try:
+            if not self.ensure_connection():
+                return {}
+
+            if room_ids is None:
+                room_ids = self.get_monitored_room_ids()
+            if not room_ids:
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_bulk_stats(pipe, room_ids)
+            return parse_bulk_stats(room_ids, pipe.execute(raise_on_error=False))
+
+        except Exception as e:
+            logger.error(f"批量获取房间统计失败: {e}")
+            return {}
+
+    def get_room_stats(self, room_id: int) -> dict:
+        """获取单个房间的统计摘要（与批量统计接口格式一致）"""
+        summary = self.get_rooms_bulk_stats([room_id]).get(int(room_id))
+        return summary.to_dict() if summary else {}
+
     def get_system_stats(self) -> dict:
         """获取系统统计信息"""
         try:
             connection_status = self.get_connection_status()
-            
+
             if connection_status.get('status') != 'connected':
-                return {
-                    'redis_status': 'error',
-                    'redis_message': connection_status.get('message', 'Redis连接失败'),
-                    'total_rooms': 0,
-                    'active_rooms': 0,
-                    'total_danmaku': 0,
-                    'total_gifts': 0,
-                    'verified_users': 0,
-                    'total_online': 0
-                }
-            
-            # 获取所有房间数据
-            rooms = self.get_all_rooms_with_uploader_info()
-            
-            # 计算统计
-            total_rooms = len(rooms)
-            active_rooms = len([r for r in rooms if r.get('live_status') == 1])
-            verified_users = len([r for r in rooms if r.get('is_verified')])
-            total_danmaku = sum(r.get('danmaku_count', 0) for r in rooms)
-            total_gifts = sum(r.get('gift_count', 0) for r in rooms)
-            total_online = sum(r.get('online', 0) for r in rooms)
-            
-            return {
-                'redis_status': 'connected',
-                'redis_message': '连接正常',
-                'total_rooms': total_rooms,
-                'active_rooms': active_rooms,
-                'offline_rooms': total_rooms - active_rooms,
-                'verified_users': verified_users,
-                'total_danmaku': total_danmaku,
-                'total_gifts': total_gifts,
-                'total_online': total_online,
-                'avg_popularity': round(total_online / max(total_rooms, 1), 2),
-                'last_update': timezone.now().isoformat()
-            }
-            
+                return error_system_stats(connection_status.get('message', 'Redis连接失败'))
+
+            # 一次pipeline取回所有房间的统计
+            rooms = list(self.get_rooms_bulk_stats().values())
+            return build_system_stats(rooms)
+
         except Exception as e:
             logger.error(f"获取系统统计失败: {e}")
-            return {
-                'redis_status': 'error',
-                'redis_message': f'获取统计失败: {str(e)}',
-                'total_rooms': 0,
-                'active_rooms': 0,
-                'total_danmaku': 0,
-                'total_gifts': 0,
-                'verified_users': 0,
-                'total_online': 0
-            }
+            return error_system_stats(f'获取统计失败: {str(e)}')
 
     def get_available_rooms(self) -> list:
         """获取可用房间列表"""
         try:
-            rooms_with_info = self.get_all_rooms_with_uploader_info()
-            
-            # 转换为简化格式以保持兼容性
-            simple_rooms = []
-            for room in rooms_with_info:
-                simple_room = {
-                    'room_id': room['room_id'],
-                    'title': room.get('title', ''),
-                    'uname': room.get('uname', f'主播{room["room_id"]}'),
-                    'online': room.get('online', 0),
-                    'live_status': room.get('live_status', 0),
-                    'area_name': room.get('area_name', ''),
-                    'danmaku_count': room.get('danmaku_count', 0),
-                    'gift_count': room.get('gift_count', 0)
-                }
-                simple_rooms.append(simple_room)
-            
-            return simple_rooms
-            
+            summaries = list(self.get_rooms_bulk_stats().values())
+            return build_available_rooms(summaries)
+
         except Exception as e:
             logger.error(f"获取可用房间列表失败: {e}")
             return []
@@ -789,30 +782,37 @@ class DanmakuService:
         """获取房间基本信息"""
         try:
             detailed_info = self.get_room_detailed_info(room_id)
-            
+
             if not detailed_info:
                 return {}
-            
-            # 返回基本信息字段
-            return {
-                'room_id': detailed_info.get('room_id', room_id),
-                'title': detailed_info.get('title', ''),
-                'uname': detailed_info.get('uname', ''),
-                'uid': detailed_info.get('uid', 0),
-                'live_status': detailed_info.get('live_status', 0),
-                'online': detailed_info.get('online', 0),
-                'area_name': detailed_info.get('area_name', ''),
-                'parent_area_name': detailed_info.get('parent_area_name', ''),
-                'face': detailed_info.get('face', ''),
-                'cover': detailed_info.get('cover', ''),
-                'attention': detailed_info.get('attention', 0),
-                'is_verified': detailed_info.get('is_verified', False),
-                'gender_text': detailed_info.get('gender_text', '未知')
-            }
-            
+
+            return basic_room_info(room_id, detailed_info)
+
         except Exception as e:
             logger.error(f"获取房间 {room_id} 信息失败: {e}")
             return {}
 
 
+# 进程级共享的服务实例
+_danmaku_service = None
+_danmaku_service_lock = threading.Lock()
+
+def get_danmaku_service() -> DanmakuService:
+    """获取进程级共享的DanmakuService实例（共用同一个连接池）"""
+    global _danmaku_service
+    if _danmaku_service is None:
+        with _danmaku_service_lock:
+            if _danmaku_service is None:
+                _danmaku_service = DanmakuService()
+    return _danmaku_service
 
+def reset_danmaku_service():
+    """重置共享的DanmakuService实例"""
+    global _danmaku_service
+    with _danmaku_service_lock:
+        if _danmaku_service is not None:
+            if _danmaku_service._keyspace_sampler is not None:
+                _danmaku_service._keyspace_sampler.stop()
+            if _danmaku_service.connection_pool is not None:
+                _danmaku_service.connection_pool.disconnect()
+        _danmaku_service = None
@@ -0,0 +1,112 @@
+"""
+仪表板快照 - 后台线程周期性预计算首页上下文
+
+每个工作进程一个守护线程，每隔 DASHBOARD_SNAPSHOT_INTERVAL 秒重建一次系统统计和活跃房间列表，
+整体替换进程内的快照；数据版本号未变化时跳过重建（版本号全为0说明写入端不维护版本号，此时每次都重建，
+版本号未变化超过 DASHBOARD_SNAPSHOT_MAX_STALE 秒也强制重建一次）。页面请求只读取快照，
+耗时与房间数量和同时访问的人数无关。
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from .danmaku_services import get_danmaku_service
+
+logger = logging.getLogger(__name__)
+
+# 快照刷新周期（秒）
+DASHBOARD_SNAPSHOT_INTERVAL = getattr(settings, 'DASHBOARD_SNAPSHOT_INTERVAL', 1.0)
+# 首页展示的活跃房间数
+DASHBOARD_TOP_ROOMS = getattr(settings, 'DASHBOARD_TOP_ROOMS', 20)
+# 快照超过该时长未刷新（后台线程异常退出等）时由请求线程同步重建
+DASHBOARD_SNAPSHOT_MAX_AGE = getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', 10)
+# 版本号未变化时快照最多沿用的时长（秒），超过后强制重建
+DASHBOARD_SNAPSHOT_MAX_STALE = getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_STALE', 5)
+
+
+class DashboardSnapshotter:
+    """仪表板快照后台刷新器"""
+
+    def __init__(self):
+        self.interval = DASHBOARD_SNAPSHOT_INTERVAL
+        self.top_rooms = DASHBOARD_TOP_ROOMS
+        self._snapshot = None
+        self._versions = None
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """启动后台刷新线程（守护线程）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='DashboardSnapshotter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+
+    def get(self) -> Dict:
+        """返回最近一次的快照；尚无快照或快照过旧时同步重建"""
+        if self._snapshot is None or time.time() - self._refreshed_at > DASHBOARD_SNAPSHOT_MAX_AGE:
+            self.refresh()
+        return self._snapshot
+
+    def _run(self):
+        """刷新循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"仪表板快照刷新失败: {e}")
+            self._stop_event.wait(self.interval)
+
+    def refresh(self, force: bool = False) -> Optional[Dict]:
+        """重建快照；数据版本号有效且与上次相同、快照未超过最长沿用时间时只更新刷新时间"""
+        with self._refresh_lock:
+            service = get_danmaku_service()
+            versions = service.get_data_versions()
+
+            if not force and self._can_reuse(versions):
+                self._refreshed_at = time.time()
+                return self._snapshot
+
+            self._snapshot = {
+                'system_stats': service.get_system_stats(),
+                'active_rooms': service.get_all_rooms_with_uploader_info()[:self.top_rooms],
+            }
+            self._versions = versions
+            self._refreshed_at = self._built_at = time.time()
+            return self._snapshot
+
+    def _can_reuse(self, versions: Optional[Dict[str, int]]) -> bool:
+        """能否沿用当前快照：版本号不可用或全为0时无法判断数据是否变化，一律重建"""
+        if self._snapshot is None or not versions or not any(versions.values()):
+            return False
+        if time.time() - self._built_at > DASHBOARD_SNAPSHOT_MAX_STALE:
+            return False
+        return versions == self._versions
+
+
+# 进程级共享的快照刷新器
+_dashboard_snapshotter = None
+_dashboard_snapshotter_lock = threading.Lock()
+
+def get_dashboard_snapshot() -> Dict:
+    """获取仪表板快照 {'system_stats', 'active_rooms'}（首次调用时启动后台刷新线程）"""
+    global _dashboard_snapshotter
+    if _dashboard_snapshotter is None:
+        with _dashboard_snapshotter_lock:
+            if _dashboard_snapshotter is None:
+                snapshotter = DashboardSnapshotter()
+                snapshotter.refresh()
+                snapshotter.start()
+                _dashboard_snapshotter = snapshotter
+    return _dashboard_snapshotter.get()
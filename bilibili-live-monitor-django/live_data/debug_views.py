@@ -21,8 +21,8 @@ def debug_dashboard(request):
     
     try:
         # 尝试初始化服务
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         context['debug_info']['service_init'] = '成功'
         context['debug_info']['connection_status'] = service.connection_status
@@ -0,0 +1,272 @@
+"""
+实时事件分发 - 每个工作进程一个Redis Stream读取者
+
+LiveEventHub 用一个连接 XREAD BLOCK 跟随收集器写入的 live_events，
+把新事件分发给本进程内所有订阅者（SSE连接等）的队列，订阅者数量不影响Redis负载。
+断线重连的客户端带上最后收到的事件ID，先用 XRANGE 补齐错过的事件，再接上实时推送。
+
+redis.asyncio 的连接绑定在事件循环上，因此每个事件循环各持有一个 LiveEventHub，
+通过 get_live_event_hub() 获取。
+
+WebSocket消费者不直接订阅Hub：每个事件循环一个 ChannelLayerRelay 作为Hub的订阅者，
+把事件用 channel_layer.group_send 转发到 room_{id} 组和全部房间组 room_all，由组内的消费者推送给客户端。
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from utils.live_events import (
+    LIVE_EVENTS_STREAM_KEY, EVENT_DANMAKU, EVENT_GIFT,
+    decode_event, event_id_key,
+)
+from .async_danmaku_services import get_async_danmaku_service
+from .danmaku_common import format_danmaku, format_gift
+
+logger = logging.getLogger(__name__)
+
+# XREAD单次阻塞时长（毫秒），需小于Redis连接的socket_timeout
+LIVE_EVENTS_BLOCK_MS = getattr(settings, 'LIVE_EVENTS_BLOCK_MS', 2000)
+# 每个订阅者最多积压的事件数，超出后断开，由客户端带Last-Event-ID重连补齐
+LIVE_EVENTS_QUEUE_SIZE = getattr(settings, 'LIVE_EVENTS_QUEUE_SIZE', 1000)
+# Redis出错后重试的间隔（秒）
+LIVE_EVENTS_RETRY_INTERVAL = 1.0
+# 补齐错过的事件时每次XRANGE读取的条数
+BACKLOG_PAGE_SIZE = 500
+
+
+def client_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream事件转换为推送给客户端的格式，弹幕和礼物与HTTP接口格式一致"""
+    room_id = event['room_id']
+    data = event['data']
+    if event['type'] == EVENT_DANMAKU:
+        data = format_danmaku(room_id, data)
+    elif event['type'] == EVENT_GIFT:
+        data = format_gift(room_id, data)
+    return {'id': event['id'], 'type': event['type'], 'room_id': room_id, 'data': data}
+
+
+class Subscription:
+    """一个订阅者：房间过滤条件和待推送事件队列"""
+
+    def __init__(self, room_id: Optional[int] = None):
+        self.room_id = room_id
+        self.queue = asyncio.Queue(maxsize=LIVE_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return self.room_id is None or event['room_id'] == self.room_id
+
+    def offer(self, event: Dict[str, Any]):
+        """放入事件；队列已满时标记溢出，不阻塞分发"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.queue = asyncio.Queue(maxsize=1)
+            self.queue.put_nowait(None)  # 唤醒消费端，让它结束推送
+
+
+class LiveEventHub:
+    """进程内实时事件分发器"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._task = None
+        self._last_id = None
+        self._start_lock = asyncio.Lock()
+
+    async def subscribe(self, room_id: Optional[int] = None) -> Subscription:
+        """注册订阅者；首次订阅时记下Stream当前位置并启动读取任务"""
+        subscription = Subscription(room_id)
+        self._subscriptions.add(subscription)
+
+        async with self._start_lock:
+            if self._task is None or self._task.done():
+                service = get_async_danmaku_service()
+                self._last_id = '0-0'
+                if await service.ensure_connection():
+                    latest = await service.redis_client.xrevrange(LIVE_EVENTS_STREAM_KEY, count=1)
+                    if latest:
+                        self._last_id = latest[0][0]
+                self._task = asyncio.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """注销订阅者；没有订阅者时停止读取任务，释放连接"""
+        self._subscriptions.discard(subscription)
+        if not self._subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """跟随Stream读取新事件并分发"""
+        service = get_async_danmaku_service()
+        while self._subscriptions:
+            try:
+                if not await service.ensure_connection():
+                    await asyncio.sleep(LIVE_EVENTS_RETRY_INTERVAL)
+                    continue
+
+                response = await service.redis_client.xread(
+                    {LIVE_EVENTS_STREAM_KEY: self._last_id}, count=BACKLOG_PAGE_SIZE, block=LIVE_EVENTS_BLOCK_MS
+                )
+                for _stream, entries in response or []:
+                    for event_id, fields in entries:
+                        self._last_id = event_id
+                        self._dispatch(event_id, fields)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"实时事件读取失败: {e}")
+                await asyncio.sleep(LIVE_EVENTS_RETRY_INTERVAL)
+
+    def _dispatch(self, event_id: str, fields: Dict):
+        event = decode_event(event_id, fields)
+        if event is None:
+            return
+        payload = None
+        for subscription in list(self._subscriptions):
+            if subscription.matches(event):
+                if payload is None:
+                    payload = client_event(event)
+                subscription.offer(payload)
+
+    async def read_backlog(self, last_event_id: str, room_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """读取last_event_id之后的事件；该ID已被Stream裁剪掉时返回None（客户端需要全量刷新）"""
+        service = get_async_danmaku_service()
+        if not await service.ensure_connection():
+            return []
+
+        last_key = event_id_key(last_event_id)
+        oldest = await service.redis_client.xrange(LIVE_EVENTS_STREAM_KEY, count=1)
+        if oldest and event_id_key(oldest[0][0]) > last_key:
+            return None
+
+        events = []
+        start = '({}-{}'.format(*last_key)
+        while True:
+            entries = await service.redis_client.xrange(LIVE_EVENTS_STREAM_KEY, min=start, count=BACKLOG_PAGE_SIZE)
+            for event_id, fields in entries:
+                event = decode_event(event_id, fields)
+                if event is not None and (room_id is None or event['room_id'] == room_id):
+                    events.append(client_event(event))
+            if len(entries) < BACKLOG_PAGE_SIZE:
+                return events
+            start = f'({entries[-1][0]}'
+
+    async def events(self, room_id: Optional[int] = None, last_event_id: Optional[str] = None,
+                     heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """订阅并逐个产出事件（带续传）；心跳间隔内没有事件时产出None"""
+        subscription = await self.subscribe(room_id)
+        try:
+            resumed_until = None
+            if last_event_id:
+                backlog = await self.read_backlog(last_event_id, room_id)
+                if backlog is None:
+                    yield {'id': None, 'type': 'reset', 'room_id': room_id, 'data': {}}
+                else:
+                    for event in backlog:
+                        yield event
+                    if backlog:
+                        resumed_until = event_id_key(backlog[-1]['id'])
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                if event is None:  # 积压过多，结束推送
+                    return
+                # 补齐阶段已经发送过的事件不再重复发送
+                if resumed_until is not None and event_id_key(event['id']) <= resumed_until:
+                    continue
+                yield event
+        finally:
+            self.unsubscribe(subscription)
+
+
+ROOM_GROUP_NAME = 'room_{room_id}'
+# 订阅全部房间的连接所在的组
+ALL_ROOMS_GROUP_NAME = 'room_all'
+
+
+def room_group_name(room_id: int) -> str:
+    """房间实时推送使用的channel layer组名"""
+    return ROOM_GROUP_NAME.format(room_id=room_id)
+
+
+class ChannelLayerRelay:
+    """把Hub收到的事件转发到channel layer的房间组，有WebSocket连接时才运行"""
+
+    def __init__(self, hub: LiveEventHub):
+        self.hub = hub
+        self._connections = 0
+        self._task = None
+
+    def acquire(self):
+        """登记一个WebSocket连接；首个连接启动转发任务"""
+        self._connections += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def release(self):
+        """注销一个WebSocket连接；没有连接时停止转发任务"""
+        self._connections = max(0, self._connections - 1)
+        if self._connections == 0 and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        channel_layer = get_channel_layer()
+        while True:
+            subscription = await self.hub.subscribe()
+            try:
+                while True:
+                    event = await subscription.queue.get()
+                    if event is None:
+                        logger.warning("⚠️ WebSocket转发积压过多，丢弃积压事件后重新订阅")
+                        break
+                    message = {'type': 'live.event', 'event': event}
+                    await channel_layer.group_send(room_group_name(event['room_id']), message)
+                    await channel_layer.group_send(ALL_ROOMS_GROUP_NAME, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket事件转发失败: {e}")
+                await asyncio.sleep(LIVE_EVENTS_RETRY_INTERVAL)
+            finally:
+                self.hub.unsubscribe(subscription)
+
+
+# 每个事件循环一个共享实例
+_hubs = weakref.WeakKeyDictionary()
+_relays = weakref.WeakKeyDictionary()
+
+
+def get_live_event_hub() -> LiveEventHub:
+    """获取当前事件循环共享的LiveEventHub实例，必须在协程中调用"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = LiveEventHub()
+        _hubs[loop] = hub
+    return hub
+
+
+def get_channel_layer_relay() -> ChannelLayerRelay:
+    """获取当前事件循环共享的ChannelLayerRelay实例，必须在协程中调用"""
+    loop = asyncio.get_running_loop()
+    relay = _relays.get(loop)
+    if relay is None:
+        relay = ChannelLayerRelay(get_live_event_hub())
+        _relays[loop] = relay
+    return relay
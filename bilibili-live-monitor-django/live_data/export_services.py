@@ -0,0 +1,119 @@
+"""
+历史数据导出服务 - 以NDJSON/CSV流式导出数据库中的弹幕和礼物
+
+按(timestamp, id)键集分页逐批读取，每批只取导出需要的列（房间ID通过JOIN一并取出），
+每批格式化为一段文本交给 StreamingHttpResponse，内存占用与导出总行数无关。
+"""
+import csv
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from django.conf import settings
+from django.db.models import Q
+
+from utils.serialization import dumps
+from .models import DanmakuData, GiftData
+
+# 每批从数据库读取的行数
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+DANMAKU_EXPORT_FIELDS = [
+    'room_id', 'uid', 'username', 'message', 'timestamp',
+    'medal_name', 'medal_level', 'user_level', 'is_admin', 'is_vip',
+]
+GIFT_EXPORT_FIELDS = [
+    'room_id', 'uid', 'username', 'gift_name', 'gift_id', 'num', 'price', 'total_price', 'timestamp',
+    'medal_name', 'medal_level',
+]
+
+# 导出类型 -> (模型, 字段)
+EXPORT_KINDS = {
+    'danmaku': (DanmakuData, DANMAKU_EXPORT_FIELDS),
+    'gifts': (GiftData, GIFT_EXPORT_FIELDS),
+}
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+
+class _Echo:
+    """csv.writer的伪文件对象，write直接返回格式化好的一行"""
+
+    def write(self, value):
+        return value
+
+
+def _ms_to_datetime(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+
+
+def export_queryset(kind: str, room_ids: List[int] = None, start_ms: int = None, end_ms: int = None):
+    """按房间和时间范围（毫秒时间戳）筛选导出数据，条件下推到 (room, timestamp) 索引"""
+    model, _fields = EXPORT_KINDS[kind]
+    queryset = model.objects.all()
+    if room_ids:
+        queryset = queryset.filter(room__room_id__in=room_ids)
+    if start_ms is not None:
+        queryset = queryset.filter(timestamp__gte=_ms_to_datetime(start_ms))
+    if end_ms is not None:
+        queryset = queryset.filter(timestamp__lte=_ms_to_datetime(end_ms))
+    return queryset
+
+
+def iter_export_batches(queryset, fields: List[str], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """按(timestamp, id)升序键集分页，逐批产出只包含导出字段的字典"""
+    columns = ['id', 'room__room_id'] + [field for field in fields if field != 'room_id']
+    if 'timestamp' not in columns:
+        columns.append('timestamp')
+    queryset = queryset.order_by('timestamp', 'id').values(*columns)
+
+    after = None
+    while True:
+        page = queryset
+        if after is not None:
+            page = page.filter(Q(timestamp__gt=after[0]) | Q(timestamp=after[0], id__gt=after[1]))
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+
+        after = (rows[-1]['timestamp'], rows[-1]['id'])
+        for row in rows:
+            row['room_id'] = row.pop('room__room_id')
+        yield rows
+
+        if len(rows) < chunk_size:
+            return
+
+
+def ndjson_stream(batches: Iterable[List[Dict]], fields: List[str]) -> Iterator[str]:
+    """每行一个JSON对象"""
+    for rows in batches:
+        yield ''.join(dumps({field: row[field] for field in fields}) + '\n' for row in rows)
+
+
+def _csv_value(value):
+    """CSV单元格的值：时间用ISO格式，空值输出为空"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def csv_stream(batches: Iterable[List[Dict]], header: List[str], to_row: Callable[[Dict], List]) -> Iterator[str]:
+    """带BOM（方便Excel打开）和表头的CSV"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)
+    for rows in batches:
+        yield ''.join(writer.writerow(to_row(row)) for row in rows)
+
+
+def export_stream(kind: str, export_format: str, queryset) -> Iterator[str]:
+    """按导出类型和格式生成流式响应内容"""
+    _model, fields = EXPORT_KINDS[kind]
+    batches = iter_export_batches(queryset, fields)
+    if export_format == 'csv':
+        return csv_stream(batches, fields, lambda row: [_csv_value(row[field]) for field in fields])
+    return ndjson_stream(batches, fields)
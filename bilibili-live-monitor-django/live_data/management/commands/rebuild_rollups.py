@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from live_data.models import LiveRoom, DanmakuData, GiftData
+from live_data.rollup_services import rebuild_room_rollups, truncate_to_bucket
+
+
+class Command(BaseCommand):
+    help = '根据数据库中的弹幕和礼物重建分钟/小时/天统计汇总（用于回填历史数据）'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room-id',
+            type=int,
+            help='指定房间ID，不指定则重建所有房间'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='只重建最近N天，不指定则从最早的数据开始'
+        )
+    
+    def handle(self, *args, **options):
+        rooms = LiveRoom.objects.all()
+        if options['room_id']:
+            rooms = rooms.filter(room_id=options['room_id'])
+        
+        now = timezone.now()
+        end = truncate_to_bucket(now, 'day') + timedelta(days=1)
+        total_minutes = 0
+        
+        for room in rooms:
+            if options['days']:
+                start = end - timedelta(days=options['days'])
+            else:
+                earliest = [
+                    value for value in (
+                        DanmakuData.objects.filter(room=room).aggregate(first=Min('timestamp'))['first'],
+                        GiftData.objects.filter(room=room).aggregate(first=Min('timestamp'))['first'],
+                    ) if value
+                ]
+                if not earliest:
+                    continue
+                start = truncate_to_bucket(min(earliest), 'day')
+            
+            # 按天分段重建，每段一个事务，避免长事务和大批量内存占用
+            room_minutes = 0
+            day = start
+            while day < end:
+                next_day = truncate_to_bucket(day + timedelta(days=1), 'day')
+                room_minutes += rebuild_room_rollups(room, day, next_day)
+                day = next_day
+            
+            total_minutes += room_minutes
+            self.stdout.write(f"  📊 房间 {room.room_id}: {room_minutes} 个分钟段")
+        
+        self.stdout.write(self.style.SUCCESS(f"✅ 统计汇总重建完成，共 {total_minutes} 个分钟段"))
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db import transaction
 from live_data.models import LiveRoom, DanmakuData, GiftData, MonitoringTask, DataMigrationLog
+from live_data.rollup_services import refresh_room_rollups
 from utils.redis_handler import get_redis_client, safe_decode, safe_json_loads
 import json
 import logging
@@ -357,6 +358,7 @@ class Command(BaseCommand):
             )
             
             synced_count = 0
+            synced_timestamps = []
             batch_data = []
             
             for danmaku_json in danmaku_list:
@@ -406,6 +408,7 @@ class Command(BaseCommand):
                             with transaction.atomic():
                                 DanmakuData.objects.bulk_create(batch_data, ignore_conflicts=True)
                         synced_count += len(batch_data)
+                        synced_timestamps.extend(obj.timestamp for obj in batch_data)
                         batch_data = []
                         
                 except Exception as e:
@@ -418,6 +421,10 @@ class Command(BaseCommand):
                     with transaction.atomic():
                         DanmakuData.objects.bulk_create(batch_data, ignore_conflicts=True)
                 synced_count += len(batch_data)
+                synced_timestamps.extend(obj.timestamp for obj in batch_data)
+            
+            # 更新新数据所在时间段的统计汇总
+            self.refresh_rollups(room, synced_timestamps)
             
             return synced_count
             
@@ -446,6 +453,7 @@ class Command(BaseCommand):
             )
             
             synced_count = 0
+            synced_timestamps = []
             batch_data = []
             
             for gift_json in gift_list:
@@ -500,6 +508,7 @@ class Command(BaseCommand):
                             with transaction.atomic():
                                 GiftData.objects.bulk_create(batch_data, ignore_conflicts=True)
                         synced_count += len(batch_data)
+                        synced_timestamps.extend(obj.timestamp for obj in batch_data)
                         batch_data = []
                         
                 except Exception as e:
@@ -512,6 +521,10 @@ class Command(BaseCommand):
                     with transaction.atomic():
                         GiftData.objects.bulk_create(batch_data, ignore_conflicts=True)
                 synced_count += len(batch_data)
+                synced_timestamps.extend(obj.timestamp for obj in batch_data)
+            
+            # 更新新数据所在时间段的统计汇总
+            self.refresh_rollups(room, synced_timestamps)
             
             return synced_count
             
@@ -519,6 +532,15 @@ class Command(BaseCommand):
             logger.error(f"同步房间{room_id}礼物数据失败: {e}")
             return 0
     
+    def refresh_rollups(self, room, timestamps):
+        """重算新同步数据所在时间段的分钟/小时/天汇总"""
+        if self.dry_run or not timestamps:
+            return
+        try:
+            refresh_room_rollups(room, timestamps)
+        except Exception as e:
+            logger.error(f"更新房间{room.room_id}统计汇总失败: {e}")
+    
     def sync_monitoring_tasks(self):
         """同步监控任务数据"""
         try:
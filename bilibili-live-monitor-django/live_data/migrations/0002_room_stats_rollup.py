@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomStatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', '分钟'), ('hour', '小时'), ('day', '天')], max_length=10, verbose_name='聚合粒度')),
+                ('bucket_start', models.DateTimeField(verbose_name='时间段开始')),
+                ('danmaku_count', models.IntegerField(default=0, verbose_name='弹幕数')),
+                ('gift_count', models.IntegerField(default=0, verbose_name='礼物记录数')),
+                ('gift_num', models.IntegerField(default=0, verbose_name='礼物数量')),
+                ('gift_value', models.DecimalField(decimal_places=4, default=0, max_digits=18, verbose_name='礼物总价值')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollup_set', to='live_data.liveroom', verbose_name='房间')),
+            ],
+            options={
+                'verbose_name': '房间统计汇总',
+                'verbose_name_plural': '房间统计汇总',
+                'db_table': 'room_stats_rollups',
+                'constraints': [models.UniqueConstraint(fields=('room', 'granularity', 'bucket_start'), name='unique_room_rollup')],
+            },
+        ),
+    ]
@@ -171,6 +171,39 @@ class GiftData(models.Model):
     def __str__(self):
         return f"{self.username}: {self.gift_name} x{self.num} (¥{self.total_price})"
 
+class RoomStatsRollup(models.Model):
+    """房间统计汇总（按分钟/小时/天聚合的弹幕和礼物数据）"""
+    GRANULARITY_CHOICES = [
+        ('minute', '分钟'),
+        ('hour', '小时'),
+        ('day', '天'),
+    ]
+    
+    room = models.ForeignKey(LiveRoom, on_delete=models.CASCADE, verbose_name="房间",
+                           related_name='rollup_set')
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, verbose_name="聚合粒度")
+    bucket_start = models.DateTimeField(verbose_name="时间段开始")
+    danmaku_count = models.IntegerField(default=0, verbose_name="弹幕数")
+    gift_count = models.IntegerField(default=0, verbose_name="礼物记录数")
+    gift_num = models.IntegerField(default=0, verbose_name="礼物数量")
+    gift_value = models.DecimalField(max_digits=18, decimal_places=4, default=0, verbose_name="礼物总价值")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+    
+    class Meta:
+        verbose_name = "房间统计汇总"
+        verbose_name_plural = "房间统计汇总"
+        db_table = 'room_stats_rollups'
+        # 唯一约束同时作为 (房间, 粒度, 时间段) 范围查询的索引
+        constraints = [
+            models.UniqueConstraint(
+                fields=['room', 'granularity', 'bucket_start'],
+                name='unique_room_rollup'
+            )
+        ]
+    
+    def __str__(self):
+        return f"{self.room_id} {self.get_granularity_display()} {self.bucket_start}: 弹幕{self.danmaku_count} 礼物¥{self.gift_value}"
+
 class MonitoringTask(models.Model):
     """监控任务模型"""
     STATUS_CHOICES = [
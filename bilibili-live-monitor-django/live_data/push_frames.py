@@ -0,0 +1,331 @@
+"""
+WebSocket推送帧合并 - 把高频实时事件合并成固定节奏的推送帧
+
+每个连接一个 FrameCoalescer：实时事件先进入缓冲区，距上一帧不足 WS_FRAME_INTERVAL_MS 时等到下一个节拍
+再一次性发出，低频房间的事件仍然立即推送。默认不限速，事件按seq连续推送；客户端可以声明每秒最多接收的弹幕/礼物数，
+超出时在每一帧内均匀抽样（蓄水池抽样），同时按房间给出精确的弹幕数、礼物数、礼物总价值和丢弃数，
+声明了上限的客户端的渲染量不随房间热度增长，并能从丢弃数区分抽样与丢失。
+
+每个连接一个 OutboundQueue：消费者的所有消息先放入有界队列，由独立的发送任务写到网络，
+处理组消息的协程不再等待慢客户端。发送忙时推送帧不入队而是继续在合并器中累积，超出单帧配额后丢弃最旧的事件
+（跳到最新，计数保持精确），队列积压超过 WS_SEND_QUEUE_SIZE 条或单条消息超过 WS_SEND_TIMEOUT 秒仍未发出时断开连接，
+客户端带 resume_from 重连补齐。丢弃和断开次数记入进程级的 push_metrics。
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from utils.live_events import EVENT_DANMAKU, EVENT_GIFT
+
+logger = logging.getLogger(__name__)
+
+# 推送帧间隔（毫秒）
+WS_FRAME_INTERVAL_MS = getattr(settings, 'WS_FRAME_INTERVAL_MS', 200)
+# 客户端未声明时每秒最多推送的弹幕/礼物数（0为不限制，只对主动声明max_rate的客户端抽样）
+WS_DEFAULT_MAX_EVENTS_PER_SECOND = getattr(settings, 'WS_DEFAULT_MAX_EVENTS_PER_SECOND', 0)
+# 客户端可以声明的每秒推送上限的最大值
+WS_MAX_EVENTS_PER_SECOND = getattr(settings, 'WS_MAX_EVENTS_PER_SECOND', 500)
+# 单帧最多保留的弹幕/礼物数（不限速或发送忙、帧被推迟时的内存上限）
+WS_FRAME_MAX_ITEMS = getattr(settings, 'WS_FRAME_MAX_ITEMS', 1000)
+# 每个连接最多积压的待发送消息数，超出后断开
+WS_SEND_QUEUE_SIZE = getattr(settings, 'WS_SEND_QUEUE_SIZE', 64)
+# 单条消息发送超时（秒），超时视为慢客户端并断开
+WS_SEND_TIMEOUT = getattr(settings, 'WS_SEND_TIMEOUT', 10)
+# 因发送积压断开连接时使用的关闭码（1013: Try Again Later）
+WS_CLOSE_SLOW_CONSUMER = 1013
+
+
+def clamp_max_rate(value):
+    """把客户端声明的每秒推送上限限制在 [1, WS_MAX_EVENTS_PER_SECOND]；0或null表示不限制，无效值抛出ValueError"""
+    if value is None:
+        return 0
+    rate = int(value)
+    if rate < 0:
+        raise ValueError('max_rate 不能小于0')
+    return min(rate, WS_MAX_EVENTS_PER_SECOND)
+
+
+def gift_value(gift):
+    """礼物总价值（单价×数量），格式异常时为0"""
+    try:
+        return float(gift.get('price') or 0) * int(gift.get('num') or 1)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PushMetrics:
+    """本进程WebSocket推送计数（所有连接累计）"""
+
+    FIELDS = (
+        'frames_sent',         # 发出的推送帧
+        'frames_deferred',     # 因发送忙推迟的帧节拍
+        'events_sampled_out',  # 超出客户端速率被抽样丢弃的弹幕/礼物
+        'messages_dropped',    # 断开慢客户端时丢弃的待发送消息
+        'slow_disconnects',    # 因积压或发送超时断开的连接
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._connections = 0
+
+    def incr(self, field, amount=1):
+        if amount:
+            with self._lock:
+                self._counts[field] += amount
+
+    def connection_opened(self):
+        with self._lock:
+            self._connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self._connections = max(0, self._connections - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {'connections': self._connections, **self._counts}
+
+
+push_metrics = PushMetrics()
+
+
+class OutboundQueue:
+    """单个连接的有界发送队列：独立任务按顺序发送，积压或发送超时时调用 on_overflow 断开连接"""
+
+    def __init__(self, send, on_overflow, max_size=None, timeout=None):
+        self.send = send
+        self.on_overflow = on_overflow
+        self.max_size = max_size or WS_SEND_QUEUE_SIZE
+        self.timeout = timeout or WS_SEND_TIMEOUT
+        self.overflowed = False
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+        self._sending = False
+        self._task = asyncio.ensure_future(self._run())
+        push_metrics.connection_opened()
+
+    @property
+    def busy(self):
+        """有消息正在发送或等待发送"""
+        return self._sending or bool(self._queue)
+
+    def put(self, text):
+        """放入一条待发送消息，不等待网络；队列已满时断开连接并返回False"""
+        if self.overflowed:
+            return False
+        if len(self._queue) >= self.max_size:
+            self.overflow(f'发送队列积压超过 {self.max_size} 条')
+            return False
+        self._queue.append(text)
+        self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                text = self._queue.popleft()
+                self._sending = True
+                try:
+                    await asyncio.wait_for(self.send(text), self.timeout)
+                except asyncio.TimeoutError:
+                    self.overflow(f'消息超过 {self.timeout} 秒未发出')
+                    return
+                except Exception as e:
+                    logger.debug(f"WebSocket消息发送失败: {e}")
+                finally:
+                    self._sending = False
+
+    def overflow(self, reason):
+        """慢客户端：丢弃积压的消息，记入计数并通知连接断开"""
+        if self.overflowed:
+            return
+        self.overflowed = True
+        push_metrics.incr('messages_dropped', len(self._queue))
+        push_metrics.incr('slow_disconnects')
+        self._queue.clear()
+        logger.warning(f"⚠️ WebSocket客户端过慢，断开连接: {reason}")
+        asyncio.ensure_future(self.on_overflow())
+
+    def close(self):
+        """连接断开时停止发送任务"""
+        if self._task is not None:
+            if not self._task.done():
+                self._task.cancel()
+            self._task = None
+            push_metrics.connection_closed()
+        self._queue.clear()
+
+
+class _RoomWindow:
+    """一个房间在当前帧内的精确计数"""
+
+    __slots__ = ('seq', 'danmaku', 'gifts', 'gift_value', 'kept', 'room_update')
+
+    def __init__(self):
+        self.seq = None
+        self.danmaku = 0
+        self.gifts = 0
+        self.gift_value = 0.0
+        self.kept = 0
+        self.room_update = None
+
+
+class FrameCoalescer:
+    """单个连接的推送帧合并器
+
+    add() 把事件放入当前帧，send_frame(rooms) 在节拍到达时被调用，
+    rooms 为 {room_id: {'seq', 'data', 'counts', 'dropped'}}，data 与 live_update 的数据部分格式相同。
+    传入 outbound 时，发送队列忙的节拍不出帧，事件继续累积到下一个节拍。
+    """
+
+    def __init__(self, send_frame, interval_ms=None, max_rate=None, outbound=None):
+        self.send_frame = send_frame
+        self.interval = (interval_ms if interval_ms is not None else WS_FRAME_INTERVAL_MS) / 1000.0
+        self.max_rate = WS_DEFAULT_MAX_EVENTS_PER_SECOND if max_rate is None else max_rate
+        self.outbound = outbound
+        self._windows = {}
+        self._sampled = []  # [(room_id, seq, event_type, data)]，弹幕和礼物的抽样结果
+        self._seen = 0      # 当前帧内参与抽样的事件数
+        self._deferred = False
+        self._last_flush = 0.0
+        self._flush_task = None
+
+    @property
+    def frame_budget(self):
+        """每一帧最多保留的弹幕/礼物数"""
+        if not self.max_rate:
+            return WS_FRAME_MAX_ITEMS
+        return min(WS_FRAME_MAX_ITEMS, max(1, round(self.max_rate * self.interval)))
+
+    def set_max_rate(self, max_rate):
+        self.max_rate = max_rate
+
+    def add(self, room_id, event_type, data):
+        """把一个事件放入当前帧，并安排一次发送"""
+        window = self._windows.get(room_id)
+        if window is None:
+            window = self._windows[room_id] = _RoomWindow()
+
+        if event_type in (EVENT_DANMAKU, EVENT_GIFT):
+            seq = data.get('seq')
+            if seq:
+                window.seq = max(window.seq or 0, seq)
+            if event_type == EVENT_DANMAKU:
+                window.danmaku += 1
+            else:
+                window.gifts += 1
+                window.gift_value += gift_value(data)
+            self._sample((room_id, seq or 0, event_type, data))
+        else:
+            # 房间状态只保留最新一次
+            window.room_update = data
+
+        self._schedule()
+
+    def _sample(self, item):
+        """蓄水池抽样：超出本帧配额后每个事件被保留的概率相同；帧被推迟时改为丢弃最旧的事件"""
+        self._seen += 1
+        budget = self.frame_budget
+        if len(self._sampled) < budget:
+            self._sampled.append(item)
+            return
+        if self._deferred:
+            self._sampled.pop(0)
+            self._sampled.append(item)
+            return
+        index = random.randrange(self._seen)
+        if index < budget:
+            self._sampled[index] = item
+
+    def _schedule(self):
+        if self._flush_task is None or self._flush_task.done():
+            delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+            self._flush_task = asyncio.ensure_future(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        # 延迟为0时也让出一次事件循环，同一批到达的事件合并到一帧
+        await asyncio.sleep(delay)
+        # 发送队列忙：本节拍不出帧，继续累积（抽样保留最新事件，计数保持精确）
+        while self.outbound is not None and self.outbound.busy and not self.outbound.overflowed:
+            if not self._deferred:
+                # 按事件ID排序，之后超出配额时从最旧的一端丢弃
+                self._sampled.sort(key=lambda item: item[1])
+                self._deferred = True
+            push_metrics.incr('frames_deferred')
+            await asyncio.sleep(self.interval)
+        self._deferred = False
+        # 发送期间到达的事件安排到下一帧
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.debug(f"推送帧发送失败: {e}")
+
+    def take(self):
+        """取出当前帧（没有待发送内容时返回None）"""
+        if not self._windows:
+            return None
+        windows, sampled = self._windows, self._sampled
+        self._windows, self._sampled, self._seen = {}, [], 0
+
+        for room_id, seq, event_type, data in sampled:
+            windows[room_id].kept += 1
+        sampled.sort(key=lambda item: item[1])
+
+        rooms = {}
+        for room_id, window in windows.items():
+            dropped = window.danmaku + window.gifts - window.kept
+            push_metrics.incr('events_sampled_out', dropped)
+            rooms[room_id] = {
+                'seq': window.seq,
+                'data': {} if window.room_update is None else {'room_update': window.room_update},
+                'counts': {
+                    'danmaku': window.danmaku,
+                    'gifts': window.gifts,
+                    'gift_value': round(window.gift_value, 2),
+                },
+                'dropped': dropped,
+            }
+        for room_id, seq, event_type, data in sampled:
+            key = 'new_danmaku' if event_type == EVENT_DANMAKU else 'new_gifts'
+            rooms[room_id]['data'].setdefault(key, []).append(data)
+        return rooms
+
+    async def flush(self):
+        """立即发送当前帧"""
+        self._last_flush = time.monotonic()
+        rooms = self.take()
+        if rooms:
+            push_metrics.incr('frames_sent')
+            await self.send_frame(rooms)
+
+    def discard(self, room_id=None):
+        """丢弃缓冲中的事件（指定房间或全部），用于重新发送初始数据或取消订阅"""
+        if room_id is None:
+            self._windows, self._sampled, self._seen = {}, [], 0
+            return
+        if self._windows.pop(room_id, None) is not None:
+            self._sampled = [item for item in self._sampled if item[0] != room_id]
+            self._seen = len(self._sampled)
+
+    def retain(self, room_ids):
+        """只保留仍在订阅的房间的缓冲事件，其余丢弃"""
+        room_ids = set(room_ids)
+        self._windows = {room_id: window for room_id, window in self._windows.items() if room_id in room_ids}
+        self._sampled = [item for item in self._sampled if item[0] in room_ids]
+        self._seen = len(self._sampled)
+
+    def close(self):
+        """连接断开时取消待发送的帧"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        self.discard()
@@ -0,0 +1,16 @@
+"""
+API响应 - 使用共用的快速JSON序列化
+"""
+from django.http import HttpResponse
+
+from utils.serialization import dumps_bytes
+
+
+class FastJsonResponse(HttpResponse):
+    """与JsonResponse用法一致的JSON响应，序列化走 utils.serialization（orjson可用时使用orjson）"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps_bytes(data), **kwargs)
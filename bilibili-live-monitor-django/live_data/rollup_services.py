@@ -0,0 +1,188 @@
+"""
+房间统计汇总服务 - 按分钟/小时/天预聚合数据库中的弹幕和礼物
+
+Redis→数据库同步写入新数据后，只重算本批数据落入的分钟时间段（从原始表按 (room, timestamp) 索引聚合），
+再由分钟汇总逐级合成小时、天汇总。重算是幂等的，重复同步或唯一约束忽略的重复数据都不会造成重复计数。
+时间序列查询只读汇总表，耗时与原始数据量无关。时间段按 settings.TIME_ZONE 的本地时间划分。
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+from django.utils import timezone
+
+from .models import LiveRoom, DanmakuData, GiftData, RoomStatsRollup
+
+# 单次时间序列查询最多返回的时间段数
+ROLLUP_MAX_POINTS = getattr(settings, 'ROLLUP_MAX_POINTS', 5000)
+
+ROLLUP_GRANULARITIES = ('minute', 'hour', 'day')
+ROLLUP_STEPS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+ROLLUP_VALUE_FIELDS = ['danmaku_count', 'gift_count', 'gift_num', 'gift_value']
+
+_TRUNC_FUNCTIONS = {'minute': TruncMinute, 'hour': TruncHour, 'day': TruncDay}
+# 逐级合成：小时由分钟汇总，天由小时汇总
+_ROLLUP_SOURCES = {'hour': 'minute', 'day': 'hour'}
+
+
+def truncate_to_bucket(value: datetime, granularity: str) -> datetime:
+    """时间截断到所在时间段的开始（本地时间）"""
+    local = timezone.localtime(value) if timezone.is_aware(value) else timezone.make_aware(value)
+    if granularity == 'minute':
+        return local.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _empty_values() -> Dict:
+    return {'danmaku_count': 0, 'gift_count': 0, 'gift_num': 0, 'gift_value': Decimal('0')}
+
+
+def _aggregate_raw(room: LiveRoom, start: datetime, end: datetime) -> Dict[datetime, Dict]:
+    """从原始弹幕/礼物表按分钟聚合 [start, end) 内的数据"""
+    buckets = {}
+
+    danmaku_rows = (
+        DanmakuData.objects.filter(room=room, timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=TruncMinute('timestamp'))
+        .values('bucket')
+        .annotate(danmaku_count=Count('id'))
+    )
+    for row in danmaku_rows:
+        buckets.setdefault(row['bucket'], _empty_values())['danmaku_count'] = row['danmaku_count']
+
+    gift_rows = (
+        GiftData.objects.filter(room=room, timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=TruncMinute('timestamp'))
+        .values('bucket')
+        .annotate(gift_count=Count('id'), gift_num=Sum('num'), gift_value=Sum('total_price'))
+    )
+    for row in gift_rows:
+        values = buckets.setdefault(row['bucket'], _empty_values())
+        values['gift_count'] = row['gift_count']
+        values['gift_num'] = row['gift_num'] or 0
+        values['gift_value'] = row['gift_value'] or Decimal('0')
+
+    return buckets
+
+
+def _aggregate_rollups(room: LiveRoom, granularity: str, start: datetime, end: datetime) -> Dict[datetime, Dict]:
+    """由下一级汇总合成 [start, end) 内的小时/天汇总"""
+    rows = (
+        RoomStatsRollup.objects.filter(
+            room=room, granularity=_ROLLUP_SOURCES[granularity],
+            bucket_start__gte=start, bucket_start__lt=end,
+        )
+        .annotate(bucket=_TRUNC_FUNCTIONS[granularity]('bucket_start'))
+        .values('bucket')
+        .annotate(**{field: Sum(field) for field in ROLLUP_VALUE_FIELDS})
+    )
+    return {row['bucket']: {field: row[field] or 0 for field in ROLLUP_VALUE_FIELDS} for row in rows}
+
+
+def _upsert_rollups(room: LiveRoom, granularity: str, buckets: Dict[datetime, Dict]):
+    """写入汇总，已存在的时间段直接覆盖"""
+    if not buckets:
+        return
+    RoomStatsRollup.objects.bulk_create(
+        [
+            RoomStatsRollup(room=room, granularity=granularity, bucket_start=bucket, **values)
+            for bucket, values in buckets.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['room', 'granularity', 'bucket_start'],
+        update_fields=ROLLUP_VALUE_FIELDS + ['updated_at'],
+    )
+
+
+def _refresh_buckets(room: LiveRoom, minutes: Iterable[datetime]):
+    """重算指定分钟时间段，并逐级更新它们所属的小时和天"""
+    touched = {'minute': set(minutes)}
+    for granularity in ('hour', 'day'):
+        touched[granularity] = {
+            truncate_to_bucket(bucket, granularity) for bucket in touched[_ROLLUP_SOURCES[granularity]]
+        }
+
+    for granularity in ROLLUP_GRANULARITIES:
+        buckets = touched[granularity]
+        start, end = min(buckets), max(buckets) + ROLLUP_STEPS[granularity]
+        if granularity == 'minute':
+            aggregated = _aggregate_raw(room, start, end)
+        else:
+            aggregated = _aggregate_rollups(room, granularity, start, end)
+        _upsert_rollups(room, granularity, {
+            bucket: aggregated.get(bucket, _empty_values()) for bucket in buckets
+        })
+
+
+def refresh_room_rollups(room: LiveRoom, timestamps: Iterable[datetime]) -> int:
+    """同步写入新数据后调用：只重算这些时间戳所在的时间段，返回重算的分钟数"""
+    minutes = {truncate_to_bucket(ts, 'minute') for ts in timestamps}
+    if not minutes:
+        return 0
+    with transaction.atomic():
+        _refresh_buckets(room, minutes)
+    return len(minutes)
+
+
+def rebuild_room_rollups(room: LiveRoom, start: datetime, end: datetime) -> int:
+    """按原始数据重建 [start, end) 内的全部汇总（start/end 按天对齐），返回有数据的分钟数"""
+    start = truncate_to_bucket(start, 'day')
+    end_day = truncate_to_bucket(end, 'day')
+    end = end_day if end_day == end else end_day + ROLLUP_STEPS['day']
+    with transaction.atomic():
+        RoomStatsRollup.objects.filter(room=room, bucket_start__gte=start, bucket_start__lt=end).delete()
+        minutes = _aggregate_raw(room, start, end)
+        _upsert_rollups(room, 'minute', minutes)
+        for granularity in ('hour', 'day'):
+            _upsert_rollups(room, granularity, _aggregate_rollups(room, granularity, start, end))
+    return len(minutes)
+
+
+def get_room_timeseries(room_id: int, granularity: str, start: datetime, end: datetime) -> Optional[Dict]:
+    """按指定粒度返回 [start, end) 内每个时间段的统计（无数据的时间段补0），房间不存在时返回None"""
+    if granularity not in ROLLUP_STEPS:
+        raise ValueError(f'不支持的粒度: {granularity}（可选 {", ".join(ROLLUP_GRANULARITIES)}）')
+
+    step = ROLLUP_STEPS[granularity]
+    first = truncate_to_bucket(start, granularity)
+    if (end - first) / step > ROLLUP_MAX_POINTS:
+        raise ValueError(f'时间范围过大：{granularity} 粒度最多返回 {ROLLUP_MAX_POINTS} 个时间段')
+
+    room = LiveRoom.objects.filter(room_id=room_id).only('id').first()
+    if room is None:
+        return None
+
+    rows = RoomStatsRollup.objects.filter(
+        room=room, granularity=granularity, bucket_start__gte=first, bucket_start__lt=end,
+    ).values('bucket_start', *ROLLUP_VALUE_FIELDS)
+    stored = {row.pop('bucket_start'): row for row in rows}
+
+    points: List[Dict] = []
+    totals = _empty_values()
+    bucket = first
+    while bucket < end:
+        values = stored.get(bucket, _empty_values())
+        for field in ROLLUP_VALUE_FIELDS:
+            totals[field] += values[field]
+        points.append({
+            'time': bucket.isoformat(),
+            'danmaku_count': values['danmaku_count'],
+            'gift_count': values['gift_count'],
+            'gift_num': values['gift_num'],
+            'gift_value': float(values['gift_value']),
+        })
+        bucket = truncate_to_bucket(bucket + step, granularity)
+
+    totals['gift_value'] = float(totals['gift_value'])
+    return {'points': points, 'totals': totals}
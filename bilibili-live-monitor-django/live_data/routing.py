@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/room/(?P<room_id>\d+)/$', consumers.LiveDataConsumer.as_asgi()),
+    # 一个连接订阅多个房间（或全部房间）
+    re_path(r'ws/rooms/$', consumers.MultiRoomConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+弹幕搜索服务 - 跨房间检索Redis缓存窗口与SQLite历史数据
+
+结果按发送时间倒序排列：Redis缓存窗口与数据库中窗口之前的历史弹幕按时间归并。
+分页使用不透明游标（记录两个来源各自消费到的位置），每一页凑满即停止读取。
+房间、UID、时间范围等条件直接下推到Redis有序集合的分值区间和数据库索引上。
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Any, List, Optional
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .danmaku_services import get_danmaku_service
+from .models import DanmakuData
+
+logger = logging.getLogger(__name__)
+
+SOURCE_REDIS = 'redis'
+SOURCE_HISTORY = 'history'
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """把分页状态编码为不透明游标"""
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """解析不透明游标"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(state, dict):
+            raise ValueError('cursor is not an object')
+        return state
+    except Exception as e:
+        raise InvalidCursor(f'无效的游标: {e}')
+
+
+def _ms_to_datetime(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+
+
+def _datetime_to_ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def search_danmaku(keyword: str = None, username: str = None, uid: int = None,
+                   room_ids: List[int] = None, start_ms: int = None, end_ms: int = None,
+                   include_history: bool = False, limit: int = 50, cursor: str = None) -> Dict[str, Any]:
+    """跨房间搜索弹幕，返回 {'results', 'next_cursor', 'has_more'}"""
+    state = decode_cursor(cursor) if cursor else {}
+    service = get_danmaku_service()
+
+    # 开启历史检索时，记录每个房间缓存窗口的起点，数据库只补充窗口之前的数据，避免重复
+    if include_history and 'windows' not in state:
+        state['windows'] = {str(room_id): start for room_id, start in service.get_index_window_starts(room_ids).items()}
+
+    # 两个来源各取至多一页，按时间归并后截取一页，各自记录消费到的位置
+    candidates = []
+    if not state.get('redis_done'):
+        hits = service.search_danmaku_across_rooms(
+            keyword=keyword, username=username, uid=uid, room_ids=room_ids,
+            start_ms=start_ms, end_ms=end_ms, limit=limit,
+            after=tuple(state['redis_after']) if state.get('redis_after') else None,
+        )
+        for hit in hits:
+            position = hit.pop('position')
+            hit['source'] = SOURCE_REDIS
+            candidates.append((position[0], SOURCE_REDIS, position, hit))
+        redis_exhausted = len(hits) < limit
+    else:
+        redis_exhausted = True
+
+    if include_history and not state.get('history_done'):
+        rows = _search_history(state, keyword, username, uid, room_ids, start_ms, end_ms, limit)
+        for row in rows:
+            candidates.append((_datetime_to_ms(row.timestamp), SOURCE_HISTORY,
+                               [row.timestamp.isoformat(), row.id], _format_history_row(row)))
+        history_exhausted = len(rows) < limit
+    else:
+        history_exhausted = True
+
+    candidates.sort(key=lambda item: item[0], reverse=True)
+    page = candidates[:limit]
+    leftover = candidates[limit:]
+
+    for _ts, source, position, _item in page:
+        state[f'{source}_after'] = position
+
+    state['redis_done'] = redis_exhausted and not any(item[1] == SOURCE_REDIS for item in leftover)
+    state['history_done'] = history_exhausted and not any(item[1] == SOURCE_HISTORY for item in leftover)
+
+    has_more = not (state['redis_done'] and (state['history_done'] or not include_history))
+    return {
+        'results': [item for _ts, _source, _position, item in page],
+        'next_cursor': encode_cursor(state) if has_more else None,
+        'has_more': has_more,
+    }
+
+
+def _search_history(state: Dict[str, Any], keyword, username, uid, room_ids, start_ms, end_ms, limit) -> List[DanmakuData]:
+    """在数据库中按(timestamp, id)倒序做键集分页，条件全部下推到SQL"""
+    queryset = DanmakuData.objects.select_related('room')
+
+    if room_ids:
+        queryset = queryset.filter(room__room_id__in=room_ids)
+    if uid:
+        queryset = queryset.filter(uid=uid)
+    if start_ms is not None:
+        queryset = queryset.filter(timestamp__gte=_ms_to_datetime(start_ms))
+    if end_ms is not None:
+        queryset = queryset.filter(timestamp__lte=_ms_to_datetime(end_ms))
+    if username:
+        queryset = queryset.filter(username__istartswith=username.strip())
+    if keyword:
+        queryset = queryset.filter(message__icontains=keyword.strip())
+
+    # 只取Redis没有覆盖的部分：缓存中没有的房间，或者各房间缓存窗口之前的数据
+    windows = state.get('windows') or {}
+    if windows:
+        uncovered = ~Q(room__room_id__in=[int(room_id) for room_id in windows])
+        for room_id, window_start in windows.items():
+            uncovered |= Q(room__room_id=int(room_id), timestamp__lt=_ms_to_datetime(window_start))
+        queryset = queryset.filter(uncovered)
+
+    if state.get('history_after'):
+        after_ts = datetime.fromisoformat(state['history_after'][0])
+        after_id = state['history_after'][1]
+        queryset = queryset.filter(Q(timestamp__lt=after_ts) | Q(timestamp=after_ts, id__lt=after_id))
+
+    return list(queryset.order_by('-timestamp', '-id')[:limit])
+
+
+def _format_history_row(row: DanmakuData) -> Dict[str, Any]:
+    """数据库弹幕转换为与Redis搜索结果一致的格式"""
+    return {
+        'username': row.username,
+        'message': row.message,
+        'timestamp': row.timestamp.isoformat(),
+        'send_time_formatted': timezone.localtime(row.timestamp).strftime('%H:%M:%S'),
+        'room_id': row.room.room_id,
+        'uid': row.uid,
+        'seq': None,
+        'source': SOURCE_HISTORY,
+    }
+
+
+def parse_time_param(value: Optional[str]) -> Optional[int]:
+    """解析时间参数（毫秒时间戳或ISO格式），返回毫秒时间戳"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = timezone.make_aware(parsed)
+    return _datetime_to_ms(parsed)
@@ -0,0 +1,57 @@
+"""
+测试公共部分 - 用fakeredis替换Redis连接池
+
+同步服务和异步服务的连接池（BlockingConnectionPool）都连接到同一个内存中的FakeServer，测试直接向 self.redis 写入收集器格式的数据。
+未安装fakeredis时跳过依赖Redis的测试。
+"""
+import json
+import unittest
+from unittest import mock
+
+import redis
+import redis.asyncio as aioredis
+from django.core.cache import cache
+from django.test import TestCase
+
+from live_data.danmaku_services import reset_danmaku_service
+
+try:
+    import fakeredis
+    import fakeredis.aioredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, '需要安装fakeredis')
+class FakeRedisTestCase(TestCase):
+    """每个测试一个空的FakeServer，服务实例和Django缓存在前后重置"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = fakeredis.FakeServer()
+        sync_pool = redis.BlockingConnectionPool
+        async_pool = aioredis.BlockingConnectionPool
+
+        def make_sync_pool(*args, **kwargs):
+            kwargs.pop('health_check_interval', None)
+            return sync_pool(connection_class=fakeredis.FakeConnection, server=self.server, **kwargs)
+
+        def make_async_pool(*args, **kwargs):
+            kwargs.pop('health_check_interval', None)
+            return async_pool(connection_class=fakeredis.aioredis.FakeAsyncRedisConnection, server=self.server, **kwargs)
+
+        for target, factory in (('redis.BlockingConnectionPool', make_sync_pool),
+                                ('redis.asyncio.BlockingConnectionPool', make_async_pool)):
+            patcher = mock.patch(target, side_effect=factory)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.redis = fakeredis.FakeRedis(server=self.server, decode_responses=True)
+        reset_danmaku_service()
+        self.addCleanup(reset_danmaku_service)
+        cache.clear()
+
+    def push_events(self, room_id, kind, seqs, **fields):
+        """按收集器的方式写入弹幕/礼物（LPUSH，列表按时间倒序），seqs按写入顺序给出"""
+        for seq in seqs:
+            self.redis.lpush(f'room:{room_id}:{kind}', json.dumps({'seq': seq, 'username': f'user{seq}', **fields}))
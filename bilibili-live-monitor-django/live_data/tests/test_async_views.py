@@ -0,0 +1,17 @@
+"""异步视图：装饰后仍是协程函数，ASGI下不会被放进线程池执行"""
+from asgiref.sync import iscoroutinefunction
+from django.test import SimpleTestCase
+
+from live_data import async_views, views
+
+
+class AsyncViewDecoratorTests(SimpleTestCase):
+
+    def test_decorated_views_stay_coroutines(self):
+        for view in (
+            async_views.api_rooms_list, async_views.api_room_stats, async_views.api_room_danmaku,
+            async_views.api_room_gifts, async_views.api_system_stats,
+            views.api_room_events, views.api_all_events,
+        ):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(iscoroutinefunction(view))
@@ -0,0 +1,48 @@
+"""WebSocket消费者：两种连接共用消息解码、set_rate和ping的处理"""
+import json
+
+from django.test import SimpleTestCase
+
+from live_data.consumers import LiveDataConsumer, MultiRoomConsumer
+from live_data.push_frames import FrameCoalescer
+from live_data.ws_encoding import MessageEncoder
+
+
+class CollectingQueue:
+    """代替OutboundQueue，记录放入发送队列的消息"""
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, payload):
+        self.messages.append(json.loads(payload))
+
+
+class ConsumerMessageTests(SimpleTestCase):
+
+    def make_consumer(self, consumer_class):
+        consumer = consumer_class()
+        consumer.encoder = MessageEncoder('json')
+        consumer.outbound = CollectingQueue()
+        consumer.frames = FrameCoalescer(consumer.send_live_frame)
+        return consumer
+
+    async def test_binary_frame_rejected_without_msgpack(self):
+        for consumer_class in (LiveDataConsumer, MultiRoomConsumer):
+            with self.subTest(consumer=consumer_class.__name__):
+                consumer = self.make_consumer(consumer_class)
+                await consumer.receive(bytes_data=b'\x81\xa4type\xa4ping')
+                self.assertEqual(consumer.outbound.messages[-1]['type'], 'error')
+
+    async def test_shared_messages(self):
+        for consumer_class in (LiveDataConsumer, MultiRoomConsumer):
+            with self.subTest(consumer=consumer_class.__name__):
+                consumer = self.make_consumer(consumer_class)
+                await consumer.receive(text_data='{"type": "ping", "timestamp": 1}')
+                await consumer.receive(text_data='{"type": "set_rate", "max_rate": 10}')
+                await consumer.receive(text_data='{"type": "set_rate", "max_rate": null}')
+                self.assertEqual(consumer.outbound.messages, [
+                    {'type': 'pong', 'timestamp': 1},
+                    {'type': 'rate_set', 'max_rate': 10},
+                    {'type': 'rate_set', 'max_rate': 0},
+                ])
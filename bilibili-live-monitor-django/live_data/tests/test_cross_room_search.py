@@ -0,0 +1,53 @@
+"""跨房间搜索翻页：同一毫秒内大量命中跨越分页边界时，游标翻页既不重复也不遗漏"""
+import json
+
+from asgiref.sync import async_to_sync
+
+from live_data.async_danmaku_services import get_async_danmaku_service
+from live_data.danmaku_services import get_danmaku_service
+from utils.danmaku_index import ALL_TOKEN, DANMAKU_BYID_KEY, DANMAKU_TOKEN_KEY
+
+from .base import FakeRedisTestCase
+
+ROOM_IDS = [3001, 3002]
+BASE_MS = 1700000000000
+
+
+class CrossRoomSearchCursorTests(FakeRedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 每个毫秒7条弹幕，seq跨越一位数和两位数，Redis同分值内的字典序与数值序不同
+        self.expected = []
+        for room_id in ROOM_IDS:
+            for seq in range(1, 29):
+                score = BASE_MS + seq // 7
+                self.redis.hset(DANMAKU_BYID_KEY.format(room_id=room_id), seq,
+                                json.dumps({'seq': seq, 'username': f'user{seq}', 'message': 'hi'}))
+                self.redis.zadd(DANMAKU_TOKEN_KEY.format(room_id=room_id, token=ALL_TOKEN), {seq: score})
+                self.expected.append((score, room_id, seq))
+        self.expected.sort(reverse=True)
+
+    def page_through(self, search, limit):
+        """以上一页最后一条的position作为游标逐页读取"""
+        positions, after = [], None
+        while True:
+            items = search(room_ids=ROOM_IDS, limit=limit, after=after)
+            if not items:
+                return positions
+            positions.extend(tuple(item['position']) for item in items)
+            after = items[-1]['position']
+
+    def test_paging_has_no_duplicates_or_gaps(self):
+        for limit in (1, 3, 4, 7, 10):
+            with self.subTest(limit=limit):
+                positions = self.page_through(get_danmaku_service().search_danmaku_across_rooms, limit)
+                self.assertEqual(positions, self.expected)
+
+    def test_async_paging_matches_sync(self):
+        def search(**kwargs):
+            async def run():
+                return await get_async_danmaku_service().search_danmaku_across_rooms(**kwargs)
+            return async_to_sync(run)()
+
+        self.assertEqual(self.page_through(search, 4), self.expected)
@@ -0,0 +1,79 @@
+"""弹幕倒排索引：索引词前缀互不冲突，写入脚本在一次往返内分配seq并建立索引"""
+import json
+import unittest
+
+from django.test import SimpleTestCase
+
+from utils.danmaku_index import (
+    DANMAKU_BYID_KEY, DANMAKU_KEY, DANMAKU_SEQ_KEY, DANMAKU_TOKEN_KEY,
+    append_event, append_event_result, event_tokens, keyword_query_tokens, message_tokens, register_append_script,
+    username_query_token, username_tokens,
+)
+from utils.live_events import EVENT_DANMAKU, LIVE_EVENTS_STREAM_KEY
+
+from .base import FakeRedisTestCase
+
+try:
+    import lupa
+except ImportError:
+    lupa = None
+
+ROOM_ID = 2002
+
+
+class IndexTokenTests(SimpleTestCase):
+
+    def test_message_grams_do_not_collide_with_username_prefixes(self):
+        # 消息 "u:ab" 的片段与用户名 "ab" 的前缀文本相同，但属于不同的索引
+        self.assertFalse(message_tokens('u:ab') & username_tokens('ab'))
+        self.assertNotIn(username_query_token('ab'), keyword_query_tokens('u:ab'))
+
+    def test_query_tokens_match_indexed_tokens(self):
+        tokens = event_tokens({'message': '主播好厉害', 'username': '小明'})
+        self.assertTrue(set(keyword_query_tokens('厉害')) <= tokens)
+        self.assertIn(username_query_token('小'), tokens)
+
+
+@unittest.skipIf(lupa is None, 'fakeredis执行Lua脚本需要安装lupa')
+class AppendEventTests(FakeRedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.script = register_append_script(self.redis)
+
+    def append(self, message, max_items=500):
+        event = {'username': '小明', 'message': message, 'send_time_ms': 1700000000000}
+        pipe = self.redis.pipeline(transaction=False)
+        call = append_event(pipe, self.script, ROOM_ID, EVENT_DANMAKU, event, json.dumps(event),
+                            DANMAKU_KEY.format(room_id=ROOM_ID), max_items, indexed=True)
+        pipe.incr('other')
+        return append_event_result(self.script, self.redis, pipe.execute(raise_on_error=False), call)
+
+    def test_assigns_seq_and_indexes_in_one_script(self):
+        seq, evicted = self.append('主播好厉害')
+        self.assertEqual((seq, evicted), (1, []))
+        self.assertEqual(self.redis.get(DANMAKU_SEQ_KEY.format(room_id=ROOM_ID)), '1')
+
+        stored = json.loads(self.redis.lindex(DANMAKU_KEY.format(room_id=ROOM_ID), 0))
+        self.assertEqual(stored['seq'], 1)
+        self.assertEqual(json.loads(self.redis.hget(DANMAKU_BYID_KEY.format(room_id=ROOM_ID), 1))['seq'], 1)
+        for token in keyword_query_tokens('厉害'):
+            self.assertEqual(self.redis.zrange(DANMAKU_TOKEN_KEY.format(room_id=ROOM_ID, token=token), 0, -1), ['1'])
+
+        stream = self.redis.xrange(LIVE_EVENTS_STREAM_KEY)
+        self.assertEqual(json.loads(stream[-1][1]['data'])['seq'], 1)
+
+    def test_returns_evicted_items(self):
+        self.append('first', max_items=1)
+        seq, evicted = self.append('second', max_items=1)
+        self.assertEqual(seq, 2)
+        self.assertEqual([json.loads(raw)['message'] for raw in evicted], ['first'])
+
+    def test_reloads_script_after_noscript(self):
+        # 脚本缓存为空（首次写入、Redis重启或SCRIPT FLUSH）时加载脚本重新执行，不重复执行其余命令
+        self.redis.script_flush()
+        self.assertEqual(self.append('first'), [1, []])
+        self.redis.script_flush()
+        self.assertEqual(self.append('second'), [2, []])
+        self.assertEqual(self.redis.get('other'), '2')
+        self.assertEqual(self.redis.llen(DANMAKU_KEY.format(room_id=ROOM_ID)), 2)
@@ -0,0 +1,43 @@
+"""仪表板快照：版本号未变化时跳过重建的判断"""
+from unittest import mock
+
+from live_data.danmaku_services import DanmakuService
+from live_data.dashboard_snapshot import DASHBOARD_SNAPSHOT_MAX_STALE, DashboardSnapshotter
+from utils.room_summary import ROOMS_VERSION_KEY, ROOMS_SUMMARY_VERSION_KEY
+
+from .base import FakeRedisTestCase
+
+
+class DashboardSnapshotTests(FakeRedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(DanmakuService, 'get_all_rooms_with_uploader_info', return_value=[])
+        self.build_rooms = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.snapshotter = DashboardSnapshotter()
+
+    def test_unchanged_versions_reuse_snapshot(self):
+        self.redis.set(ROOMS_VERSION_KEY, 3)
+        self.redis.set(ROOMS_SUMMARY_VERSION_KEY, 1)
+        first = self.snapshotter.refresh()
+        second = self.snapshotter.refresh()
+        self.assertIs(first, second)
+        self.assertEqual(self.build_rooms.call_count, 1)
+
+        self.redis.incr(ROOMS_VERSION_KEY)
+        self.snapshotter.refresh()
+        self.assertEqual(self.build_rooms.call_count, 2)
+
+    def test_zero_versions_always_rebuild(self):
+        # 写入端不维护版本号（如 collectors.LiveDataCollector）时版本号始终为0
+        self.snapshotter.refresh()
+        self.snapshotter.refresh()
+        self.assertEqual(self.build_rooms.call_count, 2)
+
+    def test_stale_snapshot_rebuilt_even_if_versions_match(self):
+        self.redis.set(ROOMS_VERSION_KEY, 3)
+        self.snapshotter.refresh()
+        self.snapshotter._built_at -= DASHBOARD_SNAPSHOT_MAX_STALE + 1
+        self.snapshotter.refresh()
+        self.assertEqual(self.build_rooms.call_count, 2)
@@ -0,0 +1,36 @@
+"""键空间采样：首次采样前为pending，截断的扫描在多次采样间接力覆盖整个键空间"""
+from live_data.danmaku_services import KeyspaceSampler, get_danmaku_service
+
+from .base import FakeRedisTestCase
+
+
+class KeyspaceSamplerTests(FakeRedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(50):
+            self.redis.set(f'room:{i}:info', 1)
+        for i in range(30):
+            self.redis.set(f'other:{i}', 1)
+        self.sampler = KeyspaceSampler(get_danmaku_service())
+
+    def test_pending_before_first_sample(self):
+        stats = self.sampler.get_stats()
+        self.assertIsNone(stats['room_keys'])
+        self.assertEqual(stats['status'], 'pending')
+
+    def test_full_pass_is_exact(self):
+        stats = self.sampler.sample()
+        self.assertEqual((stats['room_keys'], stats['status']), (50, 'exact'))
+
+    def test_truncated_passes_resume_from_cursor(self):
+        self.sampler.max_keys = self.sampler.scan_count = 10
+        statuses = []
+        for _ in range(20):
+            stats = self.sampler.sample()
+            statuses.append(stats['status'])
+            if stats['status'] == 'exact':
+                break
+        self.assertEqual(statuses[0], 'estimated')
+        self.assertEqual(statuses[-1], 'exact')
+        self.assertEqual(stats['room_keys'], 50)
@@ -0,0 +1,47 @@
+"""推送帧合并：默认不抽样，客户端声明上限后才抽样；取消订阅后只丢弃不再订阅的房间的缓冲事件"""
+from django.test import SimpleTestCase
+
+from live_data.push_frames import WS_MAX_EVENTS_PER_SECOND, FrameCoalescer, clamp_max_rate
+from utils.live_events import EVENT_DANMAKU
+
+
+class MaxRateTests(SimpleTestCase):
+
+    def test_zero_or_null_means_no_cap(self):
+        self.assertEqual(clamp_max_rate(None), 0)
+        self.assertEqual(clamp_max_rate(0), 0)
+        self.assertEqual(clamp_max_rate(10), 10)
+        self.assertEqual(clamp_max_rate(WS_MAX_EVENTS_PER_SECOND + 1), WS_MAX_EVENTS_PER_SECOND)
+        with self.assertRaises(ValueError):
+            clamp_max_rate(-1)
+
+    async def test_default_does_not_sample(self):
+        async def send_frame(rooms):
+            pass
+
+        frames = FrameCoalescer(send_frame, interval_ms=1000)
+        self.assertEqual(frames.max_rate, 0)
+        for seq in range(1, 201):
+            frames.add(1, EVENT_DANMAKU, {'seq': seq, 'message': 'hi'})
+        self.assertEqual([item[1] for item in frames._sampled], list(range(1, 201)))
+
+        frames.set_max_rate(clamp_max_rate(10))
+        frames.add(1, EVENT_DANMAKU, {'seq': 201, 'message': 'hi'})
+        self.assertEqual(frames.frame_budget, 10)
+        frames.close()
+
+
+class FrameCoalescerRetainTests(SimpleTestCase):
+
+    async def test_retain_keeps_rooms_still_subscribed(self):
+        async def send_frame(rooms):
+            pass
+
+        frames = FrameCoalescer(send_frame, interval_ms=1000)
+        for room_id in (1, 2, 3):
+            frames.add(room_id, EVENT_DANMAKU, {'seq': room_id, 'message': 'hi'})
+
+        frames.retain({1, 3, 'all'})
+        self.assertEqual(set(frames._windows), {1, 3})
+        self.assertEqual([item[0] for item in frames._sampled], [1, 3])
+        frames.close()
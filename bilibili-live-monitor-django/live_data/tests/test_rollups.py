@@ -0,0 +1,60 @@
+"""统计汇总：重复刷新同一时间段结果不变，增量刷新与从原始数据全量重建一致"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from live_data.models import DanmakuData, GiftData, LiveRoom, RoomStatsRollup
+from live_data.rollup_services import refresh_room_rollups
+
+ROOM_ID = 5001
+
+
+class RollupIdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.room = LiveRoom.objects.create(room_id=ROOM_ID, title='t', uname='u')
+        # 跨越午夜，同时覆盖分钟、小时和天的边界
+        self.base = timezone.make_aware(datetime(2026, 10, 18, 23, 58, 10))
+        self.timestamps = []
+        self.add_danmaku(range(10))
+        self.add_gifts(range(4))
+
+    def add_danmaku(self, indexes):
+        items = [DanmakuData(room=self.room, uid=i, message=f'm{i}', timestamp=self.base + timedelta(seconds=30 * i))
+                 for i in indexes]
+        DanmakuData.objects.bulk_create(items)
+        self.timestamps.extend(item.timestamp for item in items)
+
+    def add_gifts(self, indexes):
+        items = [GiftData(room=self.room, uid=i, gift_name='g', gift_id=1, num=2, price=Decimal('1.5'),
+                          total_price=Decimal('3'), timestamp=self.base + timedelta(seconds=45 * i))
+                 for i in indexes]
+        GiftData.objects.bulk_create(items)
+        self.timestamps.extend(item.timestamp for item in items)
+
+    def rollup_rows(self):
+        return list(RoomStatsRollup.objects.filter(room=self.room).order_by('granularity', 'bucket_start').values_list(
+            'granularity', 'bucket_start', 'danmaku_count', 'gift_count', 'gift_num', 'gift_value'))
+
+    def test_refreshing_same_buckets_twice_is_idempotent(self):
+        refresh_room_rollups(self.room, self.timestamps)
+        first = self.rollup_rows()
+        refresh_room_rollups(self.room, self.timestamps)
+        self.assertEqual(self.rollup_rows(), first)
+
+        day_totals = {row[1]: row[2] for row in first if row[0] == 'day'}
+        self.assertEqual(sum(day_totals.values()), 10)
+
+    def test_incremental_refresh_matches_full_rebuild(self):
+        refresh_room_rollups(self.room, self.timestamps)
+        self.add_danmaku(range(10, 14))
+        refresh_room_rollups(self.room, self.timestamps[-4:])
+        incremental = self.rollup_rows()
+
+        RoomStatsRollup.objects.all().delete()
+        call_command('rebuild_rollups', room_id=ROOM_ID, stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
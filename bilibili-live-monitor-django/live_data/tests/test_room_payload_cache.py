@@ -0,0 +1,35 @@
+"""房间接口响应缓存：按房间版本号缓存，版本号为0时每次重新读取"""
+from utils.room_summary import ROOM_VERSION_KEY
+
+from .base import FakeRedisTestCase
+
+ROOM_ID = 4001
+
+
+class RoomPayloadCacheTests(FakeRedisTestCase):
+
+    def fetch_seqs(self, url):
+        response = self.client.get(url, {'limit': 50})
+        return [item['seq'] for item in response.json()['data']['danmaku']]
+
+    def test_zero_version_is_not_cached(self):
+        # 写入端不维护版本号（如 collectors.LiveDataCollector）时新弹幕必须立即可见
+        for url in (f'/live/api/room/{ROOM_ID}/danmaku/', f'/live/api/async/room/{ROOM_ID}/danmaku/'):
+            with self.subTest(url=url):
+                self.redis.delete(f'room:{ROOM_ID}:danmaku')
+                self.push_events(ROOM_ID, 'danmaku', [1], message='hi')
+                self.assertEqual(self.fetch_seqs(url), [1])
+                self.push_events(ROOM_ID, 'danmaku', [2], message='hi')
+                self.assertEqual(self.fetch_seqs(url), [2, 1])
+
+    def test_unchanged_version_serves_cached_payload(self):
+        url = f'/live/api/room/{ROOM_ID}/danmaku/'
+        self.redis.set(ROOM_VERSION_KEY.format(room_id=ROOM_ID), 1)
+        self.push_events(ROOM_ID, 'danmaku', [1], message='hi')
+        self.assertEqual(self.fetch_seqs(url), [1])
+
+        self.push_events(ROOM_ID, 'danmaku', [2], message='hi')
+        self.assertEqual(self.fetch_seqs(url), [1])
+
+        self.redis.incr(ROOM_VERSION_KEY.format(room_id=ROOM_ID))
+        self.assertEqual(self.fetch_seqs(url), [2, 1])
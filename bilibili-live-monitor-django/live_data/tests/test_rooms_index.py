@@ -0,0 +1,39 @@
+"""房间列表索引：直播状态筛选和计数只依赖按状态划分的排序有序集合"""
+import json
+
+from live_data.danmaku_services import get_danmaku_service
+from utils.room_summary import ROOM_SUMMARY_KEY, index_room_summary, unindex_room
+
+from .base import FakeRedisTestCase
+
+
+class RoomsIndexTests(FakeRedisTestCase):
+
+    def index(self, room_id, live_status, online):
+        summary = {'room_id': room_id, 'live_status': live_status, 'online': online,
+                   'danmaku_count': 0, 'gift_count': 0, 'updated_at': None}
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(ROOM_SUMMARY_KEY.format(room_id=room_id), json.dumps(summary))
+        index_room_summary(pipe, summary)
+        pipe.execute()
+
+    def page_ids(self, status):
+        page = get_danmaku_service().get_rooms_page(status=status)
+        return [room['room_id'] for room in page['rooms']], page['total_count']
+
+    def test_status_filter_follows_live_status_changes(self):
+        self.index(1, 1, 300)
+        self.index(2, 0, 200)
+        self.index(3, 1, 100)
+        self.assertEqual(self.page_ids('live'), ([1, 3], 2))
+        self.assertEqual(self.page_ids('offline'), ([2], 1))
+
+        self.index(1, 0, 300)
+        self.assertEqual(self.page_ids('live'), ([3], 1))
+        self.assertEqual(self.page_ids('offline'), ([1, 2], 2))
+
+        pipe = self.redis.pipeline(transaction=False)
+        unindex_room(pipe, 2)
+        pipe.execute()
+        self.assertEqual(self.page_ids('all'), ([1, 3], 2))
+        self.assertEqual(self.redis.keys('rooms:status:*'), [])
@@ -0,0 +1,63 @@
+"""since_seq增量读取：按事件ID升序返回最早的limit条，逐页取完积压事件不丢失"""
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from live_data.async_danmaku_services import get_async_danmaku_service
+from live_data.danmaku_services import get_danmaku_service
+
+from .base import FakeRedisTestCase
+
+ROOM_ID = 1001
+
+
+class SincePagingTests(FakeRedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.push_events(ROOM_ID, 'danmaku', range(1, 11), message='hi')
+
+    def page_through(self, fetch, since, limit):
+        """模拟客户端轮询：每次以返回的最后一条seq作为下一次的since"""
+        pages = []
+        while True:
+            items = fetch(ROOM_ID, limit, since_seq=since)
+            if not items:
+                return pages
+            pages.append([item['seq'] for item in items])
+            since = items[-1]['seq']
+
+    def test_returns_oldest_events_after_since_in_ascending_order(self):
+        items = get_danmaku_service().get_recent_danmaku(ROOM_ID, 3, since_seq=2)
+        self.assertEqual([item['seq'] for item in items], [3, 4, 5])
+
+    def test_paging_covers_every_event(self):
+        pages = self.page_through(get_danmaku_service().get_recent_danmaku, 2, 3)
+        self.assertEqual(pages, [[3, 4, 5], [6, 7, 8], [9, 10]])
+
+    def test_paging_across_lrange_pages(self):
+        with mock.patch('live_data.danmaku_common.SINCE_PAGE_SIZE', 4):
+            pages = self.page_through(get_danmaku_service().get_recent_danmaku, 0, 3)
+        self.assertEqual(pages, [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]])
+
+    def test_without_since_returns_newest_first(self):
+        items = get_danmaku_service().get_recent_danmaku(ROOM_ID, 3)
+        self.assertEqual([item['seq'] for item in items], [10, 9, 8])
+
+    def test_async_service_matches_sync(self):
+        async def fetch(since, limit):
+            return await get_async_danmaku_service().get_recent_danmaku(ROOM_ID, limit, since_seq=since)
+
+        items = async_to_sync(fetch)(2, 3)
+        self.assertEqual([item['seq'] for item in items], [3, 4, 5])
+
+    def test_api_last_seq_is_last_returned_event(self):
+        response = self.client.get(f'/live/api/room/{ROOM_ID}/danmaku/', {'since': 2, 'limit': 3})
+        data = response.json()['data']
+        self.assertEqual([item['seq'] for item in data['danmaku']], [3, 4, 5])
+        self.assertEqual(data['last_seq'], 5)
+
+        response = self.client.get(f'/live/api/room/{ROOM_ID}/danmaku/', {'since': data['last_seq'], 'limit': 50})
+        data = response.json()['data']
+        self.assertEqual([item['seq'] for item in data['danmaku']], [6, 7, 8, 9, 10])
+        self.assertEqual(data['last_seq'], 10)
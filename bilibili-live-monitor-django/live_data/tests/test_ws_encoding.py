@@ -0,0 +1,33 @@
+"""WebSocket消息解码：文本帧按JSON解析，二进制帧只在协商了msgpack时接受"""
+import unittest
+
+from django.test import SimpleTestCase
+
+from live_data.ws_encoding import MessageDecodeError, MessageEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessageDecodeTests(SimpleTestCase):
+
+    def test_text_frame_is_json(self):
+        self.assertEqual(MessageEncoder('json').decode('{"type": "ping"}'), {'type': 'ping'})
+
+    def test_binary_frame_rejected_without_msgpack(self):
+        with self.assertRaises(MessageDecodeError):
+            MessageEncoder('json').decode(bytes_data=b'\x81\xa4type\xa4ping')
+
+    def test_non_object_message_rejected(self):
+        for text in ('not json', '[1, 2]'):
+            with self.subTest(text=text), self.assertRaises(MessageDecodeError):
+                MessageEncoder('json').decode(text)
+
+    @unittest.skipIf(msgpack is None, '未安装msgpack')
+    def test_binary_frame_decoded_when_msgpack_negotiated(self):
+        data = msgpack.packb({'type': 'set_rate', 'max_rate': 10})
+        self.assertEqual(MessageEncoder('msgpack').decode(bytes_data=data), {'type': 'set_rate', 'max_rate': 10})
+        with self.assertRaises(MessageDecodeError):
+            MessageEncoder('msgpack').decode(bytes_data=b'\xc1')
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, admin_views
+from . import views, admin_views, async_views
 
 app_name = 'live_data'
 
@@ -14,6 +14,7 @@ urlpatterns = [
     # 系统状态和统计
     path('api/redis/status/', views.api_redis_status, name='api_redis_status'),
     path('api/system/stats/', views.api_system_stats, name='api_system_stats'),
+    path('api/websocket/stats/', views.api_websocket_stats, name='api_websocket_stats'),
     
     # 房间相关API
     path('api/rooms/', views.api_rooms_list, name='api_rooms_list'),
@@ -21,9 +22,31 @@ urlpatterns = [
     path('api/room/<int:room_id>/danmaku/', views.api_room_danmaku, name='api_room_danmaku'),
     path('api/room/<int:room_id>/gifts/', views.api_room_gifts, name='api_room_gifts'),
     
+    # 异步版本（ASGI下直接在事件循环中处理，返回数据与同步接口一致）
+    # 客户端请使用上面的同步接口；压测结果和去留计划见 async_views.py 模块说明
+    path('api/async/system/stats/', async_views.api_system_stats, name='async_api_system_stats'),
+    path('api/async/rooms/', async_views.api_rooms_list, name='async_api_rooms_list'),
+    path('api/async/room/<int:room_id>/stats/', async_views.api_room_stats, name='async_api_room_stats'),
+    path('api/async/room/<int:room_id>/danmaku/', async_views.api_room_danmaku, name='async_api_room_danmaku'),
+    path('api/async/room/<int:room_id>/gifts/', async_views.api_room_gifts, name='async_api_room_gifts'),
+    
+    # 实时事件流（SSE）
+    path('api/room/<int:room_id>/events/', views.api_room_events, name='api_room_events'),
+    path('api/events/', views.api_all_events, name='api_all_events'),
+    
     # 弹幕浏览器API
     path('api/danmaku-browser/', views.api_danmaku_browser_data, name='api_danmaku_browser_data'),
     
+    # 弹幕搜索API（跨房间，可选历史数据）
+    path('api/search/danmaku/', views.api_danmaku_search, name='api_danmaku_search'),
+    
+    # 历史数据导出API（NDJSON/CSV流式输出）
+    path('api/export/danmaku/', views.api_export_danmaku, name='api_export_danmaku'),
+    path('api/export/gifts/', views.api_export_gifts, name='api_export_gifts'),
+    
+    # 历史统计时间序列API（分钟/小时/天汇总）
+    path('api/room/<int:room_id>/timeseries/', views.api_room_timeseries, name='api_room_timeseries'),
+    
     # 批量操作API
     path('api/batch/rooms/stats/', views.api_batch_room_stats, name='api_batch_room_stats'),
     
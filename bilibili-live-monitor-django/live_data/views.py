@@ -1,33 +1,102 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
-from django.views.decorators.http import require_http_methods
-from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods, etag
+from django.views.decorators.cache import never_cache, cache_control
 from django.utils import timezone
 from django.core.cache import cache
+from django.conf import settings
+import hashlib
 import json
 import logging
 import traceback
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from utils.room_summary import build_rooms_overview
+from utils.serialization import dumps
+from .responses import FastJsonResponse
 
 logger = logging.getLogger(__name__)
 
+# 房间级响应缓存：收集器每次写入都会递增房间版本号，版本不变时直接返回已渲染的JSON
+ROOM_PAYLOAD_CACHE_TIMEOUT = getattr(settings, 'ROOM_PAYLOAD_CACHE_TIMEOUT', 60)
+
+# 批量房间统计单次请求最多的房间数
+BATCH_ROOM_STATS_MAX_ROOMS = getattr(settings, 'BATCH_ROOM_STATS_MAX_ROOMS', 5000)
+
+# 弹幕浏览器多房间数据的共享缓存时长（秒）
+DANMAKU_BROWSER_CACHE_TIMEOUT = getattr(settings, 'DANMAKU_BROWSER_CACHE_TIMEOUT', 2)
+
+
+def _room_payload_cache_key(view_name, room_id, version, params):
+    """按(视图, 房间, 版本, 参数)生成缓存键"""
+    params_digest = hashlib.md5(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'room_payload:{view_name}:{room_id}:{version}:{params_digest}'
+
+
+def _cached_room_response(view_name, room_id, params, build_response):
+    """房间数据未变化时返回缓存的响应内容，否则调用build_response渲染并缓存"""
+    from .danmaku_services import get_danmaku_service
+    version = get_danmaku_service().get_room_version(room_id)
+    if not version:
+        # 写入端不维护版本号（如 collectors.LiveDataCollector）或Redis不可用：无法判断数据是否变化，不缓存
+        return build_response()
+    cache_key = _room_payload_cache_key(view_name, room_id, version, params)
+    
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return HttpResponse(payload, content_type='application/json')
+    
+    response = build_response()
+    if response.status_code == 200:
+        cache.set(cache_key, response.content, ROOM_PAYLOAD_CACHE_TIMEOUT)
+    return response
+
+
+# 轮询接口允许客户端保存响应，但每次使用前必须携带If-None-Match重新验证
+revalidate_each_time = cache_control(private=True, no_cache=True, max_age=0)
+
+
+def _versions_etag(prefix, *versions):
+    """由数据版本号生成ETag；版本号缺失（旧版收集器或Redis不可用）时不启用条件请求"""
+    if not versions or not all(versions):
+        return None
+    return '"{}-{}"'.format(prefix, '-'.join(str(version) for version in versions))
+
+
+def _rooms_list_etag(request):
+    """房间列表只读取摘要、排序索引和整体统计，跟随摘要版本号"""
+    from .danmaku_services import get_danmaku_service
+    versions = get_danmaku_service().get_data_versions()
+    return _versions_etag('rooms', versions['summary']) if versions else None
+
+
+def _room_stats_etag(request, room_id):
+    """房间统计直接读取房间数据，跟随房间版本号"""
+    from .danmaku_services import get_danmaku_service
+    versions = get_danmaku_service().get_data_versions(room_id)
+    return _versions_etag(f'room{room_id}', versions['room']) if versions else None
+
+
+def _danmaku_browser_etag(request):
+    """弹幕浏览器同时读取房间摘要和各房间最新弹幕，跟随两个全局版本号"""
+    from .danmaku_services import get_danmaku_service
+    versions = get_danmaku_service().get_data_versions()
+    return _versions_etag('browser', versions['data'], versions['summary']) if versions else None
+
 @ensure_csrf_cookie
 @never_cache
 def dashboard(request):
     """主仪表板页面"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
-        
-        # 获取系统统计
-        system_stats = service.get_system_stats()
-        
-        # 获取活跃房间
-        active_rooms = service.get_all_rooms_with_uploader_info()[:20]  # 限制显示20个
-        
+        from .dashboard_snapshot import get_dashboard_snapshot
+
+        # 系统统计和活跃房间由后台线程预计算，这里只读取快照
+        snapshot = get_dashboard_snapshot()
+
         context = {
-            'system_stats': system_stats,
-            'active_rooms': active_rooms,
+            'system_stats': snapshot['system_stats'],
+            'active_rooms': snapshot['active_rooms'],
             'now': timezone.now(),
             'page_title': 'Bilibili 直播数据监控'
         }
@@ -53,8 +122,8 @@ def dashboard(request):
 def room_detail(request, room_id):
     """房间详情页面"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 获取房间信息
         room_info = service.get_room_detailed_info(room_id)
@@ -98,8 +167,8 @@ def room_detail(request, room_id):
 def danmaku_browser(request):
     """弹幕浏览器页面"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 获取可用房间列表
         available_rooms = service.get_all_rooms_with_uploader_info()
@@ -146,8 +215,8 @@ def danmaku_browser(request):
 def dashboard_debug(request):
     """调试页面"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 获取系统统计
         system_stats = service.get_system_stats()
@@ -195,18 +264,18 @@ def dashboard_debug(request):
 def api_redis_status(request):
     """Redis连接状态检查API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
-        # 强制重新初始化Redis连接
-        service._init_redis_connection()
+        # 强制执行一次健康检查（断线时会重连）
+        service.check_health(force=True)
         
         # 检查连接状态
         connection_status = service.get_connection_status()
         logger.info(f"Redis状态检查API - 状态: {connection_status}")
         
         if connection_status.get('status') == 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': True,
                 'data': {
                     'status': 'connected',
@@ -216,7 +285,7 @@ def api_redis_status(request):
                 }
             })
         else:
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': connection_status.get('message', 'Redis连接失败'),
                 'data': {
@@ -228,7 +297,7 @@ def api_redis_status(request):
     except Exception as e:
         logger.error(f"Redis状态检查异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'状态检查异常: {str(e)}',
             'data': {
@@ -237,21 +306,55 @@ def api_redis_status(request):
             }
         }, status=500)
 
+def _system_stats_response(stats):
+    """系统统计API的响应"""
+    return FastJsonResponse({
+        'success': True,
+        'data': {
+            'stats': stats,
+            'timestamp': timezone.now().isoformat(),
+            'cache_status': 'fresh'
+        }
+    })
+
+
+def _system_stats_fallback(cached_stats, error):
+    """获取系统统计失败时，有缓存则返回缓存数据"""
+    if cached_stats:
+        return FastJsonResponse({
+            'success': True,
+            'data': {
+                'stats': cached_stats,
+                'timestamp': timezone.now().isoformat(),
+                'cache_status': 'cached',
+                'warning': '使用缓存数据'
+            }
+        })
+    
+    return FastJsonResponse({
+        'success': False,
+        'error': f'获取统计数据失败: {str(error)}',
+        'data': {
+            'redis_status': 'connected',
+            'redis_message': '连接正常但数据获取失败'
+        }
+    }, status=500)
+
 @never_cache
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_system_stats(request):
     """系统统计数据API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         logger.info(f"系统统计API - Redis状态: {connection_status}")
         
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}',
                 'data': {
@@ -267,68 +370,99 @@ def api_system_stats(request):
             
             # 缓存统计数据30秒
             cache.set('system_stats', stats, 30)
-            
-            return JsonResponse({
-                'success': True,
-                'data': {
-                    'stats': stats,
-                    'timestamp': timezone.now().isoformat(),
-                    'cache_status': 'fresh'
-                }
-            })
+            return _system_stats_response(stats)
             
         except Exception as e:
             logger.error(f"获取系统统计失败: {e}")
             logger.error(traceback.format_exc())
             
             # 尝试从缓存获取
-            cached_stats = cache.get('system_stats')
-            if cached_stats:
-                return JsonResponse({
-                    'success': True,
-                    'data': {
-                        'stats': cached_stats,
-                        'timestamp': timezone.now().isoformat(),
-                        'cache_status': 'cached',
-                        'warning': '使用缓存数据'
-                    }
-                })
-            
-            return JsonResponse({
-                'success': False,
-                'error': f'获取统计数据失败: {str(e)}',
-                'data': {
-                    'redis_status': 'connected',
-                    'redis_message': '连接正常但数据获取失败'
-                }
-            }, status=500)
+            return _system_stats_fallback(cache.get('system_stats'), e)
         
     except Exception as e:
         logger.error(f"系统统计API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'API异常: {str(e)}'
         }, status=500)
 
 @never_cache
+@require_http_methods(["GET"])
+def api_websocket_stats(request):
+    """WebSocket推送统计API（本工作进程的连接数、推送帧数、抽样/积压丢弃数和慢客户端断开数）"""
+    from .push_frames import push_metrics
+    return FastJsonResponse({
+        'success': True,
+        'data': {
+            **push_metrics.snapshot(),
+            'timestamp': timezone.now().isoformat()
+        }
+    })
+
+def _paginate_rooms_in_memory(all_rooms, status_filter, sort_by, offset, limit):
+    """在内存中对全部房间过滤、排序、分页（索引缺失时的备用方案）"""
+    # 过滤房间
+    filtered_rooms = all_rooms
+    if status_filter == 'live':
+        filtered_rooms = [r for r in all_rooms if r.get('live_status') == 1]
+    elif status_filter == 'offline':
+        filtered_rooms = [r for r in all_rooms if r.get('live_status') != 1]
+    
+    # 排序
+    if sort_by == 'popularity':
+        filtered_rooms.sort(key=lambda x: x.get('online', 0), reverse=True)
+    elif sort_by == 'danmaku':
+        filtered_rooms.sort(key=lambda x: x.get('danmaku_count', 0), reverse=True)
+    elif sort_by == 'gifts':
+        filtered_rooms.sort(key=lambda x: x.get('gift_count', 0), reverse=True)
+    elif sort_by == 'updated':
+        filtered_rooms.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
+    
+    # 计算系统统计
+    system_stats = build_rooms_overview(all_rooms)
+    system_stats['last_update'] = timezone.now().isoformat()
+    
+    return filtered_rooms[offset:offset + limit], len(filtered_rooms), system_stats
+
+def _rooms_list_response(rooms, total_count, system_stats, offset, limit, status_filter, sort_by, connection_status):
+    """房间列表API的响应"""
+    return FastJsonResponse({
+        'success': True,
+        'data': {
+            'rooms': rooms,
+            'stats': system_stats,
+            'pagination': {
+                'total_count': total_count,
+                'offset': offset,
+                'limit': limit,
+                'has_more': offset + limit < total_count
+            },
+            'filters': {
+                'status': status_filter,
+                'sort_by': sort_by
+            },
+            'redis_status': connection_status,
+            'timestamp': timezone.now().isoformat()
+        }
+    })
+
+@revalidate_each_time
 @csrf_exempt
 @require_http_methods(["GET"])
+@etag(_rooms_list_etag)
 def api_rooms_list(request):
     """获取房间列表API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
-        # 强制重新初始化Redis连接
-        service._init_redis_connection()
-        
-        # 检查Redis连接状态
-        connection_status = service.get_connection_status()
+        # 检查Redis连接状态（限频健康检查）
+        connection_status = service.check_health()
         logger.info(f"房间列表API - Redis连接状态: {connection_status}")
         
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}',
                 'redis_status': connection_status
@@ -340,68 +474,29 @@ def api_rooms_list(request):
         status_filter = request.GET.get('status', 'all')  # all, live, offline
         sort_by = request.GET.get('sort', 'popularity')  # popularity, danmaku, gifts, updated
         
-        # 获取所有房间及UP主信息
         try:
-            all_rooms = service.get_all_rooms_with_uploader_info()
-            logger.info(f"房间列表API - 获取到 {len(all_rooms)} 个房间")
-            
-            # 过滤房间
-            filtered_rooms = all_rooms
-            if status_filter == 'live':
-                filtered_rooms = [r for r in all_rooms if r.get('live_status') == 1]
-            elif status_filter == 'offline':
-                filtered_rooms = [r for r in all_rooms if r.get('live_status') != 1]
-            
-            # 排序
-            if sort_by == 'popularity':
-                filtered_rooms.sort(key=lambda x: x.get('online', 0), reverse=True)
-            elif sort_by == 'danmaku':
-                filtered_rooms.sort(key=lambda x: x.get('danmaku_count', 0), reverse=True)
-            elif sort_by == 'gifts':
-                filtered_rooms.sort(key=lambda x: x.get('gift_count', 0), reverse=True)
-            elif sort_by == 'updated':
-                filtered_rooms.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
+            # 优先使用收集器维护的排序/筛选索引，只读取当前页的房间
+            page = service.get_rooms_page(sort_by, status_filter, offset, limit)
             
-            # 分页
-            total_count = len(filtered_rooms)
-            paginated_rooms = filtered_rooms[offset:offset + limit]
+            if page is not None and page['overview'] is not None:
+                paginated_rooms = page['rooms']
+                total_count = page['total_count']
+                system_stats = dict(page['overview'], last_update=timezone.now().isoformat())
+            else:
+                # 索引尚未建立时回退到全量过滤排序
+                paginated_rooms, total_count, system_stats = _paginate_rooms_in_memory(
+                    service.get_all_rooms_with_uploader_info(), status_filter, sort_by, offset, limit
+                )
+            logger.info(f"房间列表API - 获取到 {len(paginated_rooms)} 个房间")
             
-            # 计算系统统计
-            system_stats = {
-                'total_rooms': len(all_rooms),
-                'active_rooms': len([r for r in all_rooms if r.get('live_status') == 1]),
-                'total_danmaku': sum(r.get('danmaku_count', 0) for r in all_rooms),
-                'total_gifts': sum(r.get('gift_count', 0) for r in all_rooms),
-                'total_online': sum(r.get('online', 0) for r in all_rooms),
-                'verified_users': len([r for r in all_rooms if r.get('is_verified')]),
-                'areas': len(set(r.get('area_name', '') for r in all_rooms if r.get('area_name'))),
-                'last_update': timezone.now().isoformat()
-            }
-            
-            return JsonResponse({
-                'success': True,
-                'data': {
-                    'rooms': paginated_rooms,
-                    'stats': system_stats,
-                    'pagination': {
-                        'total_count': total_count,
-                        'offset': offset,
-                        'limit': limit,
-                        'has_more': offset + limit < total_count
-                    },
-                    'filters': {
-                        'status': status_filter,
-                        'sort_by': sort_by
-                    },
-                    'redis_status': connection_status,
-                    'timestamp': timezone.now().isoformat()
-                }
-            })
+            return _rooms_list_response(
+                paginated_rooms, total_count, system_stats, offset, limit, status_filter, sort_by, connection_status
+            )
             
         except Exception as e:
             logger.error(f"获取房间列表失败: {e}")
             logger.error(traceback.format_exc())
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'获取房间列表失败: {str(e)}',
                 'redis_status': connection_status
@@ -410,109 +505,140 @@ def api_rooms_list(request):
     except Exception as e:
         logger.error(f"房间列表API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'API异常: {str(e)}'
         }, status=500)
 
-@never_cache
+def _room_stats_response(room_id, room_info, room_stats):
+    """房间统计API的响应：合并房间详细信息和实时统计"""
+    if not room_info:
+        return FastJsonResponse({
+            'success': False,
+            'error': f'房间 {room_id} 信息不存在'
+        }, status=404)
+    
+    return FastJsonResponse({
+        'success': True,
+        'data': {
+            'room_info': room_info,
+            'stats': room_stats,
+            'timestamp': timezone.now().isoformat()
+        }
+    })
+
+@revalidate_each_time
 @csrf_exempt
 @require_http_methods(["GET"])
+@etag(_room_stats_etag)
 def api_room_stats(request, room_id):
     """房间统计API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
         
-        # 获取房间详细信息
-        room_info = service.get_room_detailed_info(room_id)
-        if not room_info:
-            return JsonResponse({
-                'success': False,
-                'error': f'房间 {room_id} 信息不存在'
-            }, status=404)
-        
-        # 获取房间统计
-        room_stats = service.get_room_danmaku_stats(room_id)
-        
-        # 合并数据
-        combined_data = {
-            'room_info': room_info,
-            'stats': room_stats,
-            'timestamp': timezone.now().isoformat()
-        }
+        def build_response():
+            # 获取房间详细信息
+            room_info = service.get_room_detailed_info(room_id)
+            
+            # 获取房间统计
+            room_stats = service.get_room_danmaku_stats(room_id) if room_info else {}
+            return _room_stats_response(room_id, room_info, room_stats)
         
-        return JsonResponse({
-            'success': True,
-            'data': combined_data
-        })
+        return _cached_room_response('stats', room_id, {}, build_response)
         
     except Exception as e:
         logger.error(f"房间 {room_id} 统计API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'获取房间统计失败: {str(e)}'
         }, status=500)
 
+def _parse_since(request):
+    """解析since参数：事件ID（整数）或ISO时间，返回 (原始值, 事件ID)"""
+    since_timestamp = request.GET.get('since')
+    since_seq = int(since_timestamp) if since_timestamp and since_timestamp.isdigit() else None
+    return since_timestamp, since_seq
+
+
+def _last_seq(items, since_seq):
+    """本次返回的最后一个事件ID：增量模式下为升序结果的最后一条，否则为最新一条"""
+    seqs = [item['seq'] for item in items if item.get('seq') is not None]
+    if not seqs:
+        return since_seq
+    return seqs[-1] if since_seq is not None else seqs[0]
+
+
+def _room_events_response(key, items, room_id, limit, since_timestamp, since_seq):
+    """房间弹幕/礼物API的响应；since为ISO时间时按时间过滤
+
+    since为事件ID时，服务层按事件ID升序返回其后最早的limit条，last_seq即最后一条的seq，
+    客户端带着它继续请求即可分页取完积压的事件。
+    """
+    if since_timestamp and since_seq is None:
+        try:
+            since_time = timezone.datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
+            items = [
+                item for item in items
+                if item.get('timestamp') and timezone.datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00')) > since_time
+            ]
+        except ValueError:
+            pass  # 忽略无效的时间戳
+    
+    return FastJsonResponse({
+        'success': True,
+        'data': {
+            key: items,
+            'count': len(items),
+            'room_id': room_id,
+            'timestamp': timezone.now().isoformat(),
+            'has_more': len(items) >= limit,
+            # 下次轮询时作为since传回，只拉取增量
+            'last_seq': _last_seq(items, since_seq)
+        }
+    })
+
 @never_cache
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_room_danmaku(request, room_id):
     """房间弹幕API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
         
         # 获取请求参数
         limit = min(int(request.GET.get('limit', 50)), 200)  # 最多200条
-        since_timestamp = request.GET.get('since')  # 获取指定时间之后的弹幕
-        
-        # 获取弹幕数据
-        danmaku_list = service.get_recent_danmaku(room_id, limit)
-        
-        # 如果指定了时间戳，过滤数据
-        if since_timestamp:
-            try:
-                since_time = timezone.datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
-                danmaku_list = [
-                    d for d in danmaku_list 
-                    if d.get('timestamp') and timezone.datetime.fromisoformat(d['timestamp'].replace('Z', '+00:00')) > since_time
-                ]
-            except ValueError:
-                pass  # 忽略无效的时间戳
-        
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'danmaku': danmaku_list,
-                'count': len(danmaku_list),
-                'room_id': room_id,
-                'timestamp': timezone.now().isoformat(),
-                'has_more': len(danmaku_list) >= limit
-            }
-        })
+        since_timestamp, since_seq = _parse_since(request)  # 只返回之后的弹幕
+        
+        def build_response():
+            # 获取弹幕数据
+            danmaku_list = service.get_recent_danmaku(room_id, limit, since_seq=since_seq)
+            return _room_events_response('danmaku', danmaku_list, room_id, limit, since_timestamp, since_seq)
+        
+        return _cached_room_response('danmaku', room_id, {'limit': limit, 'since': since_timestamp}, build_response)
         
     except Exception as e:
         logger.error(f"房间 {room_id} 弹幕API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'获取弹幕数据失败: {str(e)}'
         }, status=500)
@@ -523,50 +649,32 @@ def api_room_danmaku(request, room_id):
 def api_room_gifts(request, room_id):
     """房间礼物API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
         
         # 获取请求参数
         limit = min(int(request.GET.get('limit', 30)), 100)  # 最多100条
-        since_timestamp = request.GET.get('since')  # 获取指定时间之后的礼物
-        
-        # 获取礼物数据
-        gifts_list = service.get_recent_gifts(room_id, limit)
-        
-        # 如果指定了时间戳，过滤数据
-        if since_timestamp:
-            try:
-                since_time = timezone.datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
-                gifts_list = [
-                    g for g in gifts_list 
-                    if g.get('timestamp') and timezone.datetime.fromisoformat(g['timestamp'].replace('Z', '+00:00')) > since_time
-                ]
-            except ValueError:
-                pass  # 忽略无效的时间戳
-        
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'gifts': gifts_list,
-                'count': len(gifts_list),
-                'room_id': room_id,
-                'timestamp': timezone.now().isoformat(),
-                'has_more': len(gifts_list) >= limit
-            }
-        })
+        since_timestamp, since_seq = _parse_since(request)  # 只返回之后的礼物
+        
+        def build_response():
+            # 获取礼物数据
+            gifts_list = service.get_recent_gifts(room_id, limit, since_seq=since_seq)
+            return _room_events_response('gifts', gifts_list, room_id, limit, since_timestamp, since_seq)
+        
+        return _cached_room_response('gifts', room_id, {'limit': limit, 'since': since_timestamp}, build_response)
         
     except Exception as e:
         logger.error(f"房间 {room_id} 礼物API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'获取礼物数据失败: {str(e)}'
         }, status=500)
@@ -575,62 +683,88 @@ def api_room_gifts(request, room_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_batch_room_stats(request):
-    """批量获取房间统计API"""
+    """批量获取房间统计API（流式输出，支持数千个房间）"""
     try:
         if request.content_type == 'application/json':
             data = json.loads(request.body)
         else:
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': '请使用JSON格式提交数据'
             }, status=400)
         
-        room_ids = data.get('room_ids', [])
-        if not room_ids or len(room_ids) > 50:  # 限制最多50个房间
-            return JsonResponse({
+        room_ids = _parse_room_ids(data.get('room_ids', []))
+        if not room_ids or len(room_ids) > BATCH_ROOM_STATS_MAX_ROOMS:
+            return FastJsonResponse({
                 'success': False,
-                'error': '房间ID列表无效或超过限制(最多50个)'
+                'error': f'房间ID列表无效或超过限制(最多{BATCH_ROOM_STATS_MAX_ROOMS}个)'
             }, status=400)
         
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
         
-        # 批量获取房间数据
-        rooms_data = {}
-        for room_id in room_ids:
-            try:
-                room_id = int(room_id)
-                room_info = service.get_room_detailed_info(room_id)
-                if room_info:
-                    rooms_data[str(room_id)] = room_info
-            except (ValueError, TypeError):
-                continue
-        
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'rooms': rooms_data,
-                'count': len(rooms_data),
-                'timestamp': timezone.now().isoformat()
-            }
-        })
+        response = StreamingHttpResponse(
+            _stream_batch_room_stats(service, room_ids),
+            content_type='application/json'
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         logger.error(f"批量房间统计API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'批量获取失败: {str(e)}'
         }, status=500)
 
+
+def _parse_room_ids(raw_ids):
+    """解析房间ID列表，去重并忽略无效值"""
+    if not isinstance(raw_ids, list):
+        return []
+    room_ids = []
+    seen = set()
+    for raw_id in raw_ids:
+        try:
+            room_id = int(raw_id)
+        except (ValueError, TypeError):
+            continue
+        if room_id not in seen:
+            seen.add(room_id)
+            room_ids.append(room_id)
+    return room_ids
+
+
+def _stream_batch_room_stats(service, room_ids):
+    """逐个房间输出JSON；success放在最后，中途出错时仍能输出合法的JSON并标记失败"""
+    yield '{"data": {"rooms": {'
+    count = 0
+    error = None
+    try:
+        for room_id, room_info in service.iter_rooms_detailed_info(room_ids):
+            prefix = ', ' if count else ''
+            yield f'{prefix}"{room_id}": {dumps(room_info)}'
+            count += 1
+    except Exception as e:
+        logger.error(f"批量房间统计输出中断: {e}")
+        error = f'批量获取失败: {str(e)}'
+    
+    tail = {'count': count, 'timestamp': timezone.now().isoformat()}
+    yield '}, ' + dumps(tail)[1:] + ', '
+    if error:
+        yield f'"success": false, "error": {dumps(error)}}}'
+    else:
+        yield '"success": true}'
+
 @never_cache
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -645,13 +779,13 @@ def api_maintenance_cleanup(request):
         cleanup_type = data.get('type', 'old_data')  # old_data, cache, all
         hours = int(data.get('hours', 24))  # 清理多少小时前的数据
         
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
@@ -667,7 +801,7 @@ def api_maintenance_cleanup(request):
             cache.clear()
             results['cache'] = 'Django缓存已清理'
         
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'data': {
                 'results': results,
@@ -680,24 +814,25 @@ def api_maintenance_cleanup(request):
     except Exception as e:
         logger.error(f"数据清理API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'数据清理失败: {str(e)}'
         }, status=500)
 
-@never_cache
+@revalidate_each_time
 @csrf_exempt
 @require_http_methods(["GET"])
+@etag(_danmaku_browser_etag)
 def api_danmaku_browser_data(request):
     """弹幕浏览器数据API"""
     try:
-        from .danmaku_services import DanmakuService
-        service = DanmakuService()
+        from .danmaku_services import get_danmaku_service
+        service = get_danmaku_service()
         
         # 检查Redis连接
-        connection_status = service.get_connection_status()
+        connection_status = service.check_health()
         if connection_status.get('status') != 'connected':
-            return JsonResponse({
+            return FastJsonResponse({
                 'success': False,
                 'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
             }, status=503)
@@ -705,27 +840,34 @@ def api_danmaku_browser_data(request):
         # 获取请求参数
         limit = min(int(request.GET.get('limit', 20)), 50)
         
+        # 所有客户端共享同一份短时缓存，轮询高峰时只组装一次；按版本号区分，避免旧内容配上新ETag
+        versions = service.get_data_versions() or {}
+        cache_key = f'danmaku_browser:{limit}:{versions.get("data", 0)}:{versions.get("summary", 0)}'
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return HttpResponse(payload, content_type='application/json')
+        
         # 获取活跃房间
         all_rooms = service.get_all_rooms_with_uploader_info()
         active_rooms = [r for r in all_rooms if r.get('danmaku_count', 0) > 0 or r.get('live_status') == 1]
         active_rooms.sort(key=lambda x: x.get('danmaku_count', 0), reverse=True)
         
-        # 获取每个房间的最新弹幕
+        # 一次pipeline取回所有房间的最新弹幕和礼物
+        selected_rooms = active_rooms[:limit]
+        feed = service.get_rooms_feed([room['room_id'] for room in selected_rooms], 5, 3)
+        
         rooms_with_danmaku = []
-        for room in active_rooms[:limit]:
-            recent_danmaku = service.get_recent_danmaku(room['room_id'], 5)
-            recent_gifts = service.get_recent_gifts(room['room_id'], 3)
-            
-            room_data = {
+        for room in selected_rooms:
+            room_feed = feed.get(room['room_id'], {'danmaku': [], 'gifts': []})
+            rooms_with_danmaku.append({
                 'room_info': room,
-                'recent_danmaku': recent_danmaku,
-                'recent_gifts': recent_gifts,
-                'danmaku_count': len(recent_danmaku),
-                'gifts_count': len(recent_gifts)
-            }
-            rooms_with_danmaku.append(room_data)
+                'recent_danmaku': room_feed['danmaku'],
+                'recent_gifts': room_feed['gifts'],
+                'danmaku_count': len(room_feed['danmaku']),
+                'gifts_count': len(room_feed['gifts'])
+            })
         
-        return JsonResponse({
+        response = FastJsonResponse({
             'success': True,
             'data': {
                 'rooms': rooms_with_danmaku,
@@ -733,11 +875,245 @@ def api_danmaku_browser_data(request):
                 'timestamp': timezone.now().isoformat()
             }
         })
+        cache.set(cache_key, response.content, DANMAKU_BROWSER_CACHE_TIMEOUT)
+        return response
         
     except Exception as e:
         logger.error(f"弹幕浏览器数据API异常: {e}")
         logger.error(traceback.format_exc())
-        return JsonResponse({
+        return FastJsonResponse({
             'success': False,
             'error': f'获取弹幕浏览器数据失败: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+@never_cache
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_danmaku_search(request):
+    """跨房间弹幕搜索API（可选包含数据库历史数据，游标分页）"""
+    try:
+        from .danmaku_services import get_danmaku_service
+        from .search_services import search_danmaku, parse_time_param, InvalidCursor
+        service = get_danmaku_service()
+        
+        # 检查Redis连接
+        connection_status = service.check_health()
+        if connection_status.get('status') != 'connected':
+            return FastJsonResponse({
+                'success': False,
+                'error': f'Redis连接失败: {connection_status.get("message", "未知错误")}'
+            }, status=503)
+        
+        # 获取请求参数
+        keyword = request.GET.get('q', '').strip() or None
+        username = request.GET.get('username', '').strip() or None
+        include_history = request.GET.get('history', 'false').lower() in ['true', '1', 'yes']
+        cursor = request.GET.get('cursor') or None
+        
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 50)), 200))  # 最多200条
+            uid = int(request.GET['uid']) if request.GET.get('uid') else None
+            room_ids = [int(r) for r in request.GET.get('rooms', '').split(',') if r.strip()] or None
+            start_ms = parse_time_param(request.GET.get('start'))
+            end_ms = parse_time_param(request.GET.get('end'))
+        except ValueError as e:
+            return FastJsonResponse({
+                'success': False,
+                'error': f'参数格式错误: {str(e)}'
+            }, status=400)
+        
+        try:
+            page = search_danmaku(
+                keyword=keyword, username=username, uid=uid, room_ids=room_ids,
+                start_ms=start_ms, end_ms=end_ms, include_history=include_history,
+                limit=limit, cursor=cursor,
+            )
+        except InvalidCursor as e:
+            return FastJsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        return FastJsonResponse({
+            'success': True,
+            'data': {
+                'results': page['results'],
+                'count': len(page['results']),
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more'],
+                'timestamp': timezone.now().isoformat()
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"弹幕搜索API异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'搜索弹幕失败: {str(e)}'
+        }, status=500)
+
+def _export_response(request, kind):
+    """历史数据流式导出：?format=ndjson|csv&rooms=1,2&start=...&end=..."""
+    from .export_services import export_queryset, export_stream, EXPORT_FORMATS
+    from .search_services import parse_time_param
+    
+    export_format = request.GET.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return FastJsonResponse({
+            'success': False,
+            'error': f'不支持的导出格式: {export_format}（可选 ndjson, csv）'
+        }, status=400)
+    
+    try:
+        room_ids = [int(r) for r in request.GET.get('rooms', '').split(',') if r.strip()] or None
+        start_ms = parse_time_param(request.GET.get('start'))
+        end_ms = parse_time_param(request.GET.get('end'))
+    except ValueError as e:
+        return FastJsonResponse({
+            'success': False,
+            'error': f'参数格式错误: {str(e)}'
+        }, status=400)
+    
+    queryset = export_queryset(kind, room_ids, start_ms, end_ms)
+    
+    content_type = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(export_stream(kind, export_format, queryset), content_type=content_type)
+    filename = f'{kind}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@never_cache
+@require_http_methods(["GET"])
+def api_export_danmaku(request):
+    """弹幕历史数据导出API"""
+    try:
+        return _export_response(request, 'danmaku')
+    except Exception as e:
+        logger.error(f"弹幕导出API异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'导出弹幕失败: {str(e)}'
+        }, status=500)
+
+@never_cache
+@require_http_methods(["GET"])
+def api_export_gifts(request):
+    """礼物历史数据导出API"""
+    try:
+        return _export_response(request, 'gifts')
+    except Exception as e:
+        logger.error(f"礼物导出API异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'导出礼物失败: {str(e)}'
+        }, status=500)
+
+# 时间序列接口未指定开始时间时的默认范围
+TIMESERIES_DEFAULT_RANGES = {
+    'minute': timedelta(days=1),
+    'hour': timedelta(days=7),
+    'day': timedelta(days=30),
+}
+
+@never_cache
+@require_http_methods(["GET"])
+def api_room_timeseries(request, room_id):
+    """房间历史统计时间序列API：?resolution=minute|hour|day&start=...&end=..."""
+    from .rollup_services import get_room_timeseries
+    from .search_services import parse_time_param
+
+    try:
+        resolution = request.GET.get('resolution', 'hour').lower()
+        if resolution not in TIMESERIES_DEFAULT_RANGES:
+            return FastJsonResponse({
+                'success': False,
+                'error': f'不支持的粒度: {resolution}（可选 minute, hour, day）'
+            }, status=400)
+
+        try:
+            start_ms = parse_time_param(request.GET.get('start'))
+            end_ms = parse_time_param(request.GET.get('end'))
+        except ValueError as e:
+            return FastJsonResponse({
+                'success': False,
+                'error': f'参数格式错误: {str(e)}'
+            }, status=400)
+
+        end = datetime.fromtimestamp(end_ms / 1000, tz=dt_timezone.utc) if end_ms else timezone.now()
+        if start_ms:
+            start = datetime.fromtimestamp(start_ms / 1000, tz=dt_timezone.utc)
+        else:
+            start = end - TIMESERIES_DEFAULT_RANGES[resolution]
+
+        try:
+            series = get_room_timeseries(room_id, resolution, start, end)
+        except ValueError as e:
+            return FastJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        if series is None:
+            return FastJsonResponse({
+                'success': False,
+                'error': f'房间 {room_id} 不存在'
+            }, status=404)
+
+        return FastJsonResponse({
+            'success': True,
+            'data': {
+                'room_id': room_id,
+                'resolution': resolution,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                **series
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"房间 {room_id} 时间序列API异常: {e}")
+        logger.error(traceback.format_exc())
+        return FastJsonResponse({
+            'success': False,
+            'error': f'获取统计时间序列失败: {str(e)}'
+        }, status=500)
+
+# SSE心跳间隔（秒），防止代理因空闲断开连接
+SSE_HEARTBEAT_INTERVAL = getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15)
+
+
+async def _sse_stream(room_id, last_event_id):
+    """把实时事件编码为text/event-stream"""
+    from .event_stream import get_live_event_hub
+    
+    yield 'retry: 3000\n\n'
+    async for event in get_live_event_hub().events(room_id, last_event_id, SSE_HEARTBEAT_INTERVAL):
+        if event is None:
+            yield ': ping\n\n'
+            continue
+        lines = f'id: {event["id"]}\n' if event['id'] else ''
+        lines += f'event: {event["type"]}\n'
+        lines += f'data: {dumps(event)}\n\n'
+        yield lines
+
+
+def _sse_response(request, room_id=None):
+    """SSE响应；Last-Event-ID（或?last_event_id=）用于断线续传"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or None
+    response = StreamingHttpResponse(_sse_stream(room_id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭Nginx缓冲，事件即时送达
+    return response
+
+# 协程视图上的 csrf_exempt/require_http_methods 需要 Django 5.0 及以上（见 requirements.txt）
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_room_events(request, room_id):
+    """单个房间的实时事件流（SSE，需在ASGI下运行）"""
+    return _sse_response(request, room_id)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_all_events(request):
+    """所有房间的实时事件流（SSE，需在ASGI下运行）"""
+    return _sse_response(request)
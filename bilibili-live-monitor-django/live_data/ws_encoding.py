@@ -0,0 +1,128 @@
+"""
+WebSocket消息编码 - JSON（默认）或 msgpack 二进制帧
+
+连接时用查询参数 format 选择：ws/room/<id>/?format=msgpack。msgpack 模式下消息作为二进制帧发送，
+字典键按 FIELD_DICTIONARY 替换为整数编号（不在字典中的键保持字符串，非字符串键转为字符串），
+连接后的第一条消息 {"type": "encoding", ...} 使用原始键名并附带字段字典，客户端据此还原键名。
+客户端发来的消息可以是JSON文本帧；协商了msgpack时也可以是msgpack二进制帧（使用原始键名），其余二进制帧被拒绝。
+msgpack 为可选依赖，未安装时回退为JSON并提示客户端。
+
+传输层压缩（permessage-deflate）由ASGI服务器与浏览器协商，不在应用内处理：
+uvicorn（websockets实现）默认启用，daphne 不支持，需要压缩时用 uvicorn 部署。
+"""
+import datetime
+import decimal
+import uuid
+from urllib.parse import parse_qs
+
+from utils.serialization import dumps, loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+WS_ENCODINGS = ('json', 'msgpack')
+
+# 字段字典：只能在末尾追加，删除或调整顺序时必须增加版本号
+FIELD_DICTIONARY_VERSION = 1
+FIELD_DICTIONARY = (
+    # 消息结构
+    'type', 'seq', 'data', 'counts', 'dropped', 'rooms', 'room_id', 'message',
+    'new_danmaku', 'new_gifts', 'room_update', 'room_stats', 'recent_danmaku', 'recent_gifts',
+    'danmaku', 'gifts', 'gift_value',
+    # 弹幕/礼物
+    'username', 'timestamp', 'user_level', 'send_time_formatted', 'uid',
+    'gift_name', 'num', 'price', 'coin_type', 'gift_time_formatted',
+    # 房间统计/状态
+    'uname', 'title', 'area_name', 'live_status', 'online', 'is_verified', 'is_active',
+    'danmaku_count', 'gift_count', 'last_update', 'last_danmaku_time', 'last_gift_time',
+)
+_FIELD_CODES = {name: code for code, name in enumerate(FIELD_DICTIONARY)}
+
+
+def query_encoding(scope):
+    """解析查询参数 format，未提供时为json，不支持的取值抛出ValueError"""
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8', errors='ignore'))
+    encoding = (query.get('format') or ['json'])[0].lower()
+    if encoding not in WS_ENCODINGS:
+        raise ValueError(f'不支持的格式: {encoding}（可选 {", ".join(WS_ENCODINGS)}）')
+    return encoding
+
+
+def compact_keys(obj):
+    """递归把字典键替换为字段编号"""
+    if isinstance(obj, dict):
+        return {
+            (_FIELD_CODES.get(key, key) if isinstance(key, str) else str(key)): compact_keys(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [compact_keys(item) for item in obj]
+    return obj
+
+
+def _msgpack_default(obj):
+    """与JSON输出一致：Decimal/UUID转字符串，日期时间转ISO格式"""
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not msgpack serializable')
+
+
+class MessageDecodeError(ValueError):
+    """客户端消息无法解析"""
+
+
+class MessageEncoder:
+    """单个连接的消息编码器：encode() 返回 str（文本帧）或 bytes（二进制帧）"""
+
+    def __init__(self, encoding='json'):
+        self.requested = encoding
+        self.encoding = encoding if encoding != 'msgpack' or msgpack is not None else 'json'
+
+    @property
+    def fallback(self):
+        """请求了msgpack但服务器未安装"""
+        return self.encoding != self.requested
+
+    def encode(self, data):
+        if self.encoding == 'msgpack':
+            return msgpack.packb(compact_keys(data), default=_msgpack_default, use_bin_type=True)
+        return dumps(data)
+
+    def decode(self, text_data=None, bytes_data=None):
+        """解析客户端消息为字典：文本帧按JSON解析，二进制帧只在协商了msgpack时接受"""
+        if bytes_data is not None:
+            if self.encoding != 'msgpack':
+                raise MessageDecodeError('当前连接使用JSON编码，不支持二进制消息')
+            try:
+                data = msgpack.unpackb(bytes_data, raw=False)
+            except Exception as e:
+                raise MessageDecodeError('消息格式错误') from e
+        else:
+            try:
+                data = loads(text_data)
+            except (TypeError, ValueError) as e:
+                raise MessageDecodeError('消息格式错误') from e
+        if not isinstance(data, dict):
+            raise MessageDecodeError('消息格式错误')
+        return data
+
+    def handshake(self):
+        """连接后的第一条消息（原始键名编码）：告知实际使用的格式和字段字典"""
+        if self.encoding == 'msgpack':
+            return msgpack.packb({
+                'type': 'encoding',
+                'format': 'msgpack',
+                'version': FIELD_DICTIONARY_VERSION,
+                'fields': list(FIELD_DICTIONARY),
+            }, use_bin_type=True)
+        if self.fallback:
+            return dumps({
+                'type': 'encoding',
+                'format': 'json',
+                'message': '服务器未安装msgpack，改用JSON'
+            })
+        return None
@@ -0,0 +1,195 @@
+"""
+弹幕倒排索引 - 读写两端共用
+
+收集器写入弹幕时为每条弹幕分配房间内递增的事件ID（seq），
+并把消息文本的2/3字符片段（n-gram，中日韩文字无需分词，带 m: 前缀）和用户名前缀（u: 前缀）
+写入 room:{id}:search:{token} 有序集合（member=seq，score=发送时间毫秒），
+同时写入用户UID索引和收录全部弹幕的时间索引。各类索引词前缀不同，消息片段不会与用户名前缀混在同一个集合里。
+弹幕本体以 seq -> JSON 存在 room:{id}:danmaku:byid 中。
+
+分配seq、写入列表、事件表、倒排索引和实时事件流由一段Lua脚本在服务端完成，
+脚本用 register_script 注册一次，之后以EVALSHA与其余写入命令放在同一个管道里，一条弹幕只需一次往返，
+也不必每次发送脚本全文；Redis重启或SCRIPT FLUSH后的NOSCRIPT由 append_event_result 加载脚本后重新执行。
+
+弹幕列表按 LTRIM 裁剪时，被挤出窗口的弹幕同步从索引中移除，
+索引键的过期时间与弹幕列表一致，保证索引只覆盖当前保存的窗口。
+本模块不依赖Django，可以直接被收集器进程导入。
+"""
+import time
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from redis.exceptions import NoScriptError
+
+from .live_events import LIVE_EVENTS_STREAM_KEY, LIVE_EVENTS_MAXLEN
+from .serialization import loads
+
+# Redis键
+DANMAKU_KEY = 'room:{room_id}:danmaku'
+DANMAKU_SEQ_KEY = 'room:{room_id}:seq'  # 弹幕和礼物共用的房间内递增事件ID
+DANMAKU_BYID_KEY = 'room:{room_id}:danmaku:byid'
+DANMAKU_TOKEN_KEY = 'room:{room_id}:search:{token}'
+
+# 保留窗口，与弹幕列表一致
+DANMAKU_MAX_ITEMS = 500
+DANMAKU_TTL = 3600
+
+# n-gram长度与用户名前缀长度上限
+MIN_GRAM = 2
+MAX_GRAM = 3
+MAX_USERNAME_PREFIX = 16
+MESSAGE_TOKEN_PREFIX = 'm:'
+USERNAME_TOKEN_PREFIX = 'u:'
+UID_TOKEN_PREFIX = 'id:'
+
+# 收录全部弹幕的时间索引，用于只有房间/时间条件的查询
+ALL_TOKEN = '*'
+
+
+def _normalize(text) -> str:
+    """统一小写并去掉首尾空白"""
+    return str(text or '').strip().lower()
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    """切出指定长度的所有字符片段"""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def message_tokens(message) -> Set[str]:
+    """消息文本的2/3字符片段"""
+    text = _normalize(message)
+    tokens = set()
+    for size in range(MIN_GRAM, MAX_GRAM + 1):
+        tokens |= _grams(text, size)
+    return {MESSAGE_TOKEN_PREFIX + token for token in tokens}
+
+
+def username_tokens(username) -> Set[str]:
+    """用户名的所有前缀"""
+    name = _normalize(username)[:MAX_USERNAME_PREFIX]
+    return {USERNAME_TOKEN_PREFIX + name[:i] for i in range(1, len(name) + 1)}
+
+
+def uid_token(uid) -> Optional[str]:
+    """用户UID的索引词"""
+    uid = str(uid or '').strip()
+    return UID_TOKEN_PREFIX + uid if uid and uid != '0' else None
+
+
+def event_tokens(event: Dict[str, Any]) -> Set[str]:
+    """一条弹幕需要写入的全部索引词"""
+    message = event.get('message', event.get('content', ''))
+    username = event.get('username', event.get('user', ''))
+    tokens = message_tokens(message) | username_tokens(username) | {ALL_TOKEN}
+    user_id_token = uid_token(event.get('uid'))
+    if user_id_token:
+        tokens.add(user_id_token)
+    return tokens
+
+
+def keyword_query_tokens(keyword) -> List[str]:
+    """关键词查询使用的索引词；关键词短于最小片段时返回空列表（无法走索引）"""
+    text = _normalize(keyword)
+    if len(text) < MIN_GRAM:
+        return []
+    size = min(len(text), MAX_GRAM)
+    return sorted(MESSAGE_TOKEN_PREFIX + token for token in _grams(text, size))
+
+
+def username_query_token(username) -> Optional[str]:
+    """用户名前缀查询使用的索引词"""
+    name = _normalize(username)[:MAX_USERNAME_PREFIX]
+    return USERNAME_TOKEN_PREFIX + name if name else None
+
+
+def event_score(event: Dict[str, Any]) -> int:
+    """索引分值：弹幕发送时间（毫秒），缺失时使用当前时间"""
+    try:
+        return int(event['send_time_ms'])
+    except (KeyError, TypeError, ValueError):
+        return int(time.time() * 1000)
+
+
+# 分配事件ID并写入列表、实时事件流（以及事件表和倒排索引）
+# KEYS: seq键, 列表键, 事件流键[, 事件表键, 索引键...]
+# ARGV: 不含seq的JSON对象, 列表保留条数, 过期时间, 事件流保留条数, 房间ID, 事件类型, 索引分值
+# seq追加到JSON末尾，返回 {seq, 被挤出列表窗口的记录}
+APPEND_EVENT_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+local body = string.sub(ARGV[1], 1, -2)
+if body ~= '{' then
+    body = body .. ','
+end
+local payload = body .. '"seq":' .. seq .. '}'
+local max_items = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+redis.call('LPUSH', KEYS[2], payload)
+local evicted = redis.call('LRANGE', KEYS[2], max_items, -1)
+redis.call('LTRIM', KEYS[2], 0, max_items - 1)
+redis.call('EXPIRE', KEYS[2], ttl)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[4], '*', 'room_id', ARGV[5], 'type', ARGV[6], 'data', payload)
+
+if #KEYS >= 4 then
+    redis.call('HSET', KEYS[4], seq, payload)
+    redis.call('EXPIRE', KEYS[4], ttl)
+    for i = 5, #KEYS do
+        redis.call('ZADD', KEYS[i], ARGV[7], seq)
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+return {seq, evicted}
+"""
+
+
+def register_append_script(redis_client):
+    """注册写入脚本，返回的Script对象只在本地计算SHA1，每个Redis客户端注册一次"""
+    return redis_client.register_script(APPEND_EVENT_SCRIPT)
+
+
+def append_event(pipe, script, room_id: int, event_type: str, event: Dict[str, Any], serialized: str,
+                 list_key: str, max_items: int, ttl: int = DANMAKU_TTL, indexed: bool = False) -> tuple:
+    """分配事件ID并写入列表和实时事件流，indexed时同时写入事件表和倒排索引（只向管道追加一条EVALSHA）
+
+    serialized 为不含seq的JSON对象；返回 (keys, args)，与管道结果一起交给 append_event_result。
+    """
+    keys = [DANMAKU_SEQ_KEY.format(room_id=room_id), list_key, LIVE_EVENTS_STREAM_KEY]
+    if indexed:
+        keys.append(DANMAKU_BYID_KEY.format(room_id=room_id))
+        keys.extend(DANMAKU_TOKEN_KEY.format(room_id=room_id, token=token) for token in event_tokens(event))
+    args = [serialized, max_items, ttl, LIVE_EVENTS_MAXLEN, room_id, event_type, event_score(event)]
+    # 不用 script(client=pipe)：那样每次execute前都要多一次SCRIPT EXISTS往返
+    pipe.evalsha(script.sha, len(keys), *keys, *args)
+    return keys, args
+
+
+def append_event_result(script, client, results: List, call: tuple):
+    """从 execute(raise_on_error=False) 的结果中取出 [seq, 被挤出列表窗口的记录]（append_event须是管道第一条命令）
+
+    脚本缓存被清空时EVALSHA返回NOSCRIPT、脚本没有执行，此时由Script对象加载脚本后单独重新执行；其余错误照常抛出。
+    """
+    for index, result in enumerate(results):
+        if isinstance(result, Exception) and not (index == 0 and isinstance(result, NoScriptError)):
+            raise result
+    if isinstance(results[0], NoScriptError):
+        keys, args = call
+        return script(keys=keys, args=args, client=client)
+    return results[0]
+
+
+def remove_from_index(pipe, room_id: int, evicted: Iterable) -> int:
+    """把被挤出窗口的弹幕从事件表和倒排索引中移除，返回移除条数"""
+    byid_key = DANMAKU_BYID_KEY.format(room_id=room_id)
+    removed = 0
+    for raw in evicted:
+        try:
+            event = loads(raw)
+            seq = event['seq']
+        except (ValueError, KeyError, TypeError):
+            continue  # 建索引之前写入的旧弹幕没有seq
+
+        pipe.hdel(byid_key, seq)
+        for token in event_tokens(event):
+            pipe.zrem(DANMAKU_TOKEN_KEY.format(room_id=room_id, token=token), seq)
+        removed += 1
+    return removed
@@ -0,0 +1,55 @@
+"""
+实时事件流 - 读写两端共用
+
+收集器每写入一条弹幕/礼物/房间信息，就向全局的Redis Stream live_events 追加一条事件
+（room_id、type、data为原始JSON），Stream按条数近似裁剪。
+Stream的条目ID全局单调递增，读取端据此实现推送和断线续传：
+每个工作进程只用一个连接 XREAD BLOCK 跟随新事件，重连的客户端用最后收到的ID XRANGE 补齐。
+本模块不依赖Django，可以直接被收集器进程导入。
+"""
+from typing import Dict, Any, Optional, Tuple
+
+from .serialization import loads
+
+# Redis键
+LIVE_EVENTS_STREAM_KEY = 'live_events'
+
+# Stream保留的事件条数（近似裁剪），也是断线续传能补齐的上限
+LIVE_EVENTS_MAXLEN = 10000
+
+# 事件类型
+EVENT_DANMAKU = 'danmaku'
+EVENT_GIFT = 'gift'
+EVENT_ROOM = 'room'
+
+
+def publish_event(pipe, room_id: int, event_type: str, serialized: str):
+    """追加一条实时事件（只向管道追加命令），serialized为已序列化的JSON"""
+    pipe.xadd(
+        LIVE_EVENTS_STREAM_KEY,
+        {'room_id': room_id, 'type': event_type, 'data': serialized},
+        maxlen=LIVE_EVENTS_MAXLEN,
+        approximate=True,
+    )
+
+
+def decode_event(event_id: str, fields: Dict) -> Optional[Dict[str, Any]]:
+    """解析Stream条目，格式不正确时返回None"""
+    try:
+        return {
+            'id': event_id,
+            'room_id': int(fields['room_id']),
+            'type': fields['type'],
+            'data': loads(fields['data']),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def event_id_key(event_id: str) -> Tuple[int, int]:
+    """Stream条目ID（毫秒-序号）转换为可比较的元组，无法解析时为(0, 0)"""
+    try:
+        millis, _, sequence = str(event_id).partition('-')
+        return int(millis), int(sequence or 0)
+    except ValueError:
+        return 0, 0
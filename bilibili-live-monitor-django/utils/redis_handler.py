@@ -6,6 +6,8 @@ import json
 import logging
 from django.conf import settings
 
+from .serialization import loads
+
 logger = logging.getLogger(__name__)
 
 # Redis配置
@@ -71,7 +73,7 @@ def safe_json_loads(data):
         if json_str is None:
             return None
             
-        return json.loads(json_str)
+        return loads(json_str)
     except (json.JSONDecodeError, TypeError) as e:
         logger.warning(f"JSON解析失败: {e}")
         return None
@@ -0,0 +1,232 @@
+"""
+房间摘要渲染 - 读写两端共用
+
+收集器（web_version/simple_redis_saver.py）在写入时预渲染房间摘要，
+DanmakuService 在摘要缺失时用同一套逻辑现场构建，保证两边格式一致。
+本模块不依赖Django，可以直接被收集器进程导入。
+"""
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .serialization import loads
+
+# Redis键
+ROOM_SUMMARY_KEY = 'room:{room_id}:summary'
+ALL_ROOMS_SUMMARY_KEY = 'rooms:summary:all'
+
+# 房间数据版本号，收集器每次写入该房间的数据都会递增
+ROOM_VERSION_KEY = 'room:{room_id}:version'
+# 全局版本号：任一房间有写入时递增；房间摘要/排序索引/整体统计刷新后递增
+ROOMS_VERSION_KEY = 'rooms:version'
+ROOMS_SUMMARY_VERSION_KEY = 'rooms:summary:version'
+
+# 房间列表排序/筛选索引：每种排序键×直播状态各一个有序集合，member为房间ID
+ROOM_SORT_KEY = 'rooms:sort:{sort_by}:{status}'
+ROOMS_OVERVIEW_KEY = 'rooms:summary:stats'
+ROOM_SORT_FIELDS = ('popularity', 'danmaku', 'gifts', 'updated')
+ROOM_STATUS_FILTERS = ('all', 'live', 'offline')
+
+# 摘要过期时间（秒），与房间信息保持一致
+ROOM_SUMMARY_TTL = 86400
+
+NUMERIC_FIELDS = ['room_id', 'uid', 'live_status', 'online', 'attention', 'gender']
+BOOLEAN_FIELDS = ['is_verified']
+
+LIVE_STATUS_TEXT = {0: '未开播', 1: '直播中', 2: '轮播中'}
+GENDER_TEXT = {0: '未知', 1: '男', 2: '女', 3: '保密'}
+
+
+def _to_text(value) -> str:
+    """bytes/str统一转换为str"""
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+def normalize_room_info(room_info: Dict) -> Dict[str, Any]:
+    """解码房间信息Hash并转换数字、布尔字段"""
+    decoded_info = {_to_text(k): _to_text(v) for k, v in room_info.items()}
+
+    for field in NUMERIC_FIELDS:
+        if field in decoded_info and decoded_info[field].isdigit():
+            decoded_info[field] = int(decoded_info[field])
+
+    for field in BOOLEAN_FIELDS:
+        if field in decoded_info:
+            decoded_info[field] = decoded_info[field].lower() in ['true', '1', 'yes']
+
+    return decoded_info
+
+
+def head_timestamp(raw_item) -> Optional[str]:
+    """从列表头部的JSON记录中取出timestamp"""
+    if not raw_item:
+        return None
+    try:
+        return loads(_to_text(raw_item)).get('timestamp')
+    except (ValueError, AttributeError):
+        return None
+
+
+def build_room_stats(danmaku_count: int, gift_count: int, stats_hash: Dict,
+                     danmaku_head=None, gift_head=None) -> Dict[str, Any]:
+    """由列表长度、room:{id}:stats和列表头部记录组装实时统计"""
+    stats = {'danmaku_count': danmaku_count or 0, 'gift_count': gift_count or 0}
+    stats.update({_to_text(k): _to_text(v) for k, v in (stats_hash or {}).items()})
+
+    last_danmaku_time = head_timestamp(danmaku_head)
+    if last_danmaku_time:
+        stats['last_danmaku_time'] = last_danmaku_time
+
+    last_gift_time = head_timestamp(gift_head)
+    if last_gift_time:
+        stats['last_gift_time'] = last_gift_time
+
+    return stats
+
+
+def popularity_level(online: int) -> str:
+    """人气等级"""
+    if online >= 10000:
+        return 'high'
+    elif online >= 1000:
+        return 'medium'
+    elif online >= 100:
+        return 'low'
+    return 'very_low'
+
+
+def add_derived_fields(info: Dict[str, Any]) -> Dict[str, Any]:
+    """添加直播状态、人气等级、性别文本等计算字段"""
+    live_status = info.get('live_status', 0)
+    info['is_live'] = live_status == 1
+    info['is_offline'] = live_status == 0
+    info['is_round'] = live_status == 2
+
+    online = info.get('online', 0)
+    info['popularity_level'] = popularity_level(online if isinstance(online, int) else 0)
+    info['gender_text'] = GENDER_TEXT.get(info.get('gender', 0), '未知')
+    return info
+
+
+def calculate_live_time(live_time_data) -> str:
+    """计算直播时长"""
+    try:
+        if not live_time_data:
+            return '--:--'
+
+        # 如果已经是格式化的时间字符串，直接返回
+        if isinstance(live_time_data, str) and ':' in live_time_data:
+            return live_time_data
+
+        # 如果是时间戳，计算时长
+        if isinstance(live_time_data, (int, float)):
+            hours = int(live_time_data // 3600)
+            minutes = int((live_time_data % 3600) // 60)
+            return f"{hours:02d}:{minutes:02d}"
+
+        return '--:--'
+    except Exception:
+        return '--:--'
+
+
+def build_room_detail(room_info: Dict, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """合并房间信息与实时统计，得到房间详细信息"""
+    detail = normalize_room_info(room_info)
+    detail.update(stats)
+    return add_derived_fields(detail)
+
+
+def build_room_summary(room_id: int, detail: Dict[str, Any], default_updated_at: Optional[str] = None) -> Dict[str, Any]:
+    """由房间详细信息渲染房间列表/仪表板使用的摘要文档"""
+    live_status = detail.get('live_status', 0)
+    return {
+        'room_id': room_id,
+        'uname': detail.get('uname', f'主播{room_id}'),
+        'title': detail.get('title', ''),
+        'face': detail.get('face', ''),  # UP主头像
+        'uid': detail.get('uid', 0),
+        'gender': detail.get('gender', 0),
+        'gender_text': detail.get('gender_text', '未知'),
+        'is_verified': detail.get('is_verified', False),
+        'verify_desc': detail.get('verify_desc', ''),
+        'area_name': detail.get('area_name', ''),
+        'parent_area_name': detail.get('parent_area_name', ''),
+        'live_status': live_status,
+        'live_status_text': LIVE_STATUS_TEXT.get(live_status, '未知'),
+        'online': detail.get('online', 0),
+        'attention': detail.get('attention', 0),
+        'cover': detail.get('cover', ''),
+        'keyframe': detail.get('keyframe', ''),
+        'danmaku_count': detail.get('danmaku_count', 0),
+        'gift_count': detail.get('gift_count', 0),
+        'last_danmaku_time': detail.get('last_danmaku_time'),
+        'last_gift_time': detail.get('last_gift_time'),
+        'updated_at': detail.get('updated_at', default_updated_at or datetime.now().isoformat()),
+        'popularity_level': detail.get('popularity_level', 'very_low'),
+        'is_live': detail.get('is_live', False),
+        'is_offline': detail.get('is_offline', True),
+        'is_round': detail.get('is_round', False),
+        'live_time': calculate_live_time(detail.get('live_time')),
+    }
+
+
+def _timestamp_score(value) -> float:
+    """ISO时间转换为排序分值，无法解析时为0"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def room_sort_scores(summary: Dict[str, Any]) -> Dict[str, float]:
+    """房间在各排序索引中的分值"""
+    online = summary.get('online', 0)
+    return {
+        'popularity': online if isinstance(online, int) else 0,
+        'danmaku': summary.get('danmaku_count', 0) or 0,
+        'gifts': summary.get('gift_count', 0) or 0,
+        'updated': _timestamp_score(summary.get('updated_at')),
+    }
+
+
+def room_status(summary: Dict[str, Any]) -> str:
+    """房间所属的直播状态筛选分组"""
+    return 'live' if summary.get('live_status') == 1 else 'offline'
+
+
+def index_room_summary(pipe, summary: Dict[str, Any]):
+    """把房间写入排序/筛选索引（只向管道追加命令）"""
+    room_id = summary['room_id']
+    status = room_status(summary)
+    other_status = 'offline' if status == 'live' else 'live'
+
+    for sort_by, score in room_sort_scores(summary).items():
+        pipe.zadd(ROOM_SORT_KEY.format(sort_by=sort_by, status='all'), {room_id: score})
+        pipe.zadd(ROOM_SORT_KEY.format(sort_by=sort_by, status=status), {room_id: score})
+        pipe.zrem(ROOM_SORT_KEY.format(sort_by=sort_by, status=other_status), room_id)
+
+
+def unindex_room(pipe, room_id: int):
+    """把房间从排序/筛选索引中移除（只向管道追加命令）"""
+    for sort_by in ROOM_SORT_FIELDS:
+        for status in ROOM_STATUS_FILTERS:
+            pipe.zrem(ROOM_SORT_KEY.format(sort_by=sort_by, status=status), room_id)
+
+
+def build_rooms_overview(rooms) -> Dict[str, Any]:
+    """汇总房间列表页使用的整体统计"""
+    return {
+        'total_rooms': len(rooms),
+        'active_rooms': len([r for r in rooms if r.get('live_status') == 1]),
+        'total_danmaku': sum(r.get('danmaku_count', 0) for r in rooms),
+        'total_gifts': sum(r.get('gift_count', 0) for r in rooms),
+        'total_online': sum(r.get('online', 0) for r in rooms),
+        'verified_users': len([r for r in rooms if r.get('is_verified')]),
+        'areas': len(set(r.get('area_name', '') for r in rooms if r.get('area_name'))),
+    }
+
+
+def summary_sort_key(summary: Dict[str, Any]) -> int:
+    """房间列表默认排序：在线人数优先，其次弹幕活跃度"""
+    online = summary.get('online', 0)
+    danmaku_count = summary.get('danmaku_count', 0)
+    return (online if isinstance(online, int) else 0) * 1000 + danmaku_count
@@ -0,0 +1,56 @@
+"""
+JSON序列化 - 收集器、服务层、API视图和WebSocket消费者共用
+
+安装了 orjson 时使用 orjson（编码/解码快数倍，直接输出UTF-8字节），否则回退到标准库json。
+两种实现输出一致：不转义非ASCII字符，Decimal按字符串输出，日期时间按ISO格式输出。
+本模块不依赖Django，可以直接被收集器进程导入。
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj):
+    """标准类型以外的对象：Decimal/UUID转字符串，日期时间转ISO格式"""
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj) -> bytes:
+        """序列化为UTF-8编码的JSON字节串"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def dumps(obj) -> str:
+        """序列化为JSON字符串"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(data):
+        """解析JSON（str或bytes），格式错误时抛出 json.JSONDecodeError 的子类"""
+        return orjson.loads(data)
+
+else:
+    def dumps(obj) -> str:
+        """序列化为JSON字符串"""
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps_bytes(obj) -> bytes:
+        """序列化为UTF-8编码的JSON字节串"""
+        return dumps(obj).encode('utf-8')
+
+    def loads(data):
+        """解析JSON（str或bytes），格式错误时抛出 json.JSONDecodeError"""
+        return json.loads(data)
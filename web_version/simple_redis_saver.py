@@ -1,8 +1,32 @@
 import redis
-import json
 import logging
+import os
+import sys
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable
+
+# 房间摘要渲染逻辑与Django端共用
+project_path = os.path.join(os.path.dirname(__file__), '..', 'bilibili-live-monitor-django')
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+from utils.room_summary import (
+    ROOM_SUMMARY_KEY, ALL_ROOMS_SUMMARY_KEY, ROOM_SUMMARY_TTL, ROOM_VERSION_KEY, ROOMS_OVERVIEW_KEY,
+    ROOMS_VERSION_KEY, ROOMS_SUMMARY_VERSION_KEY,
+    build_room_detail, build_room_stats, build_room_summary, summary_sort_key,
+    build_rooms_overview, index_room_summary, unindex_room,
+)
+from utils.danmaku_index import (
+    DANMAKU_KEY, DANMAKU_MAX_ITEMS, DANMAKU_TTL,
+    append_event, append_event_result, register_append_script, remove_from_index,
+)
+from utils.live_events import EVENT_DANMAKU, EVENT_GIFT, EVENT_ROOM, publish_event
+from utils.serialization import dumps, loads
+
+# 摘要刷新周期（秒），全量快照最多每秒重建一次
+SUMMARY_FLUSH_INTERVAL = 1.0
 
 class SimpleRedisSaver:
     """简化的Redis数据保存器 - 增强版"""
@@ -28,6 +52,23 @@ class SimpleRedisSaver:
         except Exception as e:
             self.logger.error(f"❌ Redis连接失败: {e}")
             self.redis_client = None
+        
+        # 弹幕/礼物写入脚本，首次写入时按当前Redis客户端注册（EVALSHA）
+        self._append_script = None
+        
+        # 待刷新摘要的房间（写入时标记，由后台线程批量刷新）
+        self._dirty_rooms = set()
+        self._dirty_lock = threading.Lock()
+        self._snapshot_dirty = False
+        self._last_snapshot_time = 0.0
+        self._summary_thread = None
+        self._summary_stop = threading.Event()
+    
+    def get_append_script(self):
+        """按当前Redis客户端注册的写入脚本，客户端被替换后重新注册"""
+        if self._append_script is None or self._append_script.registered_client is not self.redis_client:
+            self._append_script = register_append_script(self.redis_client)
+        return self._append_script
     
     def is_connected(self) -> bool:
         """检查Redis连接状态"""
@@ -70,6 +111,9 @@ class SimpleRedisSaver:
             if room_info.get('area_name'):
                 self.redis_client.sadd(f'rooms:area:{room_info["area_name"]}', str(room_id))
             
+            self._bump_room_version(room_id)
+            self._publish_live_event(room_id, EVENT_ROOM, dumps(room_info_copy))
+            self._mark_summary_dirty(room_id)
             self.logger.debug(f"✅ 房间信息已保存: {room_id}")
             return True
             
@@ -131,26 +175,38 @@ class SimpleRedisSaver:
             return False
         
         try:
-            key = f'room:{room_id}:danmaku'
+            key = DANMAKU_KEY.format(room_id=room_id)
             
             # 添加额外字段
             danmaku_data_copy = danmaku_data.copy()
             danmaku_data_copy['saved_at'] = datetime.now().isoformat()
             danmaku_data_copy['id'] = f"{room_id}_{danmaku_data_copy.get('send_time_ms', int(datetime.now().timestamp() * 1000))}"
             
-            # 序列化并保存到列表
-            serialized_data = json.dumps(danmaku_data_copy, ensure_ascii=False)
-            self.redis_client.lpush(key, serialized_data)
+            # 序列化（不含seq），房间内递增的事件ID由写入脚本分配并追加到JSON末尾，
+            # 它作为倒排索引的成员，也供轮询端按since拉取增量
+            danmaku_data_copy.pop('seq', None)
+            serialized_data = dumps(danmaku_data_copy)
             
-            # 限制列表长度（保留最近500条）
-            self.redis_client.ltrim(key, 0, 499)
+            pipe = self.redis_client.pipeline(transaction=False)
             
-            # 设置过期时间（1小时）
-            self.redis_client.expire(key, 3600)
+            # 一条脚本完成：分配seq、写入列表并保留最近500条（取回被裁掉的弹幕以便同步清理索引）、
+            # 设置过期时间（1小时）、写入事件表和倒排索引、推送实时事件
+            script = self.get_append_script()
+            call = append_event(pipe, script, room_id, EVENT_DANMAKU, danmaku_data_copy, serialized_data,
+                                key, DANMAKU_MAX_ITEMS, DANMAKU_TTL, indexed=True)
             
             # 更新房间活跃状态
-            self.redis_client.hset(f'room:{room_id}:stats', 'last_danmaku_time', datetime.now().isoformat())
+            pipe.hset(f'room:{room_id}:stats', 'last_danmaku_time', datetime.now().isoformat())
+            self._bump_room_version(room_id, pipe)
+            results = pipe.execute(raise_on_error=False)
             
+            _seq, evicted = append_event_result(script, self.redis_client, results, call)
+            if evicted:
+                cleanup_pipe = self.redis_client.pipeline(transaction=False)
+                if remove_from_index(cleanup_pipe, room_id, evicted):
+                    cleanup_pipe.execute()
+            
+            self._mark_summary_dirty(room_id)
             return True
             
         except Exception as e:
@@ -170,19 +226,23 @@ class SimpleRedisSaver:
             gift_data_copy['saved_at'] = datetime.now().isoformat()
             gift_data_copy['id'] = f"{room_id}_{gift_data_copy.get('gift_timestamp', int(datetime.now().timestamp()))}"
             
-            # 序列化并保存到列表
-            serialized_data = json.dumps(gift_data_copy, ensure_ascii=False)
-            self.redis_client.lpush(key, serialized_data)
+            # 与弹幕共用房间内递增的事件ID（由写入脚本分配），轮询端据此只拉取增量
+            gift_data_copy.pop('seq', None)
+            serialized_data = dumps(gift_data_copy)
             
-            # 限制列表长度（保留最近200个）
-            self.redis_client.ltrim(key, 0, 199)
+            pipe = self.redis_client.pipeline(transaction=False)
             
-            # 设置过期时间（1小时）
-            self.redis_client.expire(key, 3600)
+            # 一条脚本完成：分配seq、写入列表并保留最近200个、设置过期时间（1小时）、推送实时事件
+            script = self.get_append_script()
+            call = append_event(pipe, script, room_id, EVENT_GIFT, gift_data_copy, serialized_data,
+                                key, 200, 3600)
             
             # 更新房间活跃状态
-            self.redis_client.hset(f'room:{room_id}:stats', 'last_gift_time', datetime.now().isoformat())
+            pipe.hset(f'room:{room_id}:stats', 'last_gift_time', datetime.now().isoformat())
+            self._bump_room_version(room_id, pipe)
+            append_event_result(script, self.redis_client, pipe.execute(raise_on_error=False), call)
             
+            self._mark_summary_dirty(room_id)
             return True
             
         except Exception as e:
@@ -207,7 +267,7 @@ class SimpleRedisSaver:
                 'unix_timestamp': int(datetime.now().timestamp())
             }
             
-            self.redis_client.lpush(popularity_key, json.dumps(popularity_data))
+            self.redis_client.lpush(popularity_key, dumps(popularity_data))
             
             # 限制历史记录长度（保留最近100次）
             self.redis_client.ltrim(popularity_key, 0, 99)
@@ -215,6 +275,12 @@ class SimpleRedisSaver:
             # 设置过期时间（6小时）
             self.redis_client.expire(popularity_key, 21600)
             
+            self._bump_room_version(room_id)
+            self._publish_live_event(room_id, EVENT_ROOM, dumps({
+                'online': popularity,
+                'popularity_updated_at': popularity_data['timestamp'],
+            }))
+            self._mark_summary_dirty(room_id)
             return True
             
         except Exception as e:
@@ -260,6 +326,177 @@ class SimpleRedisSaver:
             self.logger.error(f"❌ 获取房间统计失败 {room_id}: {e}")
             return {}
     
+    def _bump_room_version(self, room_id: int, pipe=None):
+        """递增房间数据版本号和全局版本号，读取端以此判断缓存的响应是否仍然有效"""
+        (pipe or self.redis_client).incr(ROOM_VERSION_KEY.format(room_id=room_id))
+        (pipe or self.redis_client).incr(ROOMS_VERSION_KEY)
+    
+    def _publish_live_event(self, room_id: int, event_type: str, serialized: str):
+        """推送实时事件，失败不影响数据保存"""
+        try:
+            publish_event(self.redis_client, room_id, event_type, serialized)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 推送实时事件失败 {room_id}: {e}")
+    
+    def _mark_summary_dirty(self, room_id: int):
+        """标记房间摘要需要刷新，并确保后台刷新线程已启动"""
+        with self._dirty_lock:
+            self._dirty_rooms.add(int(room_id))
+            self._snapshot_dirty = True
+        self._ensure_summary_thread()
+    
+    def _ensure_summary_thread(self):
+        """懒启动摘要刷新线程"""
+        if self._summary_thread and self._summary_thread.is_alive():
+            return
+        with self._dirty_lock:
+            if self._summary_thread and self._summary_thread.is_alive():
+                return
+            self._summary_stop.clear()
+            self._summary_thread = threading.Thread(
+                target=self._summary_loop, name='RoomSummaryFlusher', daemon=True
+            )
+            self._summary_thread.start()
+    
+    def _summary_loop(self):
+        """后台循环：每个周期刷新脏房间摘要并重建全量快照"""
+        while not self._summary_stop.wait(SUMMARY_FLUSH_INTERVAL):
+            try:
+                self.flush_summaries()
+            except Exception as e:
+                self.logger.error(f"❌ 刷新房间摘要失败: {e}")
+    
+    def stop_summary_thread(self):
+        """停止摘要刷新线程（退出前会再刷新一次）"""
+        self._summary_stop.set()
+        if self._summary_thread:
+            self._summary_thread.join(timeout=5)
+            self._summary_thread = None
+        try:
+            self.flush_summaries(force_snapshot=True)
+        except Exception as e:
+            self.logger.error(f"❌ 刷新房间摘要失败: {e}")
+    
+    def flush_summaries(self, force_snapshot: bool = False) -> int:
+        """刷新所有脏房间的摘要，必要时重建全量快照，返回刷新的房间数"""
+        with self._dirty_lock:
+            room_ids = list(self._dirty_rooms)
+            self._dirty_rooms.clear()
+        
+        refreshed = self.refresh_room_summaries(room_ids) if room_ids else 0
+        
+        if self._snapshot_dirty or force_snapshot:
+            self.refresh_all_rooms_snapshot(force=force_snapshot)
+        
+        return refreshed
+    
+    def refresh_room_summaries(self, room_ids: Iterable[int]) -> int:
+        """用一次管道读取多个房间的数据并写回 room:{id}:summary"""
+        if not self.is_connected():
+            return 0
+        
+        room_ids = [int(room_id) for room_id in room_ids]
+        if not room_ids:
+            return 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for room_id in room_ids:
+                pipe.hgetall(f'room:{room_id}:info')
+                pipe.hgetall(f'room:{room_id}:stats')
+                pipe.llen(f'room:{room_id}:danmaku')
+                pipe.llen(f'room:{room_id}:gifts')
+                pipe.lindex(f'room:{room_id}:danmaku', 0)
+                pipe.lindex(f'room:{room_id}:gifts', 0)
+            results = pipe.execute()
+            
+            now = datetime.now().isoformat()
+            write_pipe = self.redis_client.pipeline(transaction=False)
+            refreshed = 0
+            for index, room_id in enumerate(room_ids):
+                room_info, stats_hash, danmaku_count, gift_count, danmaku_head, gift_head = results[index * 6:(index + 1) * 6]
+                if not room_info:
+                    continue
+                
+                stats = build_room_stats(danmaku_count, gift_count, stats_hash, danmaku_head, gift_head)
+                summary = build_room_summary(room_id, build_room_detail(room_info, stats), now)
+                write_pipe.set(
+                    ROOM_SUMMARY_KEY.format(room_id=room_id),
+                    dumps(summary),
+                    ex=ROOM_SUMMARY_TTL
+                )
+                # 同步更新房间列表的排序/筛选索引
+                index_room_summary(write_pipe, summary)
+                refreshed += 1
+            
+            if refreshed:
+                write_pipe.incr(ROOMS_SUMMARY_VERSION_KEY)
+                write_pipe.execute()
+            return refreshed
+            
+        except Exception as e:
+            self.logger.error(f"❌ 刷新房间摘要失败: {e}")
+            return 0
+    
+    def refresh_all_rooms_snapshot(self, force: bool = False) -> bool:
+        """重建所有房间的摘要快照 rooms:summary:all 和整体统计（最多每秒一次）"""
+        if not self.is_connected():
+            return False
+        
+        now = time.monotonic()
+        if not force and now - self._last_snapshot_time < SUMMARY_FLUSH_INTERVAL:
+            return False
+        
+        try:
+            with self._dirty_lock:
+                self._snapshot_dirty = False
+            self._last_snapshot_time = now
+            
+            room_ids = sorted(
+                int(room_id) for room_id in self.redis_client.smembers('rooms:active') if room_id.isdigit()
+            )
+            summaries = self.redis_client.mget(
+                [ROOM_SUMMARY_KEY.format(room_id=room_id) for room_id in room_ids]
+            ) if room_ids else []
+            
+            # 活跃但尚未生成摘要的房间，补刷一次
+            missing = [room_id for room_id, raw in zip(room_ids, summaries) if not raw]
+            if missing:
+                self.refresh_room_summaries(missing)
+                refilled = self.redis_client.mget([ROOM_SUMMARY_KEY.format(room_id=room_id) for room_id in missing])
+                refilled_map = dict(zip(missing, refilled))
+                summaries = [raw or refilled_map.get(room_id) for room_id, raw in zip(room_ids, summaries)]
+            
+            rooms = [loads(raw) for raw in summaries if raw]
+            rooms.sort(key=summary_sort_key, reverse=True)
+            
+            # 房间信息已过期的房间从排序/筛选索引中移除
+            expired = [room_id for room_id, raw in zip(room_ids, summaries) if not raw]
+            if expired:
+                prune_pipe = self.redis_client.pipeline(transaction=False)
+                for room_id in expired:
+                    unindex_room(prune_pipe, room_id)
+                prune_pipe.execute()
+            
+            snapshot = {
+                'rooms': rooms,
+                'total': len(rooms),
+                'generated_at': datetime.now().isoformat(),
+            }
+            overview = build_rooms_overview(rooms)
+            overview['generated_at'] = snapshot['generated_at']
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.set(ALL_ROOMS_SUMMARY_KEY, dumps(snapshot), ex=ROOM_SUMMARY_TTL)
+            pipe.set(ROOMS_OVERVIEW_KEY, dumps(overview), ex=ROOM_SUMMARY_TTL)
+            pipe.incr(ROOMS_SUMMARY_VERSION_KEY)
+            pipe.execute()
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"❌ 重建房间快照失败: {e}")
+            return False
+    
     def cleanup_old_data(self, hours: int = 24) -> bool:
         """清理旧数据"""
         if not self.is_connected():
@@ -289,4 +526,6 @@ def get_redis_saver() -> SimpleRedisSaver:
 def reset_redis_saver():
     """重置Redis保存器实例"""
     global _redis_saver
+    if _redis_saver is not None:
+        _redis_saver.stop_summary_thread()
     _redis_saver = None
\ No newline at end of file